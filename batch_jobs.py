@@ -0,0 +1,191 @@
+# Standard library
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Local modules
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+
+logger = logging.getLogger(__name__)
+
+# Endpoint recorded on every request line (OpenAI batch file format)
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+def classify_custom_id(email: Dict) -> str:
+    """Stable batch custom_id for an email's classification request."""
+    return f"classify-{email['id']}"
+
+
+def respond_custom_id(email: Dict) -> str:
+    """Stable batch custom_id for an email's response generation request."""
+    return f"respond-{email['id']}"
+
+
+def _request_line(custom_id: str, model: str, messages: List[Dict], temperature: float) -> str:
+    """Serialize one chat completion request in batch JSONL format."""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": {"model": model, "messages": messages, "temperature": temperature},
+    })
+
+
+def write_classification_requests(processor: EmailProcessor, emails: Iterable[Dict], path: str) -> int:
+    """
+    Write one classification request per email to a batch JSONL file.
+
+    Uses the same prompt and model as EmailProcessor.classify_email.
+
+    Returns:
+        int: Number of requests written. Emails missing required fields are skipped.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for email in emails:
+            if not processor._has_required_fields(email, "Skipping batch classification request."):
+                continue
+            messages = processor._classification_messages(processor.preprocess(email))
+            f.write(_request_line(classify_custom_id(email), processor.model, messages, 0) + "\n")
+            count += 1
+    logger.info(f"Wrote {count} classification requests to {path}.")
+    return count
+
+
+def write_response_requests(processor: EmailProcessor, emails: Iterable[Dict],
+                            classifications: Dict[str, Tuple[str, int]], path: str) -> int:
+    """
+    Write one response generation request per successfully classified email.
+
+    Args:
+        classifications (Dict[str, Tuple[str, int]]): Output of apply_classification_results.
+
+    Returns:
+        int: Number of requests written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for email in emails:
+            if email.get("id") not in classifications:
+                continue
+            category, _ = classifications[email["id"]]
+            messages = processor._response_messages(processor.preprocess(email), category)
+            f.write(_request_line(respond_custom_id(email), processor.model, messages, 0.5) + "\n")
+            count += 1
+    logger.info(f"Wrote {count} response requests to {path}.")
+    return count
+
+
+def read_batch_results(path: str) -> Dict[str, Optional[str]]:
+    """
+    Read a batch results JSONL file into {custom_id: message content}.
+
+    Failed requests map to None.
+    """
+    contents = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error')}")
+                contents[record["custom_id"]] = None
+                continue
+            contents[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return contents
+
+
+def apply_classification_results(processor: EmailProcessor, emails: Iterable[Dict],
+                                 results_path: str) -> Dict[str, Tuple[str, int]]:
+    """
+    Parse classification batch results with the same logic as classify_email.
+
+    Returns:
+        Dict[str, Tuple[str, int]]: (category, confidence) by email id for emails with a result.
+    """
+    contents = read_batch_results(results_path)
+    classifications = {}
+    for email in emails:
+        content = contents.get(classify_custom_id(email)) if "id" in email else None
+        if content is None:
+            continue
+        # Cache keys are built from the cleaned text, as in classify_email
+        email = processor.preprocess(email)
+        category, confidence = processor._parse_classification(email, content)
+        processor._store_classification(email, category, confidence)
+        classifications[email["id"]] = (category, confidence)
+    return classifications
+
+
+def apply_response_results(automation: EmailAutomationSystem, emails: Iterable[Dict],
+                           classifications: Dict[str, Tuple[str, int]], results_path: str) -> List[Dict]:
+    """
+    Parse response batch results and route each email through the automation handlers.
+
+    Returns:
+        List[Dict]: One process_email-style result dict per email, in input order.
+    """
+    contents = read_batch_results(results_path)
+    results = []
+    for email in emails:
+        result = automation._new_result(email)
+        results.append(result)
+        if email.get("id") not in classifications:
+            logger.error(f"Failed to classify email {result['email_id']}.")
+            continue
+
+        result["classification"], result["confidence"] = classifications[email["id"]]
+        content = contents.get(respond_custom_id(email))
+        response = automation.processor._parse_response(email, content) if content else None
+        if not response:
+            logger.error(f"Failed to generate response for email {email['id']}.")
+            continue
+
+        try:
+            # Same form as process_email: cleaned for parsing, original for the handlers (see _dispatch)
+            automation._dispatch(automation.processor.preprocess(email), result["classification"], response, result)
+        except Exception as e:
+            logger.error(f"Error processing email {email['id']}: {str(e)}")
+    return results
+
+
+def client_completion(client) -> Callable[[Dict], str]:
+    """Completion function for run_local_batch that calls a real chat completions client."""
+    def complete(body: Dict) -> str:
+        return client.chat.completions.create(**body).choices[0].message.content
+    return complete
+
+
+def run_local_batch(request_path: str, result_path: str, complete: Callable[[Dict], str]) -> int:
+    """
+    Local stand-in for a batch endpoint: turn a request file into a result file.
+
+    Args:
+        request_path (str): Batch request JSONL file.
+        result_path (str): Where to write the batch result JSONL file.
+        complete (Callable[[Dict], str]): Maps a request body to the assistant message content.
+
+    Returns:
+        int: Number of requests processed.
+    """
+    count = 0
+    with open(request_path, encoding="utf-8") as requests, open(result_path, "w", encoding="utf-8") as results:
+        for line in requests:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            record = {"id": f"batch_req_{count}", "custom_id": request["custom_id"], "response": None, "error": None}
+            try:
+                content = complete(request["body"])
+                record["response"] = {
+                    "status_code": 200,
+                    "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]},
+                }
+            except Exception as e:
+                record["error"] = {"message": str(e)}
+            results.write(json.dumps(record) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,243 @@
+# Standard library
+import asyncio
+import json
+import logging
+import random
+import resource
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Local modules
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from metrics import MetricsRegistry
+from mock_llm_server import MockLLMServer
+from rate_limiter import RequestScheduler
+from staged_pipeline import StagedPipeline
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sync", "async", "staged")
+
+# Any key works with the mock server
+MOCK_API_KEY = "mock-key"
+
+# Templates per category for synthetic corpora; {n} is replaced with a random number
+TEMPLATES = {
+    "complaint": ("Damaged order #{n}", "My order #{n} arrived broken. This is unacceptable and I want a refund."),
+    "inquiry": ("Question about plan {n}", "Could you tell me whether plan {n} is compatible with Mac OS?"),
+    "feedback": ("Thanks to agent {n}", "Thank you for the excellent support from agent {n}, great work!"),
+    "support_request": ("Install error {n}", "I keep getting error code {n} when I install the app. Please help."),
+    "other": ("Partnership {n}", "Our company would like to schedule a call to discuss partnership {n}."),
+}
+
+
+def synthetic_emails(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Lazily generate a reproducible corpus of count emails across all categories."""
+    rng = random.Random(seed)
+    categories = sorted(TEMPLATES)
+    for i in range(count):
+        subject, body = TEMPLATES[rng.choice(categories)]
+        n = rng.randint(1000, 99999)
+        yield {
+            "id": f"bench-{i:07d}",
+            "from": f"user{n}@example.com",
+            "subject": subject.format(n=n),
+            "body": body.format(n=n),
+            "timestamp": "2024-03-15T10:30:00Z",
+        }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _timed_sync(automation: EmailAutomationSystem, latencies: List[float]):
+    """Wrap process_email on this instance to record per-email latency."""
+    original = automation.process_email
+
+    def process_email(email):
+        start = time.perf_counter()
+        try:
+            return original(email)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    automation.process_email = process_email
+
+
+def _timed_async(automation: EmailAutomationSystem, latencies: List[float]):
+    """Wrap process_email_async on this instance to record per-email latency."""
+    original = automation.process_email_async
+
+    async def process_email_async(email):
+        start = time.perf_counter()
+        try:
+            return await original(email)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    automation.process_email_async = process_email_async
+
+
+def _timed_source(emails: Iterable[Dict], started: Dict[str, float]) -> Iterator[Dict]:
+    """Record when each email is pulled into a pipeline."""
+    for email in emails:
+        started[email["id"]] = time.perf_counter()
+        yield email
+
+
+def run_mode(mode: str, emails: Iterable[Dict], base_url: str, concurrency: int = 16, combined: bool = False,
+             api_key: Optional[str] = None) -> Dict:
+    """
+    Process emails in one mode against an OpenAI-compatible endpoint and report performance.
+
+    Per-email latency is the time spent in process_email / process_email_async, or
+    the time from entering to leaving the pipeline for the staged mode. With combined
+    set, each email is classified and answered by one LLM call instead of two. api_key
+    defaults to OPENAI_API_KEY.
+
+    Returns:
+        Dict: emails, success_rate, emails_per_sec, p50/p95/p99 latency (ms), tokens_per_email,
+            prompt_cache_hit_rate (share of prompt tokens served from the provider cache)
+            and peak_rss_mb (process-wide peak, so run one mode per process for isolation).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of {MODES}.")
+    registry = MetricsRegistry()
+    scheduler = RequestScheduler(base_delay=0.05, max_retries=8, max_concurrency=max(concurrency * 2, 16),
+                                 metrics=registry)
+    processor = EmailProcessor(base_url=base_url, scheduler=scheduler, metrics=registry, api_key=api_key)
+    automation = EmailAutomationSystem(processor, combined=combined)
+    latencies: List[float] = []
+    count = successes = 0
+
+    start = time.perf_counter()
+    if mode == "sync":
+        _timed_sync(automation, latencies)
+        for result in automation.process_stream(emails):
+            count += 1
+            successes += result["success"]
+    elif mode == "async":
+        _timed_async(automation, latencies)
+        results = asyncio.run(automation.process_emails_async(emails, max_concurrency=concurrency))
+        count = len(results)
+        successes = sum(result["success"] for result in results)
+    else:
+        started: Dict[str, float] = {}
+        pipeline = StagedPipeline(automation, classify_workers=concurrency, generate_workers=concurrency,
+                                  handler_workers=2, queue_size=concurrency * 2)
+        for result in pipeline.run(_timed_source(emails, started)):
+            latencies.append(time.perf_counter() - started.pop(result["email_id"]))
+            count += 1
+            successes += result["success"]
+    elapsed = time.perf_counter() - start
+
+    calls = ("classify", "respond", "combined")
+    tokens = sum(registry.counter(metric).value(call=call)
+                 for metric in ("email_llm_prompt_tokens_total", "email_llm_completion_tokens_total")
+                 for call in calls)
+    prompt_tokens = sum(registry.counter("email_llm_prompt_tokens_total").value(call=call) for call in calls)
+    cached_tokens = sum(registry.counter("email_llm_cached_prompt_tokens_total").value(call=call) for call in calls)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "combined": combined,
+        "emails": count,
+        "success_rate": round(successes / count, 4) if count else 0.0,
+        "seconds": round(elapsed, 3),
+        "emails_per_sec": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "tokens_per_email": round(tokens / count, 1) if count else 0.0,
+        "prompt_cache_hit_rate": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        "retries": scheduler.retries,
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+
+
+def find_regressions(results: List[Dict], baseline: List[Dict], tolerance: float = 0.2) -> List[str]:
+    """
+    Compare results with a saved baseline run.
+
+    Returns:
+        List[str]: One message per mode whose throughput dropped, or p95 latency rose,
+            by more than tolerance.
+    """
+    previous = {entry["mode"]: entry for entry in baseline}
+    problems = []
+    for entry in results:
+        before = previous.get(entry["mode"])
+        if not before:
+            continue
+        if entry["emails_per_sec"] < before["emails_per_sec"] * (1 - tolerance):
+            problems.append(f"{entry['mode']}: emails/sec {entry['emails_per_sec']} < baseline {before['emails_per_sec']}")
+        if entry["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            problems.append(f"{entry['mode']}: p95 {entry['p95_ms']}ms > baseline {before['p95_ms']}ms")
+    return problems
+
+
+def run_benchmark(count: int, modes: Iterable[str] = MODES, concurrency: int = 16, latency_ms: float = 50.0,
+                  latency_sigma: float = 0.5, rate_limit_rate: float = 0.0, seed: int = 0,
+                  base_url: Optional[str] = None, combined: bool = False, api_key: Optional[str] = None) -> List[Dict]:
+    """
+    Run each mode over the same synthetic corpus.
+
+    A local mock server is started unless base_url points at an existing endpoint, whose
+    key is api_key (default OPENAI_API_KEY).
+    """
+    server = None
+    if base_url is None:
+        # The mock server ignores credentials, but the client refuses to start without one
+        api_key = MOCK_API_KEY
+        server = MockLLMServer(latency_ms=latency_ms, latency_sigma=latency_sigma,
+                               rate_limit_rate=rate_limit_rate, retry_after=0.05, seed=seed).start()
+        base_url = server.base_url
+    try:
+        return [run_mode(mode, synthetic_emails(count, seed), base_url, concurrency, combined, api_key)
+                for mode in modes]
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark against a mock LLM server.")
+    parser.add_argument("--emails", type=int, default=1000, help="synthetic corpus size")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="median mock latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal latency spread")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests rejected with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--combined", action="store_true", help="one classify+respond call per email")
+    parser.add_argument("--base-url", help="benchmark an existing OpenAI-compatible endpoint instead")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline")
+    args = parser.parse_args()
+
+    # Per-email INFO logs would dominate the measurement
+    logging.basicConfig(level=logging.WARNING, force=True)
+    results = run_benchmark(args.emails, args.modes, args.concurrency, args.latency_ms, args.latency_sigma,
+                            args.rate_limit_rate, args.seed, args.base_url, args.combined)
+    for entry in results:
+        print(json.dumps(entry))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for problem in regressions:
+            print(f"REGRESSION {problem}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,139 @@
+# Standard library
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Side-effect states: claimed before the handler runs, done once it returned
+CLAIMED = "claimed"
+DONE = "done"
+
+
+class CheckpointStore:
+    """
+    Durable per-email progress for long or sharded runs, kept in SQLite.
+
+    Finished results are committed one email at a time, so a crashed run resumes
+    by skipping completed ids. Handler side effects (tickets, replies, feedback
+    logs) are claimed in their own table before the handler is called: a claim
+    succeeds for exactly one caller across all processes sharing the file, so a
+    resumed or concurrent run never repeats them. A claim that was never marked
+    done means the process died inside the handler; it is not retried (the effect
+    may already have happened) and is reported by unconfirmed_effects() instead.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Args:
+            path (str): SQLite file shared by every worker of a run.
+            timeout (float): Seconds to wait for another process's write lock.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        # WAL lets readers and one writer from different processes proceed together
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "email_id TEXT PRIMARY KEY, shard INTEGER, success INTEGER NOT NULL, "
+            "result TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS side_effects ("
+            "email_id TEXT PRIMARY KEY, handler TEXT NOT NULL, status TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    # Results
+
+    def save_result(self, result: Dict, shard: Optional[int] = None):
+        """Commit the result of one email; a later save for the same id replaces it."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (email_id, shard, success, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (result["email_id"], shard, int(bool(result["success"])), json.dumps(result), time.time()),
+            )
+            self._db.commit()
+
+    def is_completed(self, email_id: str) -> bool:
+        """True if the email was processed successfully by an earlier or concurrent run."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM results WHERE email_id = ? AND success = 1", (email_id,)
+            ).fetchone()
+        return row is not None
+
+    def results(self) -> Iterator[Dict]:
+        """Stream every stored result (successful or not) ordered by email id."""
+        cursor = self._db.cursor()
+        for (payload,) in cursor.execute("SELECT result FROM results ORDER BY email_id"):
+            yield json.loads(payload)
+
+    # Side effects
+
+    def claim_effect(self, email_id: str, handler: str) -> bool:
+        """
+        Atomically claim the right to run an email's handler.
+
+        Returns:
+            bool: True for the first caller only; False if any run already claimed it.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO side_effects (email_id, handler, status, updated_at) VALUES (?, ?, ?, ?)",
+                (email_id, handler, CLAIMED, time.time()),
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def confirm_effect(self, email_id: str):
+        """Mark a claimed handler as having completed."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE side_effects SET status = ?, updated_at = ? WHERE email_id = ?",
+                (DONE, time.time(), email_id),
+            )
+            self._db.commit()
+
+    def release_effect(self, email_id: str):
+        """Drop a claim whose handler failed cleanly, so a later run may try it again."""
+        with self._lock:
+            self._db.execute("DELETE FROM side_effects WHERE email_id = ? AND status = ?", (email_id, CLAIMED))
+            self._db.commit()
+
+    def effect_status(self, email_id: str) -> Optional[str]:
+        """'claimed', 'done', or None if the handler was never claimed."""
+        with self._lock:
+            row = self._db.execute("SELECT status FROM side_effects WHERE email_id = ?", (email_id,)).fetchone()
+        return row[0] if row else None
+
+    def unconfirmed_effects(self) -> Dict[str, str]:
+        """Handlers claimed by a run that died before they returned (email id -> handler)."""
+        with self._lock:
+            rows = self._db.execute("SELECT email_id, handler FROM side_effects WHERE status = ?", (CLAIMED,))
+            return dict(rows.fetchall())
+
+    def stats(self) -> Dict:
+        """Return completed/failed result counts and side-effect counts."""
+        with self._lock:
+            completed, failed = self._db.execute(
+                "SELECT COALESCE(SUM(success), 0), COUNT(*) - COALESCE(SUM(success), 0) FROM results"
+            ).fetchone()
+            effects = dict(self._db.execute("SELECT status, COUNT(*) FROM side_effects GROUP BY status").fetchall())
+        return {
+            "completed": completed,
+            "failed": failed,
+            "effects_done": effects.get(DONE, 0),
+            "effects_unconfirmed": effects.get(CLAIMED, 0),
+        }
+
+    def close(self):
+        """Close the database connection."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
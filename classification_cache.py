@@ -0,0 +1,113 @@
+# Standard library
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ClassificationCache:
+    """
+    Content-addressed cache for email classifications.
+
+    Entries are keyed by a hash of the model, the classification prompt version and
+    the normalized subject/body, so a prompt or model change never serves stale labels.
+    A bounded in-memory LRU tier sits in front of an optional SQLite tier that
+    survives restarts.
+    """
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None):
+        """
+        Args:
+            max_size (int): Maximum number of entries held in the in-memory LRU tier.
+            path (Optional[str]): SQLite file for the persistent tier, or None for memory only.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                "key TEXT PRIMARY KEY, category TEXT NOT NULL, confidence INTEGER NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase and collapse whitespace so trivially different copies share a key."""
+        return " ".join((text or "").lower().split())
+
+    @classmethod
+    def make_key(cls, model: str, prompt_version: str, subject: str, body: str) -> str:
+        """Build the content hash used as the cache key."""
+        parts = [model, prompt_version, cls.normalize(subject), cls.normalize(body)]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """Return the cached (category, confidence) for a key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT category, confidence FROM classifications WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    # Promote persistent hits into the memory tier
+                    self._remember(key, (row[0], int(row[1])))
+                    self.hits += 1
+                    return self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, category: str, confidence: int):
+        """Store a classification in every configured tier."""
+        with self._lock:
+            self._remember(key, (category, confidence))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO classifications (key, category, confidence) VALUES (?, ?, ?)",
+                    (key, category, confidence),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: Tuple[str, int]):
+        """Insert into the LRU tier, evicting the least recently used entry if full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current memory tier size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+    def close(self):
+        """Close the persistent tier, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,21 +1,157 @@
 # Standard library
 import os
+import json
+import asyncio
+import contextvars
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 import time
 
-# Third-party libraries
-import pandas as pd
-from dotenv import load_dotenv
-from openai import OpenAI
+# Local modules
+from checkpoint_store import CheckpointStore
+from classification_cache import ClassificationCache
+from hedging import CallPolicy, DeadlineExceeded, Hedger, current_deadline, deadline_scope
+from local_classifier import LocalClassifier, append_label
+from metrics import METRICS, MetricsRegistry
+from model_cascade import ModelCascade
+from preprocessing import Preprocessor, original_email
+from prompt_templates import PROMPT_VERSION, compile_prompts
+from rate_limiter import RequestScheduler, estimate_tokens
+from response_stream import ResponseStreamParser, parse_reasoning_line
+from ticket_backends import BufferedDispatcher
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from near_duplicates import NearDuplicateIndex
+
+# openai, dotenv, numpy (near_duplicates), pyarrow (results_sink) and the mailbox parsers
+# (email_sources) are imported on first use, so importing this module stays fast and has no side effects
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Sync OpenAI clients by (base_url, api_key), shared so processors reuse one connection pool
+_CLIENTS: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Tracker of the checkpoint effect whose handler is running, when delivery confirms it
+_EFFECT_TRACKER: contextvars.ContextVar = contextvars.ContextVar("effect_tracker", default=None)
+# Side effects the async path submits after the handler returns, so it never blocks the event loop
+_DEFERRED_EFFECTS: contextvars.ContextVar = contextvars.ContextVar("deferred_effects", default=None)
+
+
+def configure(level: int = logging.INFO):
+    """Set up logging and load .env variables; called by command-line entry points."""
+    from dotenv import load_dotenv
+
+    logging.basicConfig(level=level)
+    load_dotenv()
+
+
+def shared_client(base_url: Optional[str] = None, api_key: Optional[str] = None):
+    """
+    Sync OpenAI client for an endpoint, created on first use and shared by later callers.
+
+    Returns:
+        OpenAI: Client with the SDK's own retries disabled (the scheduler owns retries).
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get((base_url, api_key))
+        if client is None:
+            from openai import OpenAI
+
+            client = _CLIENTS[(base_url, api_key)] = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        return client
+
+
+def api_errors() -> Tuple[type, ...]:
+    """Exceptions a failed LLM call raises: API errors and missed deadlines."""
+    import openai
+
+    return openai.OpenAIError, DeadlineExceeded
+
+
+class _EffectTracker:
+    """
+    Confirms a claimed checkpoint effect once every record its handler queued is delivered.
+
+    A record that is given up leaves the effect claimed, so it shows up in
+    CheckpointStore.unconfirmed_effects instead of being skipped as done by a later run.
+    """
+
+    def __init__(self, checkpoint: CheckpointStore, key: str):
+        self.checkpoint = checkpoint
+        self.key = key
+        self._lock = threading.Lock()
+        # The handler itself counts as pending until seal() is called after it returns
+        self._pending = 1
+        self._failed = False
+
+    def add(self) -> Callable[[bool], None]:
+        """Count one more queued record; returns its delivery callback."""
+        with self._lock:
+            self._pending += 1
+        return self._done
+
+    def seal(self):
+        """Mark the handler as returned; the effect is confirmed once its records are delivered."""
+        self._done(True)
+
+    def _done(self, delivered: bool):
+        with self._lock:
+            self._failed = self._failed or not delivered
+            self._pending -= 1
+            if self._pending:
+                return
+        if self._failed:
+            logger.error(f"Side effects of {self.key} were not delivered. Leaving the handler unconfirmed.")
+        else:
+            self.checkpoint.confirm_effect(self.key)
+
+
+# Metric names and help text; registered up front so the exposition is self-describing
+METRIC_HELP = {
+    "email_prompt_build_seconds": "Time spent building LLM prompts.",
+    "email_llm_request_seconds": "LLM API call latency, including retries and rate-limit waits.",
+    "email_llm_errors_total": "LLM API calls that failed after retries.",
+    "email_llm_prompt_tokens_total": "Prompt tokens reported by the API.",
+    "email_llm_completion_tokens_total": "Completion tokens reported by the API.",
+    "email_llm_cached_prompt_tokens_total": "Prompt tokens served from the provider's prompt cache.",
+    "email_llm_hedges_total": "Duplicate (hedged) LLM requests sent after the first ran past the latency quantile.",
+    "email_llm_hedge_wins_total": "Hedged calls answered first by the duplicate request.",
+    "email_llm_cancelled_total": "LLM requests cancelled or abandoned because another attempt answered first.",
+    "email_llm_deadline_exceeded_total": "LLM calls that ran past their timeout or the email deadline.",
+    "email_output_parse_seconds": "Time spent parsing LLM output.",
+    "email_stream_stops_total": "Streamed replies by how generation ended (end, complete or length).",
+    "email_preprocess_tokens_saved_total": "Estimated body tokens removed by preprocessing.",
+    "email_classification_fallbacks_total": "Classifications that fell back to 'other'.",
+    "email_classification_cache_lookups_total": "Classification cache lookups by result.",
+    "email_local_classifier_decisions_total": "Local pre-classifier decisions by outcome.",
+    "email_near_duplicate_lookups_total": "Near-duplicate index lookups by result.",
+    "email_handler_seconds": "Time spent in category handlers.",
+    "email_processing_seconds": "End-to-end time to process one email.",
+    "email_processed_total": "Processed emails by success.",
+}
+
+
+def register_metrics(registry: MetricsRegistry):
+    """Declare the pipeline's metrics (with help text) on a registry."""
+    for name, help_text in METRIC_HELP.items():
+        if name.endswith("_total"):
+            registry.counter(name, help_text)
+        else:
+            registry.histogram(name, help_text)
+
+
+# Fields of the single-call classify+respond answer and their types
+COMBINED_SCHEMA = {
+    "category": str,
+    "confidence": int,
+    "summary": str,
+    "tone": str,
+    "urgency": str,
+    "response": str,
+}
+
 
 # Sample email dataset
 sample_emails = [
@@ -58,13 +194,342 @@ sample_emails = [
 
 
 class EmailProcessor:
-    def __init__(self):
-        """Initialize the email processor with OpenAI API key."""
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, cache: Optional[ClassificationCache] = None, scheduler: Optional[RequestScheduler] = None,
+                 local_classifier: Optional[LocalClassifier] = None, local_threshold: float = 0.9,
+                 label_log: Optional[str] = None, metrics: Optional[MetricsRegistry] = None,
+                 base_url: Optional[str] = None, prompt_version: str = PROMPT_VERSION,
+                 token_budgets: Optional[Dict[str, int]] = None, preprocessor: Optional[Preprocessor] = None,
+                 cascade: Optional[ModelCascade] = None, call_policies: Optional[Dict[str, CallPolicy]] = None,
+                 api_key: Optional[str] = None):
+        """
+        Initialize the email processor with OpenAI API key.
+
+        Args:
+            cache (Optional[ClassificationCache]): Cache consulted before every classification call.
+            scheduler (Optional[RequestScheduler]): Rate limiter and retry policy for API calls.
+                Share one instance between processors/workers to keep them under a common quota.
+            local_classifier (Optional[LocalClassifier]): Local model tried before the LLM.
+            local_threshold (float): Minimum local probability needed to skip the LLM.
+            label_log (Optional[str]): JSONL file that confident LLM labels are appended to,
+                used to train the local classifier.
+            metrics (Optional[MetricsRegistry]): Where latency/token/cache metrics are recorded.
+                Defaults to the process-wide registry.
+            base_url (Optional[str]): OpenAI-compatible endpoint, e.g. a local mock server.
+                Defaults to OPENAI_BASE_URL or the OpenAI API.
+            prompt_version (str): Prompt template set (see prompt_templates.PROMPTS).
+            token_budgets (Optional[Dict[str, int]]): Per-template prompt token budgets that
+                log a warning when exceeded.
+            preprocessor (Optional[Preprocessor]): Cleans and truncates email text before any
+                prompt or cache key is built. Defaults to Preprocessor() (1000-token body budget).
+            cascade (Optional[ModelCascade]): Classification models tried cheapest first, escalating
+                low-confidence or invalid answers. Replies still use self.model.
+            call_policies (Optional[Dict[str, CallPolicy]]): Per-stage ('classify', 'respond',
+                'combined', 'classify_batch') timeouts and request hedging.
+            api_key (Optional[str]): API key for base_url. Defaults to OPENAI_API_KEY.
+        """
+        # Clients are created on first use (see client and async_client)
+        self.base_url = base_url
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+        # Event loop the async client runs on; None until it is first used inside one
+        self._async_client_loop = None
+        self.model = "gpt-3.5-turbo-0125"
+        # Templates are compiled once; the version is part of the classification cache key
+        self.prompts = compile_prompts(prompt_version, token_budgets)
+        self.classification_prompt_version = prompt_version
+        self.cache = cache
+        self.metrics = metrics or METRICS
+        register_metrics(self.metrics)
+        self.scheduler = scheduler or RequestScheduler(metrics=self.metrics)
+        self.preprocessor = preprocessor or Preprocessor()
+        if self.preprocessor.metrics is None:
+            self.preprocessor.metrics = self.metrics
+        self.local_classifier = local_classifier
+        self.local_threshold = local_threshold
+        self.local_stats = {"local": 0, "escalated": 0}
+        self.label_log = label_log
+        self.cascade = cascade
+        self.call_policies = call_policies or {}
+        self.hedger = Hedger(metrics=self.metrics)
+        if cascade is not None and cascade.metrics is None:
+            cascade.metrics = self.metrics
 
         self.valid_categories = {"complaint", "inquiry", "feedback", "support_request", "other"}
 
-    
+    @property
+    def client(self):
+        """Sync OpenAI client, shared with other processors on the same endpoint (see shared_client)."""
+        if self._client is None:
+            self._client = shared_client(self.base_url, self.api_key or os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def async_client(self):
+        """
+        Async client used by the concurrent pipeline (see process_emails_async), created on first use.
+
+        Not shared: its connection pool belongs to the event loop it first runs on, so a
+        new client is created when the processor is used from another loop (for example
+        a second asyncio.run).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self._async_client is not None and loop is not None and self._async_client_loop not in (None, loop):
+            self._async_client = None
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(api_key=self.api_key or os.getenv("OPENAI_API_KEY"), base_url=self.base_url,
+                                             max_retries=0)
+        if loop is not None:
+            self._async_client_loop = loop
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+        self._async_client_loop = None
+
+    def preprocess(self, email: Dict) -> Dict:
+        """Cleaned copy of an email (see Preprocessor.process); already cleaned emails pass through."""
+        return self.preprocessor.process(email)
+
+    def _cache_key(self, email: Dict) -> str:
+        """Content-addressed cache key for an email's classification."""
+        return ClassificationCache.make_key(
+            self.cascade.name if self.cascade else self.model, self.classification_prompt_version, email.get("subject", ""), email.get("body", "")
+        )
+
+    def _cached_classification(self, email: Dict) -> Optional[Tuple[str, int]]:
+        """Look up a previous classification of the same content, if a cache is configured."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(email))
+        self.metrics.counter("email_classification_cache_lookups_total").inc(result="hit" if cached else "miss")
+        if cached:
+            logger.info(f"Email {email['id']} classified as '{cached[0]}' from cache.")
+        return cached
+
+    def _local_classification(self, email: Dict) -> Optional[Tuple[str, int]]:
+        """
+        Classify with the local model when it is confident enough to skip the LLM.
+
+        The model probability is mapped onto the LLM's 1-5 confidence scale.
+        """
+        if self.local_classifier is None:
+            return None
+        category, probability = self.local_classifier.predict(email)
+        if probability < self.local_threshold:
+            self.local_stats["escalated"] += 1
+            self.metrics.counter("email_local_classifier_decisions_total").inc(outcome="escalated")
+            return None
+        self.local_stats["local"] += 1
+        self.metrics.counter("email_local_classifier_decisions_total").inc(outcome="local")
+        confidence = max(1, min(5, round(probability * 5)))
+        logger.info(f"Email {email['id']} classified locally as '{category}' ({probability:.2f}).")
+        return category, confidence
+
+    def _classify_without_llm(self, email: Dict) -> Optional[Tuple[str, int]]:
+        """Try the free paths (cache, then local model) before paying for an API call."""
+        return self._cached_classification(email) or self._local_classification(email)
+
+    def escalation_rate(self) -> float:
+        """Share of locally screened emails that still needed the LLM."""
+        screened = self.local_stats["local"] + self.local_stats["escalated"]
+        return self.local_stats["escalated"] / screened if screened else 0.0
+
+    def _store_classification(self, email: Dict, category: str, confidence: int):
+        """Remember a parsed LLM classification for later duplicates and local model training."""
+        if self.cache is not None:
+            self.cache.set(self._cache_key(email), category, confidence)
+        if self.label_log and confidence >= 3:
+            append_label(self.label_log, email, category, confidence)
+
+    def _has_required_fields(self, email: Dict, context: str) -> bool:
+        """Check that the email carries the fields every prompt depends on."""
+        for field in ["id", "subject", "body"]:
+            if field not in email or not email[field]:
+                logger.error(f"{context} Missing '{field}' in email: {email}")
+                return False
+        return True
+
+    def _classification_messages(self, email: Dict) -> List[Dict]:
+        """Build the chat messages used to classify an email."""
+        return self.prompts["classify"].render(subject=email.get("subject", ""), body=email.get("body", ""))
+
+    def _parse_classification(self, email: Dict, raw_output: str) -> Tuple[str, int]:
+        """
+        Parse the LLM classification output into a category and confidence score.
+
+        Falls back to 'other' when the confidence is too low or the category is invalid.
+        """
+        return self._apply_confidence_fallback(email, *self._read_classification(raw_output))
+
+    @staticmethod
+    def _read_classification(raw_output: str) -> Tuple[Optional[str], int]:
+        """Read the category and confidence lines of a classification output, without any fallback."""
+        logger.debug(f"Raw classification response:\n{raw_output}")
+
+        # Initializing category and confidence fields
+        category = None
+        confidence = 0
+
+        # Parse LLM output to extract classification and confidence score
+        for line in raw_output.strip().lower().splitlines():
+            if line.startswith("category:"):
+                category = line.split("category:")[1].strip()
+            elif line.startswith("confidence:"):
+                try:
+                    confidence = int(line.split("confidence:")[1].strip())
+                except ValueError:
+                    confidence = 0  # Default to low confidence
+
+        return category, confidence
+
+    def _apply_confidence_fallback(self, email: Dict, category: Optional[str], confidence: int) -> Tuple[str, int]:
+        """Fallback to "other" if confidence is too low or category is invalid."""
+        if category not in self.valid_categories or confidence < 3:
+            self.metrics.counter("email_classification_fallbacks_total").inc()
+            logger.warning(f"Email {email['id']} classified with low confidence ({confidence}/5). Using fallback category 'other'.")
+            return "other", confidence
+
+        # Log classification result
+        logger.info(f"Email {email['id']} classified as '{category}' with confidence {confidence}/5.")
+        return category, confidence
+
+    def _batch_classification_messages(self, emails: List[Dict]) -> List[Dict]:
+        """
+        Build one classification request covering several emails.
+
+        Emails are labelled by their position in the batch so the answer can be
+        mapped back even when ids are long or repeated.
+        """
+        email_blocks = "".join(
+            f"Email {position}:\nSubject: {email.get('subject', '')}\nBody: {email.get('body', '')}\n\n"
+            for position, email in enumerate(emails, start=1)
+        )
+        return self.prompts["classify_batch"].render(emails=email_blocks)
+
+    @staticmethod
+    def _load_json_object(raw_output: str) -> Optional[Dict]:
+        """Decode a JSON object answer, or return None if it isn't one."""
+        text = raw_output.strip()
+        # Tolerate answers wrapped in a markdown code fence
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.find("{"):]
+        try:
+            answer = json.loads(text)
+        except ValueError:
+            return None
+        return answer if isinstance(answer, dict) else None
+
+    def _parse_batch_classification(self, raw_output: str, size: int) -> Dict[int, Tuple[str, int]]:
+        """
+        Parse a batched classification answer into {position: (category, confidence)}.
+
+        Positions whose entry is missing or malformed are left out so the caller
+        can retry them individually.
+        """
+        answers = self._load_json_object(raw_output)
+        if answers is None:
+            logger.warning("Batch classification output is not a valid JSON object.")
+            return {}
+
+        parsed = {}
+        for position in range(1, size + 1):
+            entry = answers.get(str(position))
+            if not isinstance(entry, dict):
+                continue
+            category = str(entry.get("category", "")).strip().lower()
+            try:
+                confidence = int(entry.get("confidence"))
+            except (TypeError, ValueError):
+                continue
+            if category in self.valid_categories:
+                parsed[position] = (category, confidence)
+        return parsed
+
+    def _response_messages(self, email: Dict, classification: str) -> List[Dict]:
+        """Build the chat messages used to draft a reply to an email."""
+        return self.prompts["respond"].render(category=classification, subject=email.get("subject", ""),
+                                              body=email.get("body", ""))
+
+    def _combined_messages(self, email: Dict) -> List[Dict]:
+        """Build one request that classifies an email and drafts the reply together."""
+        return self.prompts["combined"].render(subject=email.get("subject", ""), body=email.get("body", ""))
+
+    def _parse_combined(self, email: Dict, raw_output: str) -> Optional[Dict]:
+        """
+        Validate a combined answer against COMBINED_SCHEMA.
+
+        The category goes through the same low-confidence fallback as classify_email.
+
+        Returns:
+            Optional[Dict]: category, confidence, summary, tone, urgency and response,
+                or None when the answer is not a valid object or has no usable reply.
+        """
+        logger.debug(f"Raw combined response:\n{raw_output}")
+        answer = self._load_json_object(raw_output)
+        if answer is None:
+            logger.warning(f"Combined output for email {email['id']} is not a valid JSON object.")
+            return None
+
+        parsed = {}
+        for field, expected in COMBINED_SCHEMA.items():
+            value = answer.get(field)
+            if expected is int:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    value = 0  # Default to low confidence
+            else:
+                value = str(value).strip() if isinstance(value, (str, int, float)) else ""
+            parsed[field] = value
+        if not parsed["response"]:
+            logger.warning(f"Combined output for email {email['id']} has no drafted response.")
+            return None
+
+        parsed["category"], parsed["confidence"] = self._apply_confidence_fallback(
+            email, parsed["category"].lower(), parsed["confidence"])
+        for field in ("tone", "urgency"):
+            parsed[field] = parsed[field].lower() or "unsure"
+        logger.info(f"Response generated for email {email['id']}.")
+        return parsed
+
+    @staticmethod
+    def _parse_reasoning(full_response: str) -> Dict[str, str]:
+        """Extract the summary, tone and urgency lines of the Reasoning block (lowercased tone/urgency)."""
+        reasoning = {}
+        text = full_response.split("Drafted Response:")[0]
+        for line in text.splitlines():
+            # Lines look like "2. Tone: angry"
+            parsed = parse_reasoning_line(line)
+            if parsed:
+                reasoning[parsed[0]] = parsed[1]
+        return reasoning
+
+    def _parse_response(self, email: Dict, full_response: str) -> Optional[str]:
+        """Extract the drafted reply from the structured generation output."""
+        full_response = full_response.strip()
+        logger.debug(f"Raw generated response:\n{full_response}")
+
+        # Parse out the final drafted reply from model output
+        if "Drafted Response:" in full_response:
+            drafted = full_response.split("Drafted Response:")[1].strip()
+            logger.info(f"Response generated for email {email['id']}.")
+            return drafted
+
+        logger.warning(f"Unexpected format for email {email['id']}. Full response: {full_response}")
+        return None
+
     def classify_email(self, email: Dict) -> Optional[str]:
 
         """
@@ -76,92 +541,95 @@ class EmailProcessor:
         Returns:
             Optional[str]: One of the valid categories or 'other' if classification fails.
         """
+        category, confidence = self.classify_email_with_confidence(email)
+        if category:
+            self.last_confidence = confidence
+        return category
+
+    def classify_email_with_confidence(self, email: Dict) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Classify an email and return the confidence score alongside the category.
+
+        Unlike classify_email this keeps no per-call state on the processor, so it is
+        safe to call from several threads at once.
+
+        Returns:
+            Tuple[Optional[str], Optional[int]]: The category and confidence, or (None, None) on failure.
+        """
         try:
-            for field in ["id", "subject", "body"]:
-                if field not in email or not email[field]:
-                    logger.error(f"Email is missing required field '{field}': {email}")
-                    return None
-                
-            # Prepare prompt components for modular prompting
-            subject = email.get("subject", "")
-            body = email.get("body", "")
-            prompt = (
-                # Define assistant persona and frame task
-                "You are a highly trained expert customer support assistant. "
-                "Your job is to classify customer emails accurately using reasoning and clear formatting.\n\n"
-                # Chain-of-thought for reasoning
-                "1. Carefully analyze the email content step by step.\n"
-                "2. Classify the email into one of the following categories based on its intent:\n"
-                "   - complaint: A customer expressing dissatisfaction or demanding a resolution.\n"
-                "   - inquiry: A question or request for clarification or product info.\n"
-                "   - feedback: A general comment or praise with no requested action.\n"
-                "   - support_request: A help request related to using a product or service.\n"
-                "   - other: Anything that doesn't clearly match the above.\n"
-                # Self-evaluated confidence measure
-                "3. Estimate your confidence in the classification on a scale from 1 (very unsure) to 5 (very confident).\n\n"
-                # Include email content
-                f"Email:\nSubject: {subject}\nBody: {body}\n\n"
-                # Expected output format
-                "Respond in this format:\n"
-                "Category: <one of the five categories>\n"
-                "Confidence: <1-5>"
-            )
+            email = self.preprocess(email)
+            if not self._has_required_fields(email, "Cannot classify email."):
+                return None, None
+
+            # Duplicates and easy emails cost no tokens when a cache or local model is configured
+            cached = self._classify_without_llm(email)
+            if cached:
+                return cached
+
+            with self.metrics.time("email_prompt_build_seconds", call="classify"):
+                messages = self._classification_messages(email)
             logger.info(f"Classifying email {email['id']}...")
-            logger.debug(f"Classification prompt:\n{prompt}")
+            if self.cascade is not None:
+                return self._classify_cascade(email, messages)
 
-            # OpenAI API call wihh retry logic to classify email
+            # OpenAI API call (retries and rate limits handled by the shared scheduler)
             # Setting temperature=0 for consistent output (classification should be deterministic)
-            for attempt in range(2):
-                try:
-                    response = self.client.chat.completions.create(
-                        model="gpt-3.5-turbo-0125",
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0
-                    )
-                    break
-                except openai.error.RateLimitError:
-                    logger.warning("Rate limited. Retrying...")
-                    time.sleep(2)
-                except openai.error.APIError as e:
-                    logger.error(f"API error: {e}")
-                    return None
-                except openai.error.OpenAIError as e:
-                    logger.exception("OpenAI error during classification.")
-                    return None
-
-
-            # Extract raw response from LLM output
-            raw_output = response.choices[0].message.content.strip()
-            logger.debug(f"Raw classification response:\n{raw_output}")
-
-            # Initializing category and confidence fields
-            category = None
-            confidence = 0 
-            
-            # Parse LLM output to extract classification and confidence score
-            for line in raw_output.lower().splitlines():
-                if line.startswith("category:"):
-                    category = line.split("category:")[1].strip()
-                elif line.startswith("confidence:"):
-                    try:
-                        confidence = int(line.split("confidence:")[1].strip())
-                    except ValueError:
-                        confidence = 0  # Default to low confidence
-            self.last_confidence = confidence
-
-            # Fallback to "other" if confidence is too low or category is invalid
-            if category not in self.valid_categories or confidence < 3:
-                logger.warning(f"Email {email['id']} classified with low confidence ({confidence}/5). Using fallback category 'other'.")
-                return "other"
+            try:
+                response = self._create(messages, temperature=0, call="classify")
+            except api_errors() as e:
+                logger.error(f"OpenAI error during classification of email {email['id']}: {e}")
+                return None, None
 
-            # Log classification result 
-            logger.info(f"Email {email['id']} classified as '{category}' with confidence {confidence}/5.")
-            return category
+            # Extract raw response from LLM output and parse category/confidence
+            with self.metrics.time("email_output_parse_seconds", call="classify"):
+                category, confidence = self._parse_classification(email, response.choices[0].message.content)
+            self._store_classification(email, category, confidence)
+            return category, confidence
 
         # Log runtime error
         except Exception as e:
             logger.error(f"Error classifying email {email['id']}: {str(e)}")
-            return None
+            return None, None
+
+    def _cascade_answer(self, email: Dict, tier_index: int, response) -> Tuple[Tuple[Optional[str], int], bool]:
+        """Read and record one tier's answer; also returns whether it is final."""
+        tier = self.cascade.tiers[tier_index]
+        with self.metrics.time("email_output_parse_seconds", call="classify"):
+            answer = self._read_classification(response.choices[0].message.content)
+        last = tier_index == len(self.cascade.tiers) - 1
+        if last or not self.cascade.should_escalate(tier, *answer, self.valid_categories):
+            self.cascade.record(tier, "accepted", response)
+            return answer, True
+        self.cascade.record(tier, "escalated", response)
+        logger.info(f"Email {email['id']} escalated from {tier.model} ({answer[0]}, {answer[1]}/5).")
+        return answer, False
+
+    def _finish_cascade(self, email: Dict, answer: Optional[Tuple[Optional[str], int]]
+                        ) -> Tuple[Optional[str], Optional[int]]:
+        """Apply the usual fallback to the final cascade answer (the last one obtained if tiers failed)."""
+        if answer is None:
+            logger.error(f"Every cascade tier failed to classify email {email['id']}.")
+            return None, None
+        category, confidence = self._apply_confidence_fallback(email, *answer)
+        self._store_classification(email, category, confidence)
+        return category, confidence
+
+    def _classify_cascade(self, email: Dict, messages: List[Dict]) -> Tuple[Optional[str], Optional[int]]:
+        """Classify with each cascade tier in turn until one answers confidently."""
+        answer = None
+        for index, tier in enumerate(self.cascade.tiers):
+            try:
+                with tier.slot():
+                    response = self._create(messages, temperature=0, call="classify", model=tier.model,
+                                            timeout=tier.timeout)
+            except api_errors() as e:
+                logger.warning(f"{tier.model} failed to classify email {email['id']}: {e}")
+                self.cascade.record(tier, "error")
+                continue
+            answer, final = self._cascade_answer(email, index, response)
+            if final:
+                break
+        return self._finish_cascade(email, answer)
 
     def generate_response(self, email: Dict, classification: str) -> Optional[str]:
         """
@@ -174,87 +642,522 @@ class EmailProcessor:
         Returns:
             Optional[str]: A customer-friendly response message or None on failure.
         """
+        return self.generate_response_with_reasoning(email, classification)[0]
+
+    def generate_response_with_reasoning(self, email: Dict, classification: str) -> Tuple[Optional[str], Dict]:
+        """
+        Generate a response and also return the model's reasoning steps.
+
+        Returns:
+            Tuple[Optional[str], Dict]: The drafted reply (None on failure) and the parsed
+                reasoning ('summary', 'tone', 'urgency'; empty on failure).
+        """
         try:
+            email = self.preprocess(email)
             # Confirm email fields exist
-            for field in ["id", "subject", "body"]:
-                if field not in email or not email[field]:
-                    logger.error(f"Cannot generate response. Missing '{field}' in email: {email}")
-                    return None
-            
-            # Prepare prompt components
-            subject = email.get("subject", "")
-            body = email.get("body", "")
-            prompt = (
-                # Define assistant persona and frame task
-                "You are an expert AI assistant trained in customer service. "
-                "You will generate a structured response using reasoning steps and a clear, empathetic tone.\n"
-                # Chain-of-thought structure
-                "Follow these steps:\n"
-                "1. Summarize the user's issue.\n"
-                "2. Infer their tone (angry, happy, neutral, confused, unsure).\n"
-                "3. Judge urgency (low, medium, high, unsure).\n"
-                "4. Then write a short, professional, empathetic reply.\n\n"
-                # Include email content and classification context
-                f"Email:\nSubject: {subject}\nBody: {body}\n\n"
-                f"Category: {classification}\n\n"
-                # Expected output format
-                "Respond using this format:\n"
-                "Reasoning:\n"
-                "1. Summary: <summary>\n"
-                "2. Tone: <tone>\n"
-                "3. Urgency: <urgency>\n\n"
-                "Drafted Response:\n"
-                "<response>"
-            )
+            if not self._has_required_fields(email, "Cannot generate response."):
+                return None, {}
+
+            with self.metrics.time("email_prompt_build_seconds", call="respond"):
+                messages = self._response_messages(email, classification)
             logger.info(f"Generating response for email {email['id']} ({classification})...")
 
-            # OpenAI API call with retry logic to generate structured response
+            # OpenAI API call (retries and rate limits handled by the shared scheduler)
             # temperature=0.5 allows for slight variation in tone while maintaining coherence
-            for attempt in range(2):
-                try:
-                    response = self.client.chat.completions.create(
-                        model="gpt-3.5-turbo-0125",
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.5
-                    )
-                    break
-                except openai.error.RateLimitError:
-                    logger.warning("Rate limited. Retrying...")
-                    time.sleep(2)
-                except openai.error.APIError as e:
-                    logger.error(f"API error: {e}")
-                    return None
-                except openai.error.OpenAIError as e:
-                    logger.exception("OpenAI error during response generation.")
-                    return None
-                
-
-            
+            try:
+                response = self._create(messages, temperature=0.5, call="respond")
+            except api_errors() as e:
+                logger.error(f"OpenAI error during response generation of email {email['id']}: {e}")
+                return None, {}
+
             # Extract full response text from LLM output
-            full_response = response.choices[0].message.content.strip()
-            logger.debug(f"Raw generated response:\n{full_response}")
-
-            # Parse out the final drafted reply from model output
-            if "Drafted Response:" in full_response:
-                drafted = full_response.split("Drafted Response:")[1].strip()
-                logger.info(f"Response generated for email {email['id']}.")
-                return drafted
+            with self.metrics.time("email_output_parse_seconds", call="respond"):
+                content = response.choices[0].message.content
+                return self._parse_response(email, content), self._parse_reasoning(content)
+
+        # Log runtime errors
+        except Exception as e:
+            logger.error(f"Error generating response for email {email['id']}: {str(e)}")
+            return None, {}
+
+    def _consume_chunk(self, parser: ResponseStreamParser, chunk, on_reasoning: Optional[Callable]) -> str:
+        """Feed one streamed chunk to the parser, report new reasoning fields and return new reply text."""
+        self._record_usage("respond", getattr(chunk, "usage", None))
+        choices = getattr(chunk, "choices", None)
+        fields, text = parser.feed((choices[0].delta.content if choices else None) or "")
+        for field, value in fields.items():
+            if on_reasoning:
+                on_reasoning(field, value)
+        return text
+
+    def _finish_stream(self, email: Dict, parser: ResponseStreamParser, on_reasoning: Optional[Callable]) -> str:
+        """Flush the parser at the end of a stream and record how generation ended."""
+        fields, text = parser.finish()
+        for field, value in fields.items():
+            if on_reasoning:
+                on_reasoning(field, value)
+        self.metrics.counter("email_stream_stops_total").inc(reason=parser.stop_reason)
+        if not parser.in_response:
+            logger.warning(f"Unexpected format for email {email['id']}: no drafted response in the stream.")
+        elif parser.stop_reason != "end":
+            logger.info(f"Stopped generating the response for email {email['id']} early ({parser.stop_reason}).")
+        return text
+
+    def stream_response(self, email: Dict, classification: str, on_reasoning: Optional[Callable] = None,
+                        max_response_tokens: Optional[int] = None) -> Iterator[str]:
+        """
+        Generate a response as a token stream, yielding the drafted reply as it arrives.
+
+        Reasoning fields are passed to on_reasoning(field, value) as soon as their line is
+        complete, so routing decisions can be made before the reply is written. Generation
+        is cut off (the connection is closed) once the reply is followed by another section
+        or reaches max_response_tokens.
+
+        Args:
+            email (Dict): The original email content.
+            classification (str): The category the email was classified into.
+            on_reasoning (Optional[Callable]): Called with ('summary'|'tone'|'urgency', value).
+            max_response_tokens (Optional[int]): Length cap of the drafted reply.
+
+        Yields:
+            str: Consecutive pieces of the drafted reply.
+        """
+        email = self.preprocess(email)
+        if not self._has_required_fields(email, "Cannot generate response."):
+            return
+
+        with self.metrics.time("email_prompt_build_seconds", call="respond"):
+            messages = self._response_messages(email, classification)
+        parser = ResponseStreamParser(max_response_tokens * 4 if max_response_tokens else None)
+        logger.info(f"Streaming response for email {email['id']} ({classification})...")
+        try:
+            stream = self._create(messages, temperature=0.5, call="respond", stream=True,
+                                  stream_options={"include_usage": True})
+        except api_errors() as e:
+            logger.error(f"OpenAI error during response generation of email {email['id']}: {e}")
+            return
+
+        try:
+            for chunk in stream:
+                text = self._consume_chunk(parser, chunk, on_reasoning)
+                if text:
+                    yield text
+                if parser.done:
+                    break
+            text = self._finish_stream(email, parser, on_reasoning)
+            if text:
+                yield text
+        finally:
+            # Closing the response stops the server from generating tokens nobody reads
+            stream.close()
+
+    def generate_response_streaming(self, email: Dict, classification: str, on_reasoning: Optional[Callable] = None,
+                                    max_response_tokens: Optional[int] = None) -> Tuple[Optional[str], Dict]:
+        """
+        Streaming counterpart of generate_response_with_reasoning (see stream_response).
+
+        Returns:
+            Tuple[Optional[str], Dict]: The drafted reply (None on failure) and the parsed reasoning.
+        """
+        reasoning = {}
+
+        def report(field: str, value: str):
+            reasoning[field] = value
+            if on_reasoning:
+                on_reasoning(field, value)
+
+        try:
+            response = "".join(self.stream_response(email, classification, report, max_response_tokens)).strip()
+            return response or None, reasoning
+        except Exception as e:
+            logger.error(f"Error streaming response for email {email.get('id', 'unknown')}: {str(e)}")
+            return None, reasoning
+
+    @staticmethod
+    def _combined_result(category: str, confidence: int, response: Optional[str]) -> Optional[Dict]:
+        """Combined answer for an email classified without the LLM, whose reply was generated separately."""
+        if not response:
+            return None
+        return {"category": category, "confidence": confidence, "summary": "", "tone": "unsure",
+                "urgency": "unsure", "response": response}
+
+    def classify_and_respond(self, email: Dict) -> Optional[Dict]:
+        """
+        Classify an email and draft its reply with a single structured (JSON) LLM call.
+
+        Halves the requests per email compared to classify_email + generate_response.
+        Cached or locally classified emails only make the reply call.
+
+        Returns:
+            Optional[Dict]: category, confidence, summary, tone, urgency and response, or None on failure.
+        """
+        try:
+            email = self.preprocess(email)
+            if not self._has_required_fields(email, "Cannot classify email."):
+                return None
+
+            cached = self._classify_without_llm(email)
+            if cached:
+                return self._combined_result(*cached, self.generate_response(email, cached[0]))
+
+            with self.metrics.time("email_prompt_build_seconds", call="combined"):
+                messages = self._combined_messages(email)
+            logger.info(f"Classifying and responding to email {email['id']}...")
+
+            # temperature=0 keeps the classification deterministic
+            try:
+                response = self._create(messages, temperature=0, call="combined",
+                                        response_format={"type": "json_object"})
+            except api_errors() as e:
+                logger.error(f"OpenAI error during combined call for email {email['id']}: {e}")
+                return None
+
+            with self.metrics.time("email_output_parse_seconds", call="combined"):
+                parsed = self._parse_combined(email, response.choices[0].message.content)
+            if parsed:
+                self._store_classification(email, parsed["category"], parsed["confidence"])
+            return parsed
+
+        except Exception as e:
+            logger.error(f"Error in combined call for email {email['id']}: {str(e)}")
+            return None
+
+    def classify_batch(self, emails: List[Dict], batch_size: int = 10) -> List[Tuple[Optional[str], Optional[int]]]:
+        """
+        Classify many emails with one LLM request per batch_size emails.
+
+        The instruction block is sent once per batch instead of once per email.
+        Emails whose answer is missing or malformed are retried on their own with
+        classify_email.
+
+        Args:
+            emails (List[Dict]): Emails to classify.
+            batch_size (int): Number of emails packed into each request.
+
+        Returns:
+            List[Tuple[Optional[str], Optional[int]]]: (category, confidence) per email, in input order.
+                Emails that cannot be classified map to (None, None).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        emails = [self.preprocess(email) for email in emails]
+        results: List[Tuple[Optional[str], Optional[int]]] = [(None, None)] * len(emails)
+        pending = []
+        for index, email in enumerate(emails):
+            if not self._has_required_fields(email, "Cannot classify email."):
+                continue
+            cached = self._classify_without_llm(email)
+            if cached:
+                results[index] = cached
             else:
-                logger.warning(f"Unexpected format for email {email['id']}. Full response: {full_response}")
+                pending.append(index)
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = [emails[index] for index in chunk]
+            logger.info(f"Classifying batch of {len(batch)} emails...")
+
+            parsed = {}
+            try:
+                with self.metrics.time("email_prompt_build_seconds", call="classify_batch"):
+                    messages = self._batch_classification_messages(batch)
+                response = self._create(messages, temperature=0, call="classify_batch")
+                with self.metrics.time("email_output_parse_seconds", call="classify_batch"):
+                    parsed = self._parse_batch_classification(response.choices[0].message.content, len(batch))
+            except Exception as e:
+                logger.error(f"Error classifying batch: {str(e)}")
+
+            for position, index in enumerate(chunk, start=1):
+                email = emails[index]
+                if position in parsed:
+                    category, confidence = self._apply_confidence_fallback(email, *parsed[position])
+                    self._store_classification(email, category, confidence)
+                    results[index] = (category, confidence)
+                    continue
+
+                # Retry only the emails the batch answer did not cover
+                logger.warning(f"No usable batch answer for email {email['id']}. Retrying individually.")
+                results[index] = self.classify_email_with_confidence(email)
+
+        return results
+
+    def _record_call(self, call: str, started: float, response=None):
+        """Record latency and token usage (from response.usage) of one LLM call."""
+        self.metrics.histogram("email_llm_request_seconds").observe(time.perf_counter() - started, call=call)
+        if response is None:
+            self.metrics.counter("email_llm_errors_total").inc(call=call)
+            return
+        self._record_usage(call, getattr(response, "usage", None))
+
+    def _record_usage(self, call: str, usage):
+        """Record the token counts of a response's (or a stream's final chunk's) usage."""
+        if usage is None:
+            return
+        for field, metric in (("prompt_tokens", "email_llm_prompt_tokens_total"),
+                              ("completion_tokens", "email_llm_completion_tokens_total")):
+            tokens = getattr(usage, field, None)
+            if isinstance(tokens, int):
+                self.metrics.counter(metric).inc(tokens, call=call)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if isinstance(cached, int):
+            self.metrics.counter("email_llm_cached_prompt_tokens_total").inc(cached, call=call)
+
+    def _call_policy(self, call: str, options: Dict) -> Optional[CallPolicy]:
+        """Timeout/hedging policy of a call stage; None means a plain call (no policy and no email deadline)."""
+        policy = self.call_policies.get(call)
+        if policy is None and current_deadline() is not None:
+            policy = CallPolicy()
+        # A stream is consumed after the call returns, so it is never duplicated
+        if policy is not None and policy.hedge and options.get("stream"):
+            policy = CallPolicy(timeout=policy.timeout)
+        return policy
+
+    @staticmethod
+    def _attempt_deadline(timeout: Optional[float]) -> Optional[float]:
+        """Absolute deadline of an attempt given the time left for it; retries stop and requests time out at it."""
+        return time.monotonic() + timeout if timeout is not None else None
+
+    def _create(self, messages: List[Dict], temperature: float, call: str = "classify", model: Optional[str] = None,
+                **options):
+        """Chat completion call routed through the request scheduler; options are passed to the API."""
+        started = time.perf_counter()
+        response = None
+
+        def attempt(timeout: Optional[float]):
+            return self.scheduler.call(
+                self.client.chat.completions.create,
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                estimated_tokens=estimate_tokens(messages),
+                deadline=self._attempt_deadline(timeout),
+                **options
+            )
+
+        try:
+            policy = self._call_policy(call, options)
+            response = attempt(None) if policy is None else self.hedger.call(call, policy, attempt, current_deadline())
+            return response
+        finally:
+            self._record_call(call, started, response)
+
+    async def _acreate(self, messages: List[Dict], temperature: float, call: str = "classify",
+                       model: Optional[str] = None, **options):
+        """Async chat completion call routed through the request scheduler."""
+        started = time.perf_counter()
+        response = None
+
+        def attempt(timeout: Optional[float]):
+            return self.scheduler.acall(
+                self.async_client.chat.completions.create,
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                estimated_tokens=estimate_tokens(messages),
+                deadline=self._attempt_deadline(timeout),
+                **options
+            )
+
+        try:
+            policy = self._call_policy(call, options)
+            if policy is None:
+                response = await attempt(None)
+            else:
+                response = await self.hedger.acall(call, policy, attempt, current_deadline())
+            return response
+        finally:
+            self._record_call(call, started, response)
+
+    async def aclassify_email_with_confidence(self, email: Dict) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Async counterpart of classify_email that also returns the confidence score.
+
+        The confidence is returned rather than stored on the processor, since many
+        emails are classified concurrently.
+
+        Returns:
+            Tuple[Optional[str], Optional[int]]: The category and confidence, or (None, None) on failure.
+        """
+        try:
+            email = self.preprocess(email)
+            if not self._has_required_fields(email, "Cannot classify email."):
+                return None, None
+
+            cached = self._classify_without_llm(email)
+            if cached:
+                return cached
+
+            with self.metrics.time("email_prompt_build_seconds", call="classify"):
+                messages = self._classification_messages(email)
+            logger.info(f"Classifying email {email['id']}...")
+            if self.cascade is not None:
+                return await self._aclassify_cascade(email, messages)
+            response = await self._acreate(messages, temperature=0, call="classify")
+            with self.metrics.time("email_output_parse_seconds", call="classify"):
+                category, confidence = self._parse_classification(email, response.choices[0].message.content)
+            self._store_classification(email, category, confidence)
+            return category, confidence
+
+        except Exception as e:
+            logger.error(f"Error classifying email {email['id']}: {str(e)}")
+            return None, None
+
+    async def _aclassify_cascade(self, email: Dict, messages: List[Dict]) -> Tuple[Optional[str], Optional[int]]:
+        """Async counterpart of _classify_cascade."""
+        answer = None
+        for index, tier in enumerate(self.cascade.tiers):
+            try:
+                async with tier.aslot():
+                    response = await self._acreate(messages, temperature=0, call="classify", model=tier.model,
+                                                   timeout=tier.timeout)
+            except api_errors() as e:
+                logger.warning(f"{tier.model} failed to classify email {email['id']}: {e}")
+                self.cascade.record(tier, "error")
+                continue
+            answer, final = self._cascade_answer(email, index, response)
+            if final:
+                break
+        return self._finish_cascade(email, answer)
+
+    async def aclassify_email(self, email: Dict) -> Optional[str]:
+        """Async counterpart of classify_email."""
+        category, _ = await self.aclassify_email_with_confidence(email)
+        return category
+
+    async def agenerate_response(self, email: Dict, classification: str) -> Optional[str]:
+        """Async counterpart of generate_response."""
+        try:
+            email = self.preprocess(email)
+            if not self._has_required_fields(email, "Cannot generate response."):
                 return None
-        
-        # Log runtime errors
+
+            with self.metrics.time("email_prompt_build_seconds", call="respond"):
+                messages = self._response_messages(email, classification)
+            logger.info(f"Generating response for email {email['id']} ({classification})...")
+            response = await self._acreate(messages, temperature=0.5, call="respond")
+            with self.metrics.time("email_output_parse_seconds", call="respond"):
+                return self._parse_response(email, response.choices[0].message.content)
+
         except Exception as e:
             logger.error(f"Error generating response for email {email['id']}: {str(e)}")
             return None
 
+    async def astream_response(self, email: Dict, classification: str, on_reasoning: Optional[Callable] = None,
+                               max_response_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Async counterpart of stream_response."""
+        email = self.preprocess(email)
+        if not self._has_required_fields(email, "Cannot generate response."):
+            return
+
+        with self.metrics.time("email_prompt_build_seconds", call="respond"):
+            messages = self._response_messages(email, classification)
+        parser = ResponseStreamParser(max_response_tokens * 4 if max_response_tokens else None)
+        logger.info(f"Streaming response for email {email['id']} ({classification})...")
+        try:
+            stream = await self._acreate(messages, temperature=0.5, call="respond", stream=True,
+                                         stream_options={"include_usage": True})
+        except api_errors() as e:
+            logger.error(f"OpenAI error during response generation of email {email['id']}: {e}")
+            return
+
+        try:
+            async for chunk in stream:
+                text = self._consume_chunk(parser, chunk, on_reasoning)
+                if text:
+                    yield text
+                if parser.done:
+                    break
+            text = self._finish_stream(email, parser, on_reasoning)
+            if text:
+                yield text
+        finally:
+            await stream.close()
+
+    async def agenerate_response_streaming(self, email: Dict, classification: str,
+                                           on_reasoning: Optional[Callable] = None,
+                                           max_response_tokens: Optional[int] = None) -> Tuple[Optional[str], Dict]:
+        """Async counterpart of generate_response_streaming."""
+        reasoning = {}
+
+        def report(field: str, value: str):
+            reasoning[field] = value
+            if on_reasoning:
+                on_reasoning(field, value)
+
+        try:
+            parts = [text async for text in self.astream_response(email, classification, report, max_response_tokens)]
+            return "".join(parts).strip() or None, reasoning
+        except Exception as e:
+            logger.error(f"Error streaming response for email {email.get('id', 'unknown')}: {str(e)}")
+            return None, reasoning
+
+    async def aclassify_and_respond(self, email: Dict) -> Optional[Dict]:
+        """Async counterpart of classify_and_respond."""
+        try:
+            email = self.preprocess(email)
+            if not self._has_required_fields(email, "Cannot classify email."):
+                return None
+
+            cached = self._classify_without_llm(email)
+            if cached:
+                return self._combined_result(*cached, await self.agenerate_response(email, cached[0]))
+
+            with self.metrics.time("email_prompt_build_seconds", call="combined"):
+                messages = self._combined_messages(email)
+            logger.info(f"Classifying and responding to email {email['id']}...")
+            response = await self._acreate(messages, temperature=0, call="combined",
+                                           response_format={"type": "json_object"})
+            with self.metrics.time("email_output_parse_seconds", call="combined"):
+                parsed = self._parse_combined(email, response.choices[0].message.content)
+            if parsed:
+                self._store_classification(email, parsed["category"], parsed["confidence"])
+            return parsed
+
+        except Exception as e:
+            logger.error(f"Error in combined call for email {email['id']}: {str(e)}")
+            return None
+
 
 
 
 class EmailAutomationSystem:
-    def __init__(self, processor: EmailProcessor):
-        """Initialize the automation system with an EmailProcessor."""
+    def __init__(self, processor: EmailProcessor, near_duplicates: Optional["NearDuplicateIndex"] = None,
+                 reuse_responses: bool = False, checkpoint: Optional[CheckpointStore] = None,
+                 combined: bool = False, stream_responses: bool = False, max_response_tokens: Optional[int] = None,
+                 dispatcher: Optional[BufferedDispatcher] = None, email_deadline: Optional[float] = None):
+        """
+        Initialize the automation system with an EmailProcessor.
+
+        Args:
+            processor (EmailProcessor): Classifies emails and drafts responses.
+            near_duplicates (Optional[NearDuplicateIndex]): Index of processed emails whose
+                classification is reused for near-identical new emails.
+            reuse_responses (bool): Also reuse the near-duplicate's drafted response.
+            checkpoint (Optional[CheckpointStore]): Claims each email's handler before it runs,
+                so resumed or concurrent runs never repeat tickets and replies.
+            combined (bool): Classify and draft the reply in one structured LLM call
+                (see EmailProcessor.classify_and_respond) instead of two.
+            stream_responses (bool): Stream reply generation, creating the urgent ticket as soon
+                as the model reports high urgency and stopping once the reply is complete.
+            max_response_tokens (Optional[int]): Length cap of streamed replies.
+            dispatcher (Optional[BufferedDispatcher]): Queues handler side effects (tickets,
+                feedback, replies) for batched delivery to a backend instead of calling the
+                inline mock functions, so handler I/O doesn't hold up processing.
+            email_deadline (Optional[float]): Seconds an email may spend in LLM calls in
+                process_email/process_email_async; calls past it fail and the email is not handled.
+        """
         self.processor = processor
+        self.near_duplicates = near_duplicates
+        self.reuse_responses = reuse_responses
+        self.checkpoint = checkpoint
+        self.combined = combined
+        self.stream_responses = stream_responses
+        self.max_response_tokens = max_response_tokens
+        self.dispatcher = dispatcher
+        self.email_deadline = email_deadline
+        # Emails whose urgent ticket was already created while their reply streamed
+        self.escalated = set()
         # Route each classification to a corresponding handler
         self.response_handlers = {
             "complaint": self._handle_complaint,
@@ -264,59 +1167,369 @@ class EmailAutomationSystem:
             "other": self._handle_other
         }
 
-    def process_email(self, email: Dict) -> Dict:
-        """
-        Process a single email through classification, response generation, 
-        and appropriate handling (ticketing, logging, response dispatch).
-        """
-        result = {
-            "email_id": email.get("id", "unknown"),
+    @staticmethod
+    def _new_result(email: Dict) -> Dict:
+        """Create the per-email result record returned by every processing mode."""
+        return {
+            "email_id": email.get("id", "unknown") if isinstance(email, dict) else "unknown",
             "success": False,
             "classification": None,
             "confidence": None,
             "response_sent": None
         }
 
+    def _find_near_duplicate(self, email: Dict) -> Optional[Dict]:
+        """Look up an already processed near-identical email, if an index is configured."""
+        if self.near_duplicates is None:
+            return None
+        match = self.near_duplicates.query(email)
+        self.processor.metrics.counter("email_near_duplicate_lookups_total").inc(result="hit" if match else "miss")
+        if match:
+            logger.info(f"Email {email['id']} is a near-duplicate of {match['email_id']} ({match['similarity']:.2f}).")
+        return match
+
+    def _reused_response(self, match: Optional[Dict]) -> Optional[str]:
+        """Drafted response of a near-duplicate, when response reuse is enabled."""
+        if match and self.reuse_responses:
+            return match.get("response")
+        return None
+
+    def _remember_near_duplicate(self, email: Dict, result: Dict, match: Optional[Dict]):
+        """Index a freshly processed email so later near-duplicates can reuse its results."""
+        if self.near_duplicates is not None and match is None and result["success"]:
+            self.near_duplicates.add(email, result["classification"], result["confidence"], result["response_sent"])
+
+    def _record_processed(self, result: Dict, started: float):
+        """Record end-to-end latency and outcome of one email."""
+        self.escalated.discard(result["email_id"])
+        metrics = self.processor.metrics
+        metrics.histogram("email_processing_seconds").observe(time.perf_counter() - started)
+        metrics.counter("email_processed_total").inc(success=str(result["success"]).lower())
+
+    def _dispatch(self, email: Dict, classification: str, response: str, result: Dict) -> Dict:
+        """Route a classified email to its handler and mark the result as sent."""
+        # Route to appropriate handler (handles tickets, logs, and sending)
+        handler = self.response_handlers.get(classification, self._handle_other)
+        if self.checkpoint is not None and not self.checkpoint.claim_effect(email["id"], classification):
+            logger.info(f"Handler for email {email['id']} already ran in an earlier run. Not repeating it.")
+        else:
+            tracker = self._effect_tracker(email["id"])
+            token = _EFFECT_TRACKER.set(tracker)
+            try:
+                # Handlers (tickets, feedback, replies) get the email as received, not the cleaned text
+                with self.processor.metrics.time("email_handler_seconds", category=classification):
+                    handler(original_email(email), response)
+                self.escalated.discard(email["id"])
+            except Exception:
+                if self.checkpoint is not None:
+                    self.checkpoint.release_effect(email["id"])
+                raise
+            finally:
+                _EFFECT_TRACKER.reset(token)
+            self._confirm_effect(email["id"], tracker)
+
+        result["success"] = True
+        result["response_sent"] = response
+        logger.info(f"Successfully processed email {email['id']} as {classification}.")
+        return result
+
+    def _classify_step(self, email: Dict, result: Dict) -> Tuple[Optional[str], Optional[Dict], Optional[Dict]]:
+        """
+        Validate and classify an email, or reuse a near-duplicate's classification.
+
+        Fills in the result's classification and confidence. In combined mode the reply
+        is drafted by the same call.
+
+        Returns:
+            Tuple[Optional[str], Optional[Dict], Optional[Dict]]: The classification (None on failure),
+                the near-duplicate match it came from, if any, and the combined answer (with the
+                drafted reply, tone and urgency) in combined mode.
+        """
+        # Validate input
+        if not isinstance(email, dict) or "id" not in email:
+            logger.error("Invalid email format passed to process_email. Skipping...")
+            return None, None, None
+
+        answer = None
+        match = self._find_near_duplicate(email)
+        if match:
+            classification, confidence = match["category"], match["confidence"]
+        elif self.combined:
+            answer = self.processor.classify_and_respond(email) or {}
+            classification, confidence = answer.get("category"), answer.get("confidence")
+        else:
+            classification, confidence = self.processor.classify_email_with_confidence(email)
+        return self._record_classification(email, result, classification, confidence, match, answer)
+
+    @staticmethod
+    def _record_classification(email: Dict, result: Dict, classification: Optional[str], confidence: Optional[int],
+                               match: Optional[Dict], answer: Optional[Dict]
+                               ) -> Tuple[Optional[str], Optional[Dict], Optional[Dict]]:
+        """Store a classification on the result; shared by the sync and async paths."""
+        if not classification:
+            logger.error(f"Failed to classify email {email['id']}.")
+            return None, match, None
+
+        result["classification"] = classification
+        result["confidence"] = confidence
+        return classification, match, answer
+
+    def _escalate_early(self, email: Dict, classification: str, field: str, value: str):
+        """Create a complaint's urgent ticket as soon as its streamed reply reports high urgency."""
+        # Only complaints get urgent tickets (see _handle_complaint), streamed or not
+        if classification != "complaint" or field != "urgency" or value != "high" or email["id"] in self.escalated:
+            return
+        key = self._urgent_effect_key(email["id"])
+        if self.checkpoint is not None:
+            # Handlers of a resumed email already ran (or were claimed) in an earlier run
+            if self.checkpoint.effect_status(email["id"]) is not None:
+                return
+            # Claimed on its own, since the reply (and so _dispatch) may still fail or never run
+            if not self.checkpoint.claim_effect(key, "urgent_ticket"):
+                logger.info(f"Urgent ticket for email {email['id']} was already created in an earlier run.")
+                return
+        self.escalated.add(email["id"])
+        logger.info(f"Email {email['id']} is urgent. Creating the ticket before its reply is drafted.")
+        tracker = self._effect_tracker(key)
+        token = _EFFECT_TRACKER.set(tracker)
         try:
-            # Validate input
-            if not isinstance(email, dict) or "id" not in email:
-                logger.error("Invalid email format passed to process_email. Skipping...")
-                return result
+            self._side_effect("urgent_ticket", email_id=email["id"], category=classification,
+                              context=original_email(email).get("body", ""))
+        except Exception:
+            self.escalated.discard(email["id"])
+            if self.checkpoint is not None:
+                self.checkpoint.release_effect(key)
+            raise
+        finally:
+            _EFFECT_TRACKER.reset(token)
+        self._confirm_effect(key, tracker)
 
-            # Step 1: Classify the email
-            classification = self.processor.classify_email(email)
-            if not classification:
-                logger.error(f"Failed to classify email {email['id']}.")
-                return result
+    def _effect_tracker(self, key: str) -> Optional[_EffectTracker]:
+        """Tracker that confirms a claimed effect on delivery, when its records go through the dispatcher."""
+        if self.checkpoint is None or self.dispatcher is None:
+            return None
+        return _EffectTracker(self.checkpoint, key)
+
+    def _confirm_effect(self, key: str, tracker: Optional[_EffectTracker]):
+        """Confirm a handler that returned: now, or once the dispatcher has delivered its records."""
+        if tracker is not None:
+            tracker.seal()
+        elif self.checkpoint is not None:
+            self.checkpoint.confirm_effect(key)
+
+    @staticmethod
+    def _urgent_effect_key(email_id: str) -> str:
+        """Checkpoint key of the urgent ticket created early while streaming."""
+        return f"{email_id}:urgent"
+
+    def _escalated_before(self, email_id: str) -> bool:
+        """Whether the urgent ticket was created early, in this run or (with a checkpoint) an earlier one."""
+        if email_id in self.escalated:
+            return True
+        return (self.checkpoint is not None
+                and self.checkpoint.effect_status(self._urgent_effect_key(email_id)) is not None)
+
+    def _draft_response(self, email: Dict, classification: str) -> Tuple[Optional[str], Dict]:
+        """Generate a reply and its reasoning, streaming it when enabled."""
+        if not self.stream_responses:
+            return self.processor.generate_response_with_reasoning(email, classification)
+        return self.processor.generate_response_streaming(
+            email, classification, lambda field, value: self._escalate_early(email, classification, field, value),
+            self.max_response_tokens
+        )
+
+    def _generate_response(self, email: Dict, classification: str) -> Optional[str]:
+        """Generate a reply, streaming it when enabled."""
+        if not self.stream_responses:
+            return self.processor.generate_response(email, classification)
+        return self._draft_response(email, classification)[0]
+
+    async def _agenerate_response(self, email: Dict, classification: str) -> Optional[str]:
+        """Async counterpart of _generate_response."""
+        if not self.stream_responses:
+            return await self.processor.agenerate_response(email, classification)
+        response, _ = await self.processor.agenerate_response_streaming(
+            email, classification, lambda field, value: self._escalate_early(email, classification, field, value),
+            self.max_response_tokens
+        )
+        return response
+
+    def _respond_step(self, email: Dict, classification: str, match: Optional[Dict],
+                      answer: Optional[Dict] = None) -> Optional[str]:
+        """Use the combined call's reply, reuse a near-duplicate's drafted response, or generate one."""
+        response = ((answer or {}).get("response") or self._reused_response(match)
+                    or self._generate_response(email, classification))
+        if not response:
+            logger.error(f"Failed to generate response for email {email['id']}.")
+        return response
+
+    def _handle_step(self, email: Dict, classification: str, response: str, result: Dict, match: Optional[Dict]):
+        """Route to the category handler and index the email for near-duplicate reuse."""
+        self._dispatch(email, classification, response, result)
+        self._remember_near_duplicate(email, result, match)
+
+    def process_email(self, email: Dict) -> Dict:
+        """
+        Process a single email through classification, response generation, 
+        and appropriate handling (ticketing, logging, response dispatch).
+        """
+        result = self._new_result(email)
+        started = time.perf_counter()
+
+        try:
+            # Clean and cap the text once for the LLM calls and cache keys (handlers get the original)
+            email = self.processor.preprocess(email)
+
+            with deadline_scope(self.email_deadline):
+                # Step 1: Classify the email
+                classification, match, answer = self._classify_step(email, result)
+                if not classification:
+                    return result
+
+                # Step 2: Generate a response (already drafted in combined mode)
+                response = self._respond_step(email, classification, match, answer)
+                if not response:
+                    return result
+
+            # Step 3: Route to appropriate handler
+            self._handle_step(email, classification, response, result, match)
+
+        except Exception as e:
+            logger.error(f"Error processing email {result['email_id']}: {str(e)}")
+
+        finally:
+            self._record_processed(result, started)
+
+        return result
+
+    async def process_email_async(self, email: Dict) -> Dict:
+        """
+        Async counterpart of process_email, producing the same result dict.
 
-            result["classification"] = classification
-            if hasattr(self.processor, 'last_confidence'):
-                result["confidence"] = self.processor.last_confidence
+        Handlers are still invoked synchronously once the LLM calls complete, but records
+        that don't fit in the dispatcher queue are submitted with asubmit afterwards, so a
+        full queue doesn't block the event loop.
+        """
+        result = self._new_result(email)
+        started = time.perf_counter()
+        deferred = []
+        token = _DEFERRED_EFFECTS.set(deferred)
 
-            # Step 2: Generate a response
-            response = self.processor.generate_response(email, classification)
-            if not response:
-                logger.error(f"Failed to generate response for email {email['id']}.")
+        try:
+            # Validate input
+            if not isinstance(email, dict) or "id" not in email:
+                logger.error("Invalid email format passed to process_email_async. Skipping...")
                 return result
+            email = self.processor.preprocess(email)
+
+            with deadline_scope(self.email_deadline):
+                # Step 1: Classify the email (or reuse a near-duplicate's classification)
+                answer = None
+                match = self._find_near_duplicate(email)
+                if match:
+                    classification, confidence = match["category"], match["confidence"]
+                elif self.combined:
+                    answer = await self.processor.aclassify_and_respond(email) or {}
+                    classification, confidence = answer.get("category"), answer.get("confidence")
+                else:
+                    classification, confidence = await self.processor.aclassify_email_with_confidence(email)
+                classification, match, answer = self._record_classification(email, result, classification, confidence,
+                                                                            match, answer)
+                if not classification:
+                    return result
 
-            # Step 3: Route to appropriate handler (handles tickets, logs, and sending)
-            handler = self.response_handlers.get(classification, self._handle_other)
-            handler(email, response)
+                # Step 2: Generate a response (already drafted in combined mode)
+                response = ((answer or {}).get("response") or self._reused_response(match)
+                            or await self._agenerate_response(email, classification))
+                if not response:
+                    logger.error(f"Failed to generate response for email {email['id']}.")
+                    return result
 
-            result["success"] = True
-            result["response_sent"] = response
+            # Step 3: Route to appropriate handler
+            self._handle_step(email, classification, response, result, match)
 
         except Exception as e:
-            logger.error(f"Error processing email {email.get('id', 'unknown')}: {str(e)}")
+            logger.error(f"Error processing email {result['email_id']}: {str(e)}")
+
+        finally:
+            _DEFERRED_EFFECTS.reset(token)
+            await self._submit_deferred(deferred)
+            self._record_processed(result, started)
 
-        logger.info(f"Successfully processed email {email['id']} as {classification}.")
         return result
 
+    async def _submit_deferred(self, deferred: List[Tuple[str, Dict, Optional[Callable[[bool], None]]]]):
+        """Queue the side effects an async handler couldn't queue without blocking."""
+        for kind, record, on_delivered in deferred:
+            try:
+                await self.dispatcher.asubmit(kind, record, on_delivered)
+            except Exception as e:
+                logger.error(f"Failed to queue {kind} for email {record.get('email_id')}: {str(e)}")
+                if on_delivered is not None:
+                    on_delivered(False)
+
+    async def process_emails_async(self, emails: Iterable[Dict], max_concurrency: int = 8) -> List[Dict]:
+        """
+        Process many emails concurrently, keeping at most max_concurrency emails in flight.
+
+        Args:
+            emails (Iterable[Dict]): The emails to process.
+            max_concurrency (int): Upper bound on emails being classified/answered at once.
+
+        Returns:
+            List[Dict]: One result dict per email, in input order.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        # Workers pull from one shared iterator, so a generator source is read as it is processed
+        numbered = enumerate(emails)
+        results: Dict[int, Dict] = {}
+
+        async def worker():
+            for position, email in numbered:
+                results[position] = await self.process_email_async(email)
+
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        # Results are kept in input order regardless of completion order
+        return [results[position] for position in range(len(results))]
+
+    def process_stream(self, emails: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Lazily process an email stream, yielding one result dict per email.
+
+        Nothing is buffered, so memory stays flat regardless of mailbox size.
+        """
+        for email in emails:
+            yield self.process_email(email)
+
+    def _side_effect(self, kind: str, **record):
+        """Queue a handler side effect on the dispatcher, or run its mock function inline."""
+        if self.dispatcher is not None:
+            tracker = _EFFECT_TRACKER.get()
+            on_delivered = tracker.add() if tracker is not None else None
+            deferred = _DEFERRED_EFFECTS.get()
+            if deferred is None:
+                self.dispatcher.submit(kind, record, on_delivered)
+            elif not self.dispatcher.try_submit(kind, record, on_delivered):
+                deferred.append((kind, record, on_delivered))
+            return
+        functions = {
+            "urgent_ticket": create_urgent_ticket,
+            "support_ticket": create_support_ticket,
+            "feedback": log_customer_feedback,
+            "complaint_response": send_complaint_response,
+            "standard_response": send_standard_response,
+        }
+        # Record fields are named after the mock function's parameters
+        functions[kind](**record)
 
     def _handle_complaint(self, email: Dict, response: str):
         """Handle complaint emails by creating an urgent ticket."""
+        if self._escalated_before(email["id"]):
+            logger.info(f"Urgent ticket for email {email['id']} was already created while streaming.")
+            return
         # Create a support ticket for the complaint
-        create_urgent_ticket(email["id"], "complaint", email.get("body", ""))
+        self._side_effect("urgent_ticket", email_id=email["id"], category="complaint", context=email.get("body", ""))
 
     def _handle_inquiry(self, email: Dict, response: str):
         """Handle inquiry emails by logging inquiry."""
@@ -327,13 +1540,13 @@ class EmailAutomationSystem:
         """Handle feedback emails by logging the feedback."""
         # Record the feedback
         feedback_text = email.get("body", "")
-        log_customer_feedback(email["id"], feedback_text)
+        self._side_effect("feedback", email_id=email["id"], feedback=feedback_text)
 
     def _handle_support_request(self, email: Dict, response: str):
         """Handle support request emails by creating a support ticket."""
         # Create a support ticket based on the request
         context = email.get("body", "")
-        create_support_ticket(email["id"], context)
+        self._side_effect("support_ticket", email_id=email["id"], context=context)
 
 
     def _handle_other(self, email: Dict, response: str):
@@ -374,35 +1587,126 @@ def log_customer_feedback(email_id: str, feedback: str):
     # In real implementation: integrate with feedback system
 
 
-def run_demonstration():
-    """Run a demonstration of the complete system."""
+def run_demonstration(use_async: bool = False, max_concurrency: int = 8,
+                      output: str = "demo_results.parquet") -> Dict:
+    """
+    Run a demonstration of the complete system.
+
+    Args:
+        use_async (bool): Process the sample emails concurrently with the async pipeline.
+        max_concurrency (int): Maximum number of emails in flight when use_async is set.
+        output (str): Parquet or Arrow IPC file the results are written to.
+
+    Returns:
+        Dict: The summary computed from the results file (see summarize_results).
+    """
     # Initialize the system
     processor = EmailProcessor()
     automation_system = EmailAutomationSystem(processor)
 
-    # Process all sample emails
-    results = []
-    for email in sample_emails:
-        logger.info(f"\nProcessing email {email['id']}...")
-        result = automation_system.process_email(email)
-        results.append(result)
+    from results_sink import ResultsWriter, print_summary, summarize_results
 
-    # Create a summary DataFrame
-    df = pd.DataFrame(results)
-    print("\nProcessing Summary:")
-    print(df[["email_id", "success", "classification", "response_sent"]])
+    # Process all sample emails, appending each result to the columnar results file
+    with ResultsWriter(output) as writer:
+        if use_async:
+            writer.write_many(asyncio.run(
+                automation_system.process_emails_async(sample_emails, max_concurrency=max_concurrency)))
+        else:
+            for email in sample_emails:
+                logger.info(f"\nProcessing email {email['id']}...")
+                writer.write(automation_system.process_email(email))
 
+    # Summarize from the file, reading only the columns each report needs
     print("\n=== DEMO COMPLETED SUCCESSFULLY ===")
-    print("Summary of processed emails:\n")
-    print(df[["email_id", "success", "classification", "confidence"]].to_string(index=False))
-    print("\nGenerated responses (preview):\n")
-    for idx, row in df.iterrows():
-        print(f" Email {row['email_id']} → {row['classification']}")
-        print(f" Response:\n{row['response_sent'][:200]}...\n")  # Truncate for readability
+    print_summary(output)
+    return summarize_results(output)
+
+
+def write_results_jsonl(results: Iterable[Dict], path: str, chunk_size: int = 1000) -> int:
+    """
+    Write result dicts to a JSON Lines file as they are produced.
+
+    Results are flushed every chunk_size records, so at most one chunk is held in memory.
+
+    Returns:
+        int: Number of results written.
+    """
+    count = 0
+    chunk = []
+    with open(path, "w", encoding="utf-8") as f:
+        for result in results:
+            chunk.append(json.dumps(result))
+            count += 1
+            if len(chunk) >= chunk_size:
+                f.write("\n".join(chunk) + "\n")
+                f.flush()
+                chunk = []
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+    logger.info(f"Wrote {count} results to {path}.")
+    return count
+
+
+def save_results(results: Iterable[Dict], path: str, chunk_size: int = 1000) -> int:
+    """
+    Write results as Parquet/Arrow IPC (chosen by extension, chunk_size rows per row group) or JSON Lines.
+
+    Returns:
+        int: Number of results written.
+    """
+    from results_sink import results_format, write_results
+
+    if results_format(path):
+        return write_results(results, path, row_group_size=chunk_size)
+    return write_results_jsonl(results, path, chunk_size=chunk_size)
+
+
+def run_pipeline(source: str, output: str, fmt: Optional[str] = None, chunk_size: int = 1000) -> int:
+    """
+    Stream emails from a mailbox source through the system into a results file.
+
+    Args:
+        source (str): mbox file, Maildir directory or JSONL file.
+        output (str): Results file: .parquet, .arrow or JSON Lines.
+        fmt (Optional[str]): Source format; detected from the path when omitted.
+        chunk_size (int): Number of results buffered between writes.
+
+    Returns:
+        int: Number of emails processed.
+    """
+    from email_sources import iter_emails
+
+    automation_system = EmailAutomationSystem(EmailProcessor())
+    results = automation_system.process_stream(iter_emails(source, fmt))
+    return save_results(results, output, chunk_size=chunk_size)
+
+
+def main():
+    """Command-line entry point."""
+    import argparse
+
+    configure()
+    parser = argparse.ArgumentParser(description="Classify and respond to customer emails.")
+    parser.add_argument("--source", help="mbox file, Maildir directory or JSONL file to process")
+    parser.add_argument("--format", choices=["mbox", "maildir", "jsonl"], help="source format (detected by default)")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="results file for --source runs (.jsonl, .parquet or .arrow)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="results buffered between writes (row group size)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    parser.add_argument("--metrics-file", help="write the final metrics exposition to this file")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+
+    if args.source:
+        run_pipeline(args.source, args.output, fmt=args.format, chunk_size=args.chunk_size)
+    else:
+        run_demonstration()
 
-    return df
+    if args.metrics_file:
+        METRICS.dump(args.metrics_file)
 
 
-# Example usage:
 if __name__ == "__main__":
-    run_demonstration()
+    main()
@@ -0,0 +1,129 @@
+# Standard library
+import json
+import logging
+import os
+from email import policy
+from email.message import Message
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_parser = BytesParser(policy=policy.default)
+
+
+def message_to_email(message: Message, fallback_id: str) -> Dict:
+    """
+    Convert a parsed RFC 822 message into the email dict used by the pipeline.
+
+    Args:
+        message (Message): The parsed message.
+        fallback_id (str): Id used when the message has no Message-ID header.
+
+    Returns:
+        Dict: An email with 'id', 'from', 'subject', 'body' and 'timestamp' keys.
+    """
+    message_id = (message.get("Message-ID") or "").strip().strip("<>")
+
+    # Prefer the plain text part, fall back to HTML when that's all there is
+    body = ""
+    try:
+        part = message.get_body(preferencelist=("plain", "html"))
+        if part is not None:
+            body = part.get_content()
+    except (KeyError, LookupError, AttributeError):
+        logger.warning(f"Could not decode body of message {message_id or fallback_id}.")
+
+    timestamp = None
+    if message.get("Date"):
+        try:
+            timestamp = parsedate_to_datetime(str(message["Date"])).isoformat()
+        except (TypeError, ValueError):
+            timestamp = None
+
+    return {
+        "id": message_id or fallback_id,
+        "from": str(message.get("From", "")),
+        "subject": str(message.get("Subject", "")),
+        "body": body.strip(),
+        "timestamp": timestamp,
+    }
+
+
+def iter_mbox(path: str) -> Iterator[Dict]:
+    """
+    Lazily yield emails from an mbox file.
+
+    Messages are split on 'From ' separator lines while reading, so only one
+    message is held in memory at a time.
+    """
+    def parse(lines, index):
+        return message_to_email(_parser.parsebytes(b"".join(lines)), f"{os.path.basename(path)}-{index}")
+
+    index = 0
+    lines = []
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From "):
+                if lines:
+                    yield parse(lines, index)
+                    index += 1
+                lines = []
+                continue
+            # Undo mboxrd/mboxo quoting of body lines that start with 'From '
+            if line.startswith(b">From "):
+                line = line[1:]
+            lines.append(line)
+        if lines:
+            yield parse(lines, index)
+
+
+def iter_maildir(path: str) -> Iterator[Dict]:
+    """Lazily yield emails from a Maildir directory (its 'new' and 'cur' folders)."""
+    for folder in ("new", "cur"):
+        directory = os.path.join(path, folder)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                with open(entry.path, "rb") as f:
+                    message = _parser.parse(f)
+                # Maildir unique names look like '<unique>:2,<flags>'
+                yield message_to_email(message, entry.name.split(":")[0])
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Lazily yield emails from a JSON Lines file with one email object per line."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.error(f"Skipping malformed JSON on line {line_number} of {path}.")
+
+
+def iter_emails(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yield emails from a mailbox source, detecting the format when fmt is not given.
+
+    Args:
+        path (str): An mbox file, a Maildir directory or a .jsonl file.
+        fmt (Optional[str]): One of 'mbox', 'maildir' or 'jsonl'.
+    """
+    if fmt is None:
+        if os.path.isdir(path):
+            fmt = "maildir"
+        elif path.endswith((".jsonl", ".ndjson")):
+            fmt = "jsonl"
+        else:
+            fmt = "mbox"
+
+    readers = {"mbox": iter_mbox, "maildir": iter_maildir, "jsonl": iter_jsonl}
+    if fmt not in readers:
+        raise ValueError(f"Unknown email source format '{fmt}'. Expected one of {sorted(readers)}.")
+    return readers[fmt](path)
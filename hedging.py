@@ -0,0 +1,255 @@
+# Standard library
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Absolute time.monotonic() deadline of the email being processed, if any
+_DEADLINE: contextvars.ContextVar = contextvars.ContextVar("email_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call ran past its timeout or the email's deadline."""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Give every call made inside the block a shared deadline (nested scopes only tighten it)."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _DEADLINE.get()
+    token = _DEADLINE.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline set by the innermost deadline_scope, or None."""
+    return _DEADLINE.get()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies with quantile lookup."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        """
+        Args:
+            window (int): Most recent latencies kept.
+            min_samples (int): Samples needed before quantiles are reported.
+        """
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency at quantile q of the window, or None until min_samples are recorded."""
+        with self._lock:
+            if len(self._samples) < max(1, self.min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CallPolicy:
+    """Timeout and hedging settings of one call stage (classify, respond, combined, ...)."""
+
+    def __init__(self, timeout: Optional[float] = None, hedge: bool = False, hedge_quantile: float = 0.95,
+                 min_hedge_delay: float = 0.05, tracker: Optional[LatencyTracker] = None):
+        """
+        Args:
+            timeout (Optional[float]): Longest time for the whole call, hedges included, in seconds.
+            hedge (bool): Send a duplicate request when the first is slower than hedge_quantile.
+            hedge_quantile (float): Observed latency quantile after which the hedge is sent.
+            min_hedge_delay (float): Never hedge sooner than this, in seconds.
+            tracker (Optional[LatencyTracker]): Latency history; one is created per policy by default.
+        """
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.tracker = tracker or LatencyTracker()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off or has too little history."""
+        if not self.hedge:
+            return None
+        observed = self.tracker.quantile(self.hedge_quantile)
+        return None if observed is None else max(self.min_hedge_delay, observed)
+
+    def call_timeout(self, deadline: Optional[float] = None) -> Optional[float]:
+        """
+        Time left for a call starting now, given the policy timeout and an email deadline.
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed.
+        """
+        timeout = self.timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Email deadline passed before the call started")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+
+class Hedger:
+    """
+    Runs calls under a CallPolicy: enforces its timeout and, when enabled, hedges.
+
+    An attempt is a callable taking the timeout left for it (None for no limit), which
+    should be passed on to the API so a slow request is aborted. A hedge is a second
+    attempt sent once the first has run longer than the policy's observed latency
+    quantile; the first answer wins and the other attempt is cancelled (async) or
+    abandoned (sync, left to its own timeout).
+    """
+
+    def __init__(self, metrics=None, max_workers: int = 32):
+        """
+        Args:
+            metrics (Optional[MetricsRegistry]): Registry for hedge, cancellation and deadline counters.
+            max_workers (int): Threads running sync attempts.
+        """
+        self.metrics = metrics
+        self.max_workers = max_workers
+        self.stats = {"hedges": 0, "hedge_wins": 0, "cancelled": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, stat: str, call: str, amount: int = 1):
+        if not amount:
+            return
+        with self._lock:
+            self.stats[stat] += amount
+        if self.metrics is not None:
+            self.metrics.counter(f"email_llm_{stat}_total").inc(amount, call=call)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Created on first use so processors built before a fork don't carry threads over
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="hedge")
+            return self._pool
+
+    @staticmethod
+    def _timed(policy: CallPolicy, attempt: Callable, timeout: Optional[float]):
+        started = time.perf_counter()
+        result = attempt(timeout)
+        policy.tracker.observe(time.perf_counter() - started)
+        return result
+
+    def call(self, call: str, policy: CallPolicy, attempt: Callable[[Optional[float]], Any],
+             deadline: Optional[float] = None):
+        """
+        Run attempt under the policy.
+
+        Raises:
+            DeadlineExceeded: If no attempt answered within the timeout or deadline.
+            Exception: The error of the last failed attempt.
+        """
+        try:
+            timeout = policy.call_timeout(deadline)
+        except DeadlineExceeded:
+            self._count("deadline_exceeded", call)
+            raise
+        delay = policy.hedge_delay()
+        if timeout is None and delay is None:
+            return self._timed(policy, attempt, None)
+
+        started = time.monotonic()
+        end = started + timeout if timeout is not None else None
+        executor = self._executor()
+        futures = [executor.submit(self._timed, policy, attempt, timeout)]
+        if delay is not None and (end is None or started + delay < end):
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                self._count("hedges", call)
+                futures.append(executor.submit(self._timed, policy, attempt,
+                                               end - time.monotonic() if end is not None else None))
+
+        pending, error = set(futures), None
+        try:
+            while pending:
+                remaining = end - time.monotonic() if end is not None else None
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        if len(futures) > 1 and future is futures[1]:
+                            self._count("hedge_wins", call)
+                        return future.result()
+                    error = future.exception()
+        finally:
+            for future in pending:
+                future.cancel()
+            self._count("cancelled", call, len(pending))
+        if error is not None and not pending:
+            raise error
+        self._count("deadline_exceeded", call)
+        raise DeadlineExceeded(f"'{call}' call took longer than {timeout:.2f}s")
+
+    async def acall(self, call: str, policy: CallPolicy, attempt: Callable[[Optional[float]], Awaitable],
+                    deadline: Optional[float] = None):
+        """Async counterpart of call; losing attempts are cancelled."""
+        try:
+            timeout = policy.call_timeout(deadline)
+        except DeadlineExceeded:
+            self._count("deadline_exceeded", call)
+            raise
+        delay = policy.hedge_delay()
+
+        async def timed(timeout: Optional[float]):
+            started = time.perf_counter()
+            result = await attempt(timeout)
+            policy.tracker.observe(time.perf_counter() - started)
+            return result
+
+        if timeout is None and delay is None:
+            return await timed(None)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        end = started + timeout if timeout is not None else None
+        tasks: List[asyncio.Task] = [asyncio.ensure_future(timed(timeout))]
+        pending, error = set(tasks), None
+        try:
+            if delay is not None and (end is None or started + delay < end):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self._count("hedges", call)
+                    tasks.append(asyncio.ensure_future(timed(end - loop.time() if end is not None else None)))
+                    pending = set(tasks)
+            while pending:
+                remaining = end - loop.time() if end is not None else None
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self._count("hedge_wins", call)
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            self._count("cancelled", call, len(pending))
+        if error is not None and not pending:
+            raise error
+        self._count("deadline_exceeded", call)
+        raise DeadlineExceeded(f"'{call}' call took longer than {timeout:.2f}s")
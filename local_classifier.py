@@ -0,0 +1,193 @@
+# Standard library
+import json
+import logging
+import math
+import random
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["complaint", "inquiry", "feedback", "support_request", "other"]
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def _tokens(email: Dict) -> List[str]:
+    """Lowercased word tokens with digits collapsed, so '#12345' and '#67890' look alike."""
+    text = f"{email.get('subject', '')} {email.get('body', '')}".lower()
+    return [re.sub(r"\d+", "0", token) for token in _TOKEN_RE.findall(text)]
+
+
+def append_label(path: str, email: Dict, category: str, confidence: int):
+    """Append an LLM classification to a JSONL label log used for training."""
+    record = {
+        "id": email.get("id"),
+        "subject": email.get("subject", ""),
+        "body": email.get("body", ""),
+        "category": category,
+        "confidence": confidence,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_labels(path: str, min_confidence: int = 3) -> Iterable[Tuple[Dict, str]]:
+    """Yield (email, category) pairs from a label log, skipping low-confidence labels."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            category = record.get("category") or record.get("classification")
+            # Labels logged without a confidence count as confident; null or non-numeric ones are skipped
+            try:
+                confidence = int(record.get("confidence", 5))
+            except (TypeError, ValueError):
+                continue
+            if category not in CATEGORIES or confidence < min_confidence:
+                continue
+            yield record, category
+
+
+class LocalClassifier:
+    """
+    Hashed word n-gram multinomial logistic regression over the five categories.
+
+    Small enough to train in seconds on logged LLM labels and to run in
+    microseconds per email, so confident predictions can skip the API.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range: Tuple[int, int] = (1, 2)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.categories = list(CATEGORIES)
+        # Sparse weights: feature index -> one weight per category
+        self.weights: Dict[int, List[float]] = {}
+        self.bias = [0.0] * len(self.categories)
+
+    def features(self, email: Dict) -> Dict[int, float]:
+        """Hashed, log-scaled and L2-normalized n-gram counts."""
+        tokens = _tokens(email)
+        counts: Counter = Counter()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = " ".join(tokens[i:i + n])
+                counts[zlib.crc32(gram.encode("utf-8")) % self.n_features] += 1
+        values = {index: 1.0 + math.log(count) for index, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in values.values())) or 1.0
+        return {index: v / norm for index, v in values.items()}
+
+    def _probabilities(self, features: Dict[int, float]) -> List[float]:
+        scores = list(self.bias)
+        for index, value in features.items():
+            weights = self.weights.get(index)
+            if weights:
+                for k, weight in enumerate(weights):
+                    scores[k] += weight * value
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def train(self, examples: Iterable[Tuple[Dict, str]], epochs: int = 10,
+              learning_rate: float = 0.5, l2: float = 1e-5, seed: int = 0) -> int:
+        """
+        Fit the model with SGD on (email, category) pairs.
+
+        Returns:
+            int: Number of training examples used.
+        """
+        data = [(self.features(email), self.categories.index(category)) for email, category in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for features, label in data:
+                gradients = self._probabilities(features)
+                gradients[label] -= 1.0
+                for k, gradient in enumerate(gradients):
+                    self.bias[k] -= rate * gradient
+                for index, value in features.items():
+                    weights = self.weights.setdefault(index, [0.0] * len(self.categories))
+                    for k, gradient in enumerate(gradients):
+                        weights[k] -= rate * (gradient * value + l2 * weights[k])
+        logger.info(f"Trained local classifier on {len(data)} examples.")
+        return len(data)
+
+    def predict(self, email: Dict) -> Tuple[str, float]:
+        """Return the most likely category and its probability."""
+        probabilities = self._probabilities(self.features(email))
+        best = max(range(len(self.categories)), key=probabilities.__getitem__)
+        return self.categories[best], probabilities[best]
+
+    def save(self, path: str):
+        """Persist the model as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "n_features": self.n_features,
+                "ngram_range": list(self.ngram_range),
+                "categories": self.categories,
+                "bias": self.bias,
+                "weights": {str(index): weights for index, weights in self.weights.items()},
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        """Load a model written by save."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(n_features=data["n_features"], ngram_range=tuple(data["ngram_range"]))
+        model.categories = data["categories"]
+        model.bias = data["bias"]
+        model.weights = {int(index): weights for index, weights in data["weights"].items()}
+        return model
+
+
+def evaluate(model: LocalClassifier, examples: Iterable[Tuple[Dict, str]], threshold: float) -> Dict:
+    """
+    Report how much traffic the model would keep local at a confidence threshold.
+
+    Returns:
+        Dict: total, escalation_rate and accuracy on the emails handled locally.
+    """
+    total = handled = correct = 0
+    for email, category in examples:
+        total += 1
+        predicted, confidence = model.predict(email)
+        if confidence >= threshold:
+            handled += 1
+            correct += predicted == category
+    return {
+        "total": total,
+        "escalation_rate": (total - handled) / total if total else 0.0,
+        "local_accuracy": correct / handled if handled else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train or evaluate the local pre-classifier.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = subcommands.add_parser("train", help="train a model from a JSONL label log")
+    train_cmd.add_argument("labels")
+    train_cmd.add_argument("model")
+    train_cmd.add_argument("--epochs", type=int, default=10)
+    eval_cmd = subcommands.add_parser("evaluate", help="report escalation rate on a JSONL label log")
+    eval_cmd.add_argument("labels")
+    eval_cmd.add_argument("model")
+    eval_cmd.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        classifier = LocalClassifier()
+        classifier.train(read_labels(args.labels), epochs=args.epochs)
+        classifier.save(args.model)
+        print(json.dumps(evaluate(classifier, read_labels(args.labels), 0.9)))
+    else:
+        print(json.dumps(evaluate(LocalClassifier.load(args.model), read_labels(args.labels), args.threshold)))
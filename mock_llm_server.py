@@ -0,0 +1,299 @@
+# Standard library
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keyword rules used to pick a plausible canned category for an email
+CATEGORY_KEYWORDS = [
+    ("complaint", ("refund", "broken", "damaged", "unacceptable", "worst")),
+    ("support_request", ("error", "install", "help", "crash", "cannot")),
+    ("feedback", ("thank", "great", "excellent", "love")),
+    ("inquiry", ("question", "could you", "compatible", "price", "?")),
+]
+
+URGENCY = {"complaint": "high", "support_request": "medium", "inquiry": "low", "feedback": "low", "other": "low"}
+TONE = {"complaint": "angry", "support_request": "confused", "inquiry": "neutral", "feedback": "happy", "other": "neutral"}
+
+
+def canned_category(text: str) -> str:
+    """Deterministically pick a category for an email's text."""
+    lowered = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return category
+    return "other"
+
+
+def _email_blocks(prompt: str) -> List[str]:
+    """Split a prompt into the text of each embedded email."""
+    return re.split(r"\nEmail(?: \d+)?:\n", prompt)[1:] or [prompt]
+
+
+def canned_reply(messages: List[Dict]) -> str:
+    """Build a response in the format the prompt asks for."""
+    prompt = "\n".join(message.get("content") or "" for message in messages)
+    if "Drafted Response" in prompt:
+        category = canned_category(_email_blocks(prompt)[-1])
+        return (
+            "Reasoning:\n"
+            "1. Summary: The customer wrote in about their request.\n"
+            f"2. Tone: {TONE[category]}\n"
+            f"3. Urgency: {URGENCY[category]}\n\n"
+            "Drafted Response:\n"
+            "Thank you for reaching out. We have received your message and our team will follow up shortly."
+        )
+    if "JSON object with these keys" in prompt:
+        category = canned_category(_email_blocks(prompt)[-1])
+        return json.dumps({
+            "category": category,
+            "confidence": 4,
+            "summary": "The customer wrote in about their request.",
+            "tone": TONE[category],
+            "urgency": URGENCY[category],
+            "response": "Thank you for reaching out. We have received your message and our team will follow up shortly.",
+        })
+    if "JSON object mapping each email number" in prompt:
+        blocks = _email_blocks(prompt)
+        return json.dumps({str(i): {"category": canned_category(block), "confidence": 4}
+                           for i, block in enumerate(blocks, start=1)})
+    return f"Category: {canned_category(_email_blocks(prompt)[-1])}\nConfidence: 4"
+
+
+class MockLLMServer:
+    """
+    Local OpenAI-compatible chat completions server for offline tests and benchmarks.
+
+    Latency is drawn from a log-normal distribution and a configurable share of
+    requests is rejected with 429 and a Retry-After header. Both are seeded per
+    request body, so the same corpus produces the same latencies and rejections
+    on every run regardless of concurrency. Requests with stream=True are answered
+    as server-sent events, one word per chunk.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, latency_sigma: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 0.05, seed: int = 0, host: str = "127.0.0.1", port: int = 0,
+                 cache_min_tokens: int = 0, stream_token_ms: float = 0.0):
+        """
+        Args:
+            latency_ms (float): Median response latency in milliseconds.
+            latency_sigma (float): Log-normal sigma; 0 gives a fixed latency, ~0.5 a realistic tail.
+            rate_limit_rate (float): Probability that an attempt is rejected with 429.
+            retry_after (float): Retry-After value (seconds) sent with 429 responses.
+            seed (int): Seed for latency and 429 draws.
+            host (str): Interface to bind.
+            port (int): Port to bind; 0 picks a free port.
+            cache_min_tokens (int): Shortest system message reported as a prompt-cache hit once
+                seen before (OpenAI only caches prefixes of 1024+ tokens).
+            stream_token_ms (float): Delay between streamed chunks in milliseconds.
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.requests = 0
+        self.rate_limited = 0
+        self.cache_min_tokens = cache_min_tokens
+        self.stream_token_ms = stream_token_ms
+        self.streamed_chunks = 0
+        self.streams_aborted = 0
+        self._cached_prefixes = set()
+        self._attempts: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _draw(self, body: bytes):
+        """
+        Per-request (latency seconds, rate limited?) draw, deterministic for a body and attempt.
+
+        Concurrent duplicates of a body (hedged requests) get independent draws.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            duplicate = self._in_flight.get(digest, 0)
+            self._in_flight[digest] = duplicate + 1
+            self.requests += 1
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}" + (f":{duplicate}" if duplicate else ""))
+        latency = self.latency_ms / 1000.0
+        if self.latency_sigma:
+            latency *= rng.lognormvariate(0, self.latency_sigma)
+        limited = rng.random() < self.rate_limit_rate
+        # Only rejected bodies are tracked, so memory stays flat over long runs
+        with self._lock:
+            if limited:
+                self.rate_limited += 1
+                self._attempts[digest] = attempt + 1
+            else:
+                self._attempts.pop(digest, None)
+        return latency, limited
+
+    def _finished(self, body: bytes):
+        """Mark a request drawn by _draw as answered."""
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            remaining = self._in_flight.pop(digest, 1) - 1
+            if remaining:
+                self._in_flight[digest] = remaining
+
+    def _cached_tokens(self, messages: List[Dict]) -> int:
+        """Simulate a provider prompt cache keyed on the leading system message."""
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = messages[0].get("content") or ""
+        tokens = len(prefix) // 4
+        if tokens < self.cache_min_tokens:
+            return 0
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            hit = digest in self._cached_prefixes
+            self._cached_prefixes.add(digest)
+        return tokens if hit else 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls between them
+            disable_nagle_algorithm = True
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_event(self, payload) -> None:
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+
+            def _send_stream(self, request: Dict, content: str, usage: Dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def chunk(delta: Dict, finish_reason: Optional[str]) -> Dict:
+                    return {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": request.get("model", "mock"),
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+                try:
+                    for index, piece in enumerate(re.findall(r"\s*\S+", content)):
+                        self._send_event(chunk({"role": "assistant", "content": piece} if index == 0
+                                               else {"content": piece}, None))
+                        with server._lock:
+                            server.streamed_chunks += 1
+                        if server.stream_token_ms:
+                            time.sleep(server.stream_token_ms / 1000.0)
+                    self._send_event(chunk({}, "stop"))
+                    if (request.get("stream_options") or {}).get("include_usage"):
+                        self._send_event({"id": "chatcmpl-mock", "object": "chat.completion.chunk",
+                                          "created": int(time.time()), "model": request.get("model", "mock"),
+                                          "choices": [], "usage": usage})
+                    self._send_event("[DONE]")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading; stop generating like a real server would
+                    with server._lock:
+                        server.streams_aborted += 1
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    self._answer(json.loads(raw or b"{}"), *server._draw(raw))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the request, e.g. a cancelled hedge
+                    self.close_connection = True
+                finally:
+                    server._finished(raw)
+
+            def _answer(self, request: Dict, latency: float, limited: bool):
+                if limited:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                    {"retry-after": str(server.retry_after)})
+                    return
+                time.sleep(latency)
+                messages = request.get("messages", [])
+                content = canned_reply(messages)
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                         "total_tokens": prompt_tokens + len(content) // 4,
+                         "prompt_tokens_details": {"cached_tokens": server._cached_tokens(messages)}}
+                if request.get("stream"):
+                    self._send_stream(request, content, usage)
+                    return
+                self._send_json(200, {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                })
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self) -> "MockLLMServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Mock LLM server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock LLM server.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockLLMServer(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                         rate_limit_rate=args.rate_limit_rate, seed=args.seed, port=args.port)
+    print(f"export OPENAI_BASE_URL={mock.base_url}")
+    mock._server.serve_forever()
@@ -0,0 +1,115 @@
+# Standard library
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("accepted", "escalated", "error")
+
+
+class CascadeTier:
+    """One model of a cascade with its own request timeout and concurrency limit."""
+
+    def __init__(self, model: str, timeout: float = 30.0, max_concurrency: int = 8, min_confidence: int = 3):
+        """
+        Args:
+            model (str): Model name sent to the API.
+            timeout (float): Per-request timeout in seconds; a timed-out email moves to the next tier.
+            max_concurrency (int): Most requests in flight on this tier at once.
+            min_confidence (int): Lowest confidence (1-5) accepted without escalating.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.min_confidence = min_confidence
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        # asyncio semaphores are bound to the loop they are first used on
+        self._async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the tier's concurrency slots."""
+        with self._semaphore:
+            yield
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async counterpart of slot."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            yield
+
+
+class ModelCascade:
+    """
+    Ordered classification tiers, cheapest first.
+
+    An email moves on to the next tier when a tier's answer has an invalid category or
+    a confidence below the tier's min_confidence, or when the call fails. The last
+    tier's answer is final (low confidence still falls back to 'other'). Calls,
+    outcomes and token usage are tracked per tier.
+    """
+
+    def __init__(self, tiers: List[CascadeTier], metrics=None):
+        """
+        Args:
+            tiers (List[CascadeTier]): Tiers in escalation order.
+            metrics (Optional[MetricsRegistry]): Registry for per-tier decisions and tokens.
+        """
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.tiers = tiers
+        self.metrics = metrics
+        self._stats = {tier.model: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                    **{outcome: 0 for outcome in OUTCOMES}} for tier in tiers}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """Identifies the cascade in cache keys, e.g. 'gpt-4o-mini>gpt-4o'."""
+        return ">".join(tier.model for tier in self.tiers)
+
+    @staticmethod
+    def should_escalate(tier: CascadeTier, category: Optional[str], confidence: int, valid_categories) -> bool:
+        """Whether a tier's answer is too weak to accept."""
+        return category not in valid_categories or confidence < tier.min_confidence
+
+    def record(self, tier: CascadeTier, outcome: str, response=None):
+        """Count one call on a tier with its outcome and token usage."""
+        usage = getattr(response, "usage", None)
+        tokens = {field: getattr(usage, field, None) for field in ("prompt_tokens", "completion_tokens")}
+        with self._lock:
+            stats = self._stats[tier.model]
+            stats["calls"] += 1
+            stats[outcome] += 1
+            for field, value in tokens.items():
+                if isinstance(value, int):
+                    stats[field] += value
+        if self.metrics is not None:
+            self.metrics.counter("email_cascade_calls_total", "Cascade classification calls by model and outcome."
+                                 ).inc(model=tier.model, outcome=outcome)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per-tier counts.
+
+        Returns:
+            Dict[str, Dict]: For each model: calls, accepted, escalated, error, token
+                totals, escalation_rate, and share (its fraction of all accepted answers).
+        """
+        with self._lock:
+            stats = {model: dict(values) for model, values in self._stats.items()}
+        accepted = sum(values["accepted"] for values in stats.values())
+        for values in stats.values():
+            values["escalation_rate"] = values["escalated"] / values["calls"] if values["calls"] else 0.0
+            values["share"] = values["accepted"] / accepted if accepted else 0.0
+        return stats
@@ -0,0 +1,164 @@
+# Standard library
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Third-party libraries
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used for the MinHash permutations; 31-bit values keep a*x+b inside uint64
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_for_similarity(email: Dict) -> List[str]:
+    """Word tokens of subject and body with digits collapsed, so '#12345' matches '#67890'."""
+    text = f"{email.get('subject', '')} {email.get('body', '')}".lower()
+    return [re.sub(r"\d+", "0", word) for word in _WORD_RE.findall(text)]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index over normalized email text.
+
+    Signatures are split into bands; emails sharing any band bucket are candidate
+    duplicates, which are then confirmed with the estimated Jaccard similarity.
+    Lookups only touch the candidate buckets, so they stay fast as the index
+    grows. Each entry carries the classification (and optionally the drafted
+    reply) of the email it was built from so they can be reused.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, path: Optional[str] = None, seed: int = 1):
+        """
+        Args:
+            threshold (float): Minimum estimated Jaccard similarity for a match.
+            num_perm (int): MinHash signature length.
+            bands (int): LSH bands; num_perm must be divisible by it.
+            shingle_size (int): Words per shingle.
+            path (Optional[str]): SQLite file used to persist the index, or None for memory only.
+            seed (int): Seed for the hash permutations (must match between runs sharing a file).
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hits = 0
+        self.misses = 0
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._payloads: Dict[str, Dict] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+        self._lock = threading.Lock()
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS near_duplicates ("
+                "email_id TEXT PRIMARY KEY, signature BLOB NOT NULL, category TEXT NOT NULL, "
+                "confidence INTEGER, response TEXT)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        """Rebuild the in-memory buckets from the persistent store."""
+        for email_id, signature, category, confidence, response in self._db.execute(
+                "SELECT email_id, signature, category, confidence, response FROM near_duplicates"):
+            payload = {"email_id": email_id, "category": category, "confidence": confidence, "response": response}
+            self._index(email_id, np.frombuffer(signature, dtype=np.uint64), payload)
+        logger.info(f"Loaded {len(self)} near-duplicate entries.")
+
+    def signature(self, email: Dict) -> np.ndarray:
+        """Compute the MinHash signature of an email's normalized text."""
+        words = normalize_for_similarity(email)
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+             for s in shingles],
+            dtype=np.uint64,
+        )
+        # One row per shingle, one column per permutation; take the column minimum
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _index(self, email_id: str, signature: np.ndarray, payload: Dict):
+        self._signatures[email_id] = signature
+        self._payloads[email_id] = payload
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(email_id)
+
+    def query(self, email: Dict) -> Optional[Dict]:
+        """
+        Find the most similar indexed email at or above the threshold.
+
+        Returns:
+            Optional[Dict]: The stored payload ('email_id', 'category', 'confidence', 'response')
+                plus its 'similarity', or None when nothing is close enough.
+        """
+        signature = self.signature(email)
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+
+            best_id, best_similarity = None, 0.0
+            for candidate in candidates:
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity > best_similarity:
+                    best_id, best_similarity = candidate, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(self._payloads[best_id], similarity=best_similarity)
+
+    def add(self, email: Dict, category: str, confidence: Optional[int] = None, response: Optional[str] = None):
+        """Insert an email's classification (and optional drafted reply) into the index."""
+        email_id = str(email["id"])
+        signature = self.signature(email)
+        payload = {"email_id": email_id, "category": category, "confidence": confidence, "response": response}
+        with self._lock:
+            if email_id in self._signatures:
+                return
+            self._index(email_id, signature, payload)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO near_duplicates (email_id, signature, category, confidence, response) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (email_id, signature.tobytes(), category, confidence, response),
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the number of indexed emails."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "size": len(self)}
+
+    def close(self):
+        """Close the persistent store, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
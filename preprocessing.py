@@ -0,0 +1,201 @@
+# Standard library
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Key added to preprocessed emails; its presence makes preprocessing a no-op
+MARKER = "preprocessed"
+
+_HTML_RE = re.compile(r"<\s*(html|body|div|p|br|table|span|font|td)\b", re.IGNORECASE)
+_BLOCK_TAGS = {"br", "p", "div", "li", "tr", "table", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "hr"}
+_SKIP_TAGS = {"script", "style", "head", "title"}
+
+# Long runs of base64 alphabet (attachments, inline images, data: URIs)
+_BASE64_RE = re.compile(r"(?:data:[\w/+.-]+;base64,)?[A-Za-z0-9+/]{80,}={0,2}")
+
+# Lines that start the quoted history of a reply or forward
+_REPLY_HEADER_RE = re.compile(
+    r"^(?:On .{0,200}wrote:|-{2,}\s*Original Message\s*-{2,}|-{2,}\s*Forwarded message\s*-{2,}|_{10,}"
+    r"|From: .+\n(?:Sent|Date): .+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Signature delimiter ("-- ") and mobile client footers
+_SIGNATURE_RE = re.compile(r"^(?:--\s*|Sent from my .+|Get Outlook for .+)$", re.IGNORECASE | re.MULTILINE)
+
+TRUNCATION_MARKER = "\n[...]\n"
+
+
+def original_email(email: Dict) -> Dict:
+    """The email as received, before Preprocessor.process (the email itself if never processed)."""
+    if isinstance(email, dict) and MARKER in email:
+        return email[MARKER].get("original", email)
+    return email
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count (about four characters per token, as in rate_limiter.estimate_tokens)."""
+    return (len(text) + 3) // 4
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, turning block elements into line breaks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS and self._skipping:
+            self._skipping -= 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML body to plain text."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+def strip_base64(text: str) -> str:
+    """Remove base64 blobs such as inline attachments and data: URIs."""
+    return _BASE64_RE.sub("", text)
+
+
+def strip_quoted(text: str) -> str:
+    """Drop quoted reply history: everything after a reply/forward header, and '>' lines."""
+    match = _REPLY_HEADER_RE.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    return "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(">"))
+
+
+def strip_signature(text: str) -> str:
+    """Cut the body at a signature delimiter or mobile client footer."""
+    match = _SIGNATURE_RE.search(text)
+    if match and match.start() > 0:
+        return text[:match.start()]
+    return text
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines, keeping paragraph breaks."""
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def truncate_head_tail(text: str, max_tokens: int, head_fraction: float = 0.7) -> str:
+    """
+    Shorten text to about max_tokens, keeping its beginning and end.
+
+    The opening usually states the issue and the end often holds the actual
+    question or order number, so the middle is dropped.
+    """
+    if estimate_text_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    head_chars = int(budget * head_fraction)
+    tail_chars = budget - head_chars
+    head = text[:head_chars]
+    tail = text[len(text) - tail_chars:] if tail_chars else ""
+    # Cut at word boundaries so no half-words reach the model
+    if " " in head:
+        head = head[:head.rfind(" ")]
+    if " " in tail:
+        tail = tail[tail.find(" ") + 1:]
+    return head.rstrip() + TRUNCATION_MARKER + tail.lstrip()
+
+
+class Preprocessor:
+    """
+    Normalizes and caps email text before it reaches the LLM, caches or indexes.
+
+    Bodies are converted from HTML, stripped of base64 blobs, quoted reply history
+    and signatures, whitespace-collapsed and truncated (head and tail kept) to a
+    token budget, so per-email cost and latency are bounded by policy.
+    """
+
+    def __init__(self, max_body_tokens: Optional[int] = 1000, head_fraction: float = 0.7,
+                 strip_quotes: bool = True, strip_signatures: bool = True, metrics=None):
+        """
+        Args:
+            max_body_tokens (Optional[int]): Body token budget, or None to never truncate.
+            head_fraction (float): Share of the budget kept from the start of the body.
+            strip_quotes (bool): Remove quoted reply/forward history.
+            strip_signatures (bool): Remove signatures and mobile footers.
+            metrics (Optional[MetricsRegistry]): Registry that tokens saved are recorded on.
+        """
+        if max_body_tokens is not None and max_body_tokens < 1:
+            raise ValueError("max_body_tokens must be at least 1")
+        if not 0 <= head_fraction <= 1:
+            raise ValueError("head_fraction must be between 0 and 1")
+        self.max_body_tokens = max_body_tokens
+        self.head_fraction = head_fraction
+        self.strip_quotes = strip_quotes
+        self.strip_signatures = strip_signatures
+        self.metrics = metrics
+        self.tokens_saved = 0
+
+    def clean_body(self, body: str) -> str:
+        """
+        Apply every enabled cleaning step and the token budget to a body.
+
+        A body that is nothing but quoted history or a signature keeps its text rather
+        than becoming empty.
+        """
+        text = strip_base64(html_to_text(body) if _HTML_RE.search(body) else body)
+        stripped = text
+        if self.strip_quotes:
+            stripped = strip_quoted(stripped)
+        if self.strip_signatures:
+            stripped = strip_signature(stripped)
+        body = collapse_whitespace(stripped) or collapse_whitespace(text) or collapse_whitespace(body)
+        if self.max_body_tokens:
+            body = truncate_head_tail(body, self.max_body_tokens, self.head_fraction)
+        return body
+
+    def process(self, email: Dict) -> Dict:
+        """
+        Return a cleaned copy of an email.
+
+        The copy carries a 'preprocessed' entry with tokens_before, tokens_after,
+        tokens_saved and the original email (see original_email); emails that already
+        have it are returned unchanged.
+        """
+        if not isinstance(email, dict) or MARKER in email:
+            return email
+        subject = email.get("subject")
+        body = email.get("body")
+        cleaned = dict(email)
+        if isinstance(subject, str):
+            cleaned["subject"] = collapse_whitespace(subject)
+        if isinstance(body, str):
+            cleaned["body"] = self.clean_body(body)
+
+        before = estimate_text_tokens(f"{subject or ''} {body or ''}")
+        after = estimate_text_tokens(f"{cleaned.get('subject') or ''} {cleaned.get('body') or ''}")
+        saved = max(0, before - after)
+        cleaned[MARKER] = {"tokens_before": before, "tokens_after": after, "tokens_saved": saved, "original": email}
+        self.tokens_saved += saved
+        if self.metrics is not None:
+            self.metrics.counter("email_preprocess_tokens_saved_total").inc(saved)
+        if saved:
+            logger.info(f"Preprocessing saved ~{saved} tokens on email {email.get('id', 'unknown')} "
+                        f"({before} -> {after}).")
+        return cleaned
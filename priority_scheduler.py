@@ -0,0 +1,301 @@
+# Standard library
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Local modules
+from email_classifier_template import EmailAutomationSystem
+from hedging import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the result stream
+_DONE = object()
+
+# Priority points; higher is served sooner
+KEYWORD_POINTS = {
+    "urgent": 3, "asap": 2, "immediately": 2, "unacceptable": 2, "refund": 2, "broken": 2,
+    "damaged": 2, "cancel": 2, "lawyer": 2, "worst": 1, "error": 1, "not working": 1, "help": 1,
+}
+CATEGORY_POINTS = {"complaint": 6, "support_request": 3, "inquiry": 1, "feedback": 0, "other": 0}
+URGENCY_POINTS = {"high": 4, "medium": 2, "unsure": 1, "low": 0}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class PriorityScorer:
+    """
+    Scores emails from cheap local signals, refined as processing reveals more.
+
+    Before any LLM call the score uses keywords, the sender's complaint history and
+    how long ago the email was sent; the category is added once the email is
+    classified, and the urgency from the reply's reasoning once it is drafted.
+    """
+
+    def __init__(self, max_keyword_points: int = 5, max_history_points: int = 2,
+                 age_step_hours: float = 24.0, max_age_points: int = 3):
+        """
+        Args:
+            max_keyword_points (int): Cap on points from keywords.
+            max_history_points (int): Cap on points from the sender's earlier complaints.
+            age_step_hours (float): Email age worth one point.
+            max_age_points (int): Cap on points from email age.
+        """
+        self.max_keyword_points = max_keyword_points
+        self.max_history_points = max_history_points
+        self.age_step_hours = age_step_hours
+        self.max_age_points = max_age_points
+        self.sender_complaints: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def local_score(self, email: Dict, now: Optional[datetime] = None) -> float:
+        """Score from keywords, sender history and email age; no LLM involved."""
+        text = f"{email.get('subject', '')} {email.get('body', '')}".lower()
+        keywords = sum(points for keyword, points in KEYWORD_POINTS.items() if keyword in text)
+        history = self.sender_complaints.get(str(email.get("from", "")).lower(), 0)
+        return (min(keywords, self.max_keyword_points)
+                + min(history, self.max_history_points)
+                + self._age_points(email.get("timestamp"), now))
+
+    def _age_points(self, timestamp: Optional[str], now: Optional[datetime]) -> float:
+        if not timestamp:
+            return 0.0
+        try:
+            sent = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+        except ValueError:
+            return 0.0
+        if sent.tzinfo is None:
+            sent = sent.replace(tzinfo=timezone.utc)
+        hours = ((now or datetime.now(timezone.utc)) - sent).total_seconds() / 3600
+        return min(max(hours, 0.0) / self.age_step_hours, self.max_age_points)
+
+    @staticmethod
+    def category_score(category: Optional[str]) -> float:
+        return CATEGORY_POINTS.get(category or "", 0)
+
+    @staticmethod
+    def urgency_score(urgency: Optional[str]) -> float:
+        return URGENCY_POINTS.get(urgency or "", 0)
+
+    def observe(self, email: Dict, category: Optional[str]):
+        """Remember complaints per sender so their next emails are served sooner."""
+        if category == "complaint" and email.get("from"):
+            sender = str(email["from"]).lower()
+            with self._lock:
+                self.sender_complaints[sender] = self.sender_complaints.get(sender, 0) + 1
+
+
+class PriorityScheduler:
+    """
+    Worker pool that drains a priority queue of emails instead of a FIFO loop.
+
+    Each email passes through classify -> respond -> handle as separate tasks, and
+    is re-prioritized before every step: first by local signals, then by category,
+    then by the urgency in the drafted reply's reasoning. Tasks are ordered by
+    arrival time minus aging_seconds per priority point, so urgent mail jumps the
+    queue while low-priority mail still gets served once it has waited long enough
+    (it is never more than max score * aging_seconds behind).
+    """
+
+    def __init__(self, automation: EmailAutomationSystem, workers: int = 8, aging_seconds: float = 10.0,
+                 scorer: Optional[PriorityScorer] = None, max_pending: Optional[int] = None):
+        """
+        Args:
+            automation (EmailAutomationSystem): Provides the classify/respond/handle steps.
+            workers (int): Worker threads draining the queue.
+            aging_seconds (float): Queueing time one priority point is worth.
+            scorer (Optional[PriorityScorer]): Scoring policy; defaults to PriorityScorer().
+            max_pending (Optional[int]): Bound on emails admitted but not finished, or None to
+                admit the whole backlog at once (best ordering, memory grows with the backlog).
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.automation = automation
+        self.workers = workers
+        self.aging_seconds = aging_seconds
+        self.scorer = scorer or PriorityScorer()
+        self.max_pending = max_pending
+        self.time_to_response: Dict[str, List[float]] = {}
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._active = 0
+        self._intake_done = False
+        self._results: "queue.Queue" = queue.Queue()
+
+    # Queue
+
+    def _push(self, item: Dict, step: str):
+        key = item["arrival"] - item["score"] * self.aging_seconds
+        with self._condition:
+            heapq.heappush(self._heap, (key, next(self._sequence), step, item))
+            self._condition.notify()
+
+    def _pop(self):
+        """Next task by priority, or None once every admitted email is finished."""
+        with self._condition:
+            while not self._heap:
+                if self._intake_done and self._active == 0:
+                    return None
+                self._condition.wait()
+            return heapq.heappop(self._heap)
+
+    def queue_depth(self) -> int:
+        """Number of tasks waiting for a worker."""
+        return len(self._heap)
+
+    def submit(self, email: Dict):
+        """Admit one email into the queue, scored by local signals."""
+        with self._condition:
+            self._active += 1
+        email = self.automation.processor.preprocess(email)
+        arrival = time.monotonic()
+        deadline = self.automation.email_deadline
+        item = {"email": email, "result": self.automation._new_result(email), "arrival": arrival,
+                "started": time.perf_counter(), "deadline": arrival + deadline if deadline is not None else None,
+                "score": self.scorer.local_score(email) if isinstance(email, dict) else 0}
+        self._push(item, "classify")
+
+    @staticmethod
+    def _deadline(item: Dict):
+        """Scope of the email deadline, which covers classification and response drafting as in process_email."""
+        # Steps run on different workers, so the deadline travels with the item
+        if item["deadline"] is None:
+            return deadline_scope(None)
+        return deadline_scope(item["deadline"] - time.monotonic())
+
+    # Steps
+
+    def _classify(self, item: Dict) -> Optional[str]:
+        with self._deadline(item):
+            classification, item["match"], item["answer"] = self.automation._classify_step(item["email"],
+                                                                                          item["result"])
+        if not classification:
+            return None
+        item["classification"] = classification
+        self.scorer.observe(item["email"], classification)
+        item["score"] += self.scorer.category_score(classification)
+        if item["answer"]:
+            item["score"] += self.scorer.urgency_score(item["answer"].get("urgency"))
+        return "respond"
+
+    def _respond(self, item: Dict) -> Optional[str]:
+        email, classification = item["email"], item["classification"]
+        response = (item["answer"] or {}).get("response") or self.automation._reused_response(item["match"])
+        if not response:
+            with self._deadline(item):
+                response, reasoning = self.automation._draft_response(email, classification)
+            if not response:
+                logger.error(f"Failed to generate response for email {email['id']}.")
+                return None
+            item["score"] += self.scorer.urgency_score(reasoning.get("urgency"))
+        item["response"] = response
+        return "handle"
+
+    def _handle(self, item: Dict) -> Optional[str]:
+        self.automation._handle_step(item["email"], item["classification"], item["response"],
+                                     item["result"], item["match"])
+        return None
+
+    def _finish(self, item: Dict):
+        result = item["result"]
+        if result["success"]:
+            waited = time.monotonic() - item["arrival"]
+            category = result["classification"]
+            with self._condition:
+                self.time_to_response.setdefault(category, []).append(waited)
+            self.automation.processor.metrics.histogram(
+                "email_time_to_response_seconds", "Time from admission to handler dispatch."
+            ).observe(waited, category=category)
+        self.automation._record_processed(result, item["started"])
+        self._results.put(result)
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _worker(self):
+        steps = {"classify": self._classify, "respond": self._respond, "handle": self._handle}
+        while True:
+            task = self._pop()
+            if task is None:
+                return
+            _, _, step, item = task
+            try:
+                next_step = steps[step](item)
+            except Exception as e:
+                logger.error(f"Error in {step} step for email {item['result']['email_id']}: {str(e)}")
+                next_step = None
+            if next_step:
+                self._push(item, next_step)
+            else:
+                self._finish(item)
+
+    def _feed(self, emails: Iterable[Dict], pending: Optional[threading.Semaphore]):
+        try:
+            for email in emails:
+                if pending:
+                    pending.acquire()
+                self.submit(email)
+        finally:
+            with self._condition:
+                self._intake_done = True
+                self._condition.notify_all()
+
+    def run(self, emails: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Admit emails and drain them with the worker pool.
+
+        Returns:
+            Iterator[Dict]: Result dicts in completion order, i.e. roughly priority order.
+        """
+        self._intake_done = False
+        pending = threading.Semaphore(self.max_pending) if self.max_pending else None
+        threads = [threading.Thread(target=self._feed, args=(emails, pending), daemon=True)]
+        threads += [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        threading.Thread(target=self._close_when_done, args=(threads,), daemon=True).start()
+        return self._drain(pending)
+
+    def _close_when_done(self, threads: List[threading.Thread]):
+        """Signal the end of the result stream once every worker has exited."""
+        for thread in threads:
+            thread.join()
+        self._results.put(_DONE)
+
+    def _drain(self, pending: Optional[threading.Semaphore]) -> Iterator[Dict]:
+        while True:
+            result = self._results.get()
+            if result is _DONE:
+                return
+            if pending:
+                pending.release()
+            yield result
+
+    def process_all(self, emails: Iterable[Dict]) -> List[Dict]:
+        """Run to completion and return every result in completion order."""
+        return list(self.run(emails))
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-category count and p50/p95 time-to-response in seconds."""
+        with self._condition:
+            waits = {category: list(values) for category, values in self.time_to_response.items()}
+        return {
+            category: {
+                "count": len(values),
+                "p50_seconds": round(_percentile(values, 0.50), 4),
+                "p95_seconds": round(_percentile(values, 0.95), 4),
+            }
+            for category, values in sorted(waits.items())
+        }
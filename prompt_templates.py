@@ -0,0 +1,162 @@
+# Standard library
+import logging
+import string
+from typing import Dict, List, Optional
+
+# Local modules
+from rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Default template set. Bump (and add a new entry to PROMPTS) whenever a prompt changes,
+# since the version is part of the classification cache key.
+PROMPT_VERSION = "v3"
+
+# Shared instruction block of every classification prompt
+_CLASSIFY_STEPS = (
+    # Define assistant persona and frame task
+    "You are a highly trained expert customer support assistant. "
+    "Your job is to classify customer emails accurately using reasoning and clear formatting.\n\n"
+    # Chain-of-thought for reasoning
+    "1. Carefully analyze the email content step by step.\n"
+    "2. Classify the email into one of the following categories based on its intent:\n"
+    "   - complaint: A customer expressing dissatisfaction or demanding a resolution.\n"
+    "   - inquiry: A question or request for clarification or product info.\n"
+    "   - feedback: A general comment or praise with no requested action.\n"
+    "   - support_request: A help request related to using a product or service.\n"
+    "   - other: Anything that doesn't clearly match the above.\n"
+    # Self-evaluated confidence measure
+    "3. Estimate your confidence in the classification on a scale from 1 (very unsure) to 5 (very confident).\n\n"
+)
+
+_EMAIL = "Email:\nSubject: {subject}\nBody: {body}\n\n"
+
+# Template definitions per version: name -> (static system message, per-email user message).
+# Everything that doesn't depend on the email lives in the system message so that it forms
+# a long, identical prefix across requests, which providers can serve from their prompt cache.
+# The user message ends with a one-line format reminder after the email content.
+PROMPTS: Dict[str, Dict[str, tuple]] = {
+    "v3": {
+        "classify": (
+            _CLASSIFY_STEPS +
+            # Expected output format
+            "Respond in this format:\n"
+            "Category: <one of the five categories>\n"
+            "Confidence: <1-5>",
+            _EMAIL + "Respond in the Category/Confidence format above.",
+        ),
+        "classify_batch": (
+            _CLASSIFY_STEPS +
+            "Apply these steps to each of the emails independently. Emails are numbered.\n\n"
+            # Expected output format
+            "Respond with only a JSON object mapping each email number to its result, e.g.:\n"
+            '{"1": {"category": "<one of the five categories>", "confidence": <1-5>}}',
+            "{emails}Respond with only the JSON object described above.",
+        ),
+        "respond": (
+            # Define assistant persona and frame task
+            "You are an expert AI assistant trained in customer service. "
+            "You will generate a structured response using reasoning steps and a clear, empathetic tone.\n"
+            # Chain-of-thought structure
+            "Follow these steps:\n"
+            "1. Summarize the user's issue.\n"
+            "2. Infer their tone (angry, happy, neutral, confused, unsure).\n"
+            "3. Judge urgency (low, medium, high, unsure).\n"
+            "4. Then write a short, professional, empathetic reply.\n\n"
+            # Expected output format
+            "Respond using this format:\n"
+            "Reasoning:\n"
+            "1. Summary: <summary>\n"
+            "2. Tone: <tone>\n"
+            "3. Urgency: <urgency>\n\n"
+            "Drafted Response:\n"
+            "<response>",
+            # Classification context, then the email content
+            "Category: {category}\n\n" + _EMAIL + "Respond using the Reasoning and Drafted Response format above.",
+        ),
+        "combined": (
+            _CLASSIFY_STEPS +
+            # Response reasoning steps, as in the standalone reply prompt
+            "4. Summarize the user's issue.\n"
+            "5. Infer their tone (angry, happy, neutral, confused, unsure).\n"
+            "6. Judge urgency (low, medium, high, unsure).\n"
+            "7. Then write a short, professional, empathetic reply suited to the category.\n\n"
+            # Expected output format
+            "Respond with only a JSON object with these keys:\n"
+            '{"category": "<one of the five categories>", "confidence": <1-5>, "summary": "<summary>", '
+            '"tone": "<tone>", "urgency": "<urgency>", "response": "<reply to the customer>"}',
+            _EMAIL + "Respond with only the JSON object described above.",
+        ),
+    },
+}
+
+# Estimated prompt tokens above which a warning is logged
+DEFAULT_TOKEN_BUDGETS = {"classify": 2000, "classify_batch": 12000, "respond": 2000, "combined": 2500}
+
+
+class PromptTemplate:
+    """
+    A versioned chat prompt compiled once: a static system message plus a user template.
+
+    The system message dict and its token estimate are built at compile time and
+    shared by every rendered prompt; rendering only formats the short user part.
+    """
+
+    def __init__(self, name: str, version: str, system: str, user: str, token_budget: Optional[int] = None):
+        """
+        Args:
+            name (str): Template name, e.g. 'classify'.
+            version (str): Template set version.
+            system (str): Static instructions sent first as the system message.
+            user (str): str.format template of the per-email user message.
+            token_budget (Optional[int]): Estimated prompt size above which a warning is logged.
+        """
+        self.name = name
+        self.version = version
+        self.user = user
+        self.token_budget = token_budget
+        self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(user) if field)
+        self.system_message = {"role": "system", "content": system}
+        self.system_tokens = estimate_tokens([self.system_message])
+
+    def render(self, **values) -> List[Dict]:
+        """
+        Build the chat messages for one request.
+
+        Raises:
+            ValueError: If a template field is missing from values.
+        """
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise ValueError(f"Prompt '{self.name}' is missing values for {missing}")
+        user_message = {"role": "user", "content": self.user.format(**values)}
+        if self.token_budget:
+            tokens = self.system_tokens + estimate_tokens([user_message])
+            if tokens > self.token_budget:
+                logger.warning(f"Prompt '{self.name}' ({self.version}) is ~{tokens} tokens, "
+                               f"over its budget of {self.token_budget}.")
+        return [self.system_message, user_message]
+
+
+def compile_prompts(version: str = PROMPT_VERSION,
+                    token_budgets: Optional[Dict[str, int]] = None) -> Dict[str, PromptTemplate]:
+    """
+    Compile every template of a version.
+
+    Args:
+        version (str): Template set to use.
+        token_budgets (Optional[Dict[str, int]]): Per-template budgets overriding DEFAULT_TOKEN_BUDGETS.
+
+    Returns:
+        Dict[str, PromptTemplate]: Templates by name.
+
+    Raises:
+        ValueError: For an unknown version.
+    """
+    if version not in PROMPTS:
+        raise ValueError(f"Unknown prompt version '{version}'. Available: {sorted(PROMPTS)}")
+    budgets = dict(DEFAULT_TOKEN_BUDGETS, **(token_budgets or {}))
+    return {
+        name: PromptTemplate(name, version, system, user, budgets.get(name))
+        for name, (system, user) in PROMPTS[version].items()
+    }
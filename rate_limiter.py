@@ -0,0 +1,341 @@
+# Standard library
+import asyncio
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Local modules
+from hedging import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Rough prompt token estimate (about four characters per token) used for budgeting."""
+    return sum(len(message.get("content") or "") for message in messages) // 4 + 4 * len(messages)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    reserve() debits the bucket immediately and returns how long the caller must
+    wait before using its reservation, so waiting callers queue up fairly.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Debit amount tokens and return the seconds to wait before proceeding."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation, e.g. with the actual token usage (positive = more used)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def pause(self, seconds: float):
+        """Drain the bucket so that nothing is admitted for the given number of seconds."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse rate-limit reset durations such as '1s', '6m0s', '20ms' or '0.5'."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Read the server-suggested wait from Retry-After or rate-limit reset headers."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        delay = _parse_duration(headers["retry-after"])
+        if delay is not None:
+            return delay
+        try:
+            return max(0.0, parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    resets = [
+        _parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [delay for delay in resets if delay is not None]
+    return max(resets) if resets else None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True for 429 responses."""
+    # openai is only consulted once loaded; its errors can't be raised before that
+    openai = sys.modules.get("openai")
+    return (openai is not None and isinstance(exc, openai.RateLimitError)) or getattr(exc, "status_code", None) == 429
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for rate limits, timeouts, connection failures and server errors."""
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RequestScheduler:
+    """
+    Request scheduler shared by every worker that talks to the LLM API.
+
+    It enforces requests-per-minute and tokens-per-minute budgets with token
+    buckets, retries transient failures with exponential backoff and full jitter
+    (honoring Retry-After and rate-limit reset headers), and adapts its
+    concurrency limit to observed 429s: halved on every rate limit and raised by
+    one after a full window of successes. The same instance can be used from
+    threads (call) and from asyncio tasks (acall).
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 60.0,
+                 max_concurrency: int = 16, min_concurrency: int = 1, metrics=None):
+        """
+        Args:
+            requests_per_minute (Optional[float]): Request budget, or None for unlimited.
+            tokens_per_minute (Optional[float]): Token budget, or None for unlimited.
+            max_retries (int): Retries after the first attempt before giving up.
+            base_delay (float): Backoff base in seconds.
+            max_delay (float): Upper bound for a single backoff in seconds.
+            max_concurrency (int): Ceiling for in-flight requests.
+            min_concurrency (int): Floor the adaptive limit never drops below.
+            metrics (Optional[MetricsRegistry]): Registry that retry counters are recorded on.
+        """
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError("Require 1 <= min_concurrency <= max_concurrency")
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = max_concurrency
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.counter("email_llm_retries_total", "LLM API retries by reason.")
+
+        self.in_flight = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self._successes_since_change = 0
+        self._condition = threading.Condition()
+        # Futures of asyncio tasks waiting for a slot, with their loops (tasks may run on several loops)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    # Concurrency gate
+
+    def _acquire(self):
+        with self._condition:
+            while self.in_flight >= self.concurrency_limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def _aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < self.concurrency_limit:
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def _notify_all(self):
+        """Wake every thread and task waiting for a slot; call with the condition held."""
+        self._condition.notify_all()
+        for loop, waiter in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's loop is closed
+                pass
+        self._async_waiters.clear()
+
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._notify_all()
+
+    # Budget and adaptation
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Reserve budget for one request and return the seconds to wait."""
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def _on_success(self, response: Any, estimated_tokens: int):
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if self.token_bucket and isinstance(total, int):
+            self.token_bucket.adjust(total - estimated_tokens)
+        with self._condition:
+            self._successes_since_change += 1
+            if (self.concurrency_limit < self.max_concurrency
+                    and self._successes_since_change >= self.concurrency_limit):
+                self.concurrency_limit += 1
+                self._successes_since_change = 0
+                self._notify_all()
+
+    def _backoff(self, exc: BaseException, attempt: int) -> float:
+        """Seconds to wait before the next attempt: the server's suggestion, or exponential backoff with full jitter."""
+        suggested = retry_after_seconds(exc)
+        if suggested is not None:
+            return min(self.max_delay, suggested)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_failure(self, exc: BaseException):
+        """Record a failure that is about to be retried."""
+        self.retries += 1
+        suggested = retry_after_seconds(exc)
+        if self.metrics is not None:
+            reason = "rate_limited" if is_rate_limited(exc) else "transient"
+            self.metrics.counter("email_llm_retries_total").inc(reason=reason)
+        if is_rate_limited(exc):
+            self.rate_limited += 1
+            with self._condition:
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit // 2)
+                self._successes_since_change = 0
+            # Hold back every worker, not just this one, until the server is ready again
+            if suggested and self.request_bucket:
+                self.request_bucket.pause(suggested)
+
+    def _retry_delay(self, exc: BaseException, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """Backoff before retrying a failed attempt, or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return None
+        delay = self._backoff(exc, attempt)
+        # A retry that can't start before the deadline would only be abandoned by the caller
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        self._on_failure(exc)
+        return delay
+
+    @staticmethod
+    def _request_options(kwargs: Dict, deadline: Optional[float]) -> Dict:
+        """Call options with the request timeout capped at the time left before the deadline."""
+        if deadline is None:
+            return kwargs
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline passed before the request was sent")
+        return dict(kwargs, timeout=min(remaining, kwargs.get("timeout") or remaining))
+
+    # Public API
+
+    def call(self, fn: Callable, *args, estimated_tokens: int = 0, deadline: Optional[float] = None, **kwargs):
+        """
+        Call fn(*args, **kwargs) within the budget, retrying transient failures.
+
+        With a deadline (a time.monotonic() value), every request's timeout is capped at
+        the time left and no retry is started that couldn't begin before it.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed while waiting for budget.
+            Exception: The last error once retries are exhausted, the deadline is near,
+                or for non-retryable errors.
+        """
+        attempt = 0
+        while True:
+            time.sleep(self._reserve(estimated_tokens))
+            self._acquire()
+            try:
+                response = fn(*args, **self._request_options(kwargs, deadline))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                logger.warning(f"Retryable API error ({e}). Retrying in {delay:.2f}s...")
+            else:
+                self._on_success(response, estimated_tokens)
+                return response
+            finally:
+                self._release()
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn: Callable, *args, estimated_tokens: int = 0, deadline: Optional[float] = None,
+                    **kwargs):
+        """Async counterpart of call for coroutine functions."""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve(estimated_tokens))
+            await self._aacquire()
+            try:
+                response = await fn(*args, **self._request_options(kwargs, deadline))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                logger.warning(f"Retryable API error ({e}). Retrying in {delay:.2f}s...")
+            else:
+                self._on_success(response, estimated_tokens)
+                return response
+            finally:
+                self._release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict:
+        """Return retry, rate-limit and concurrency counters."""
+        return {
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "concurrency_limit": self.concurrency_limit,
+            "in_flight": self.in_flight,
+        }
@@ -0,0 +1,161 @@
+# Standard library
+import re
+from typing import Dict, List, Optional, Tuple
+
+REASONING_FIELDS = ("summary", "tone", "urgency")
+RESPONSE_LABEL = "Drafted Response:"
+
+# Lines that start a new section after the drafted reply; anything from them on is not sent
+_SECTION_RE = re.compile(r"^(?:reasoning|notes?|explanation|drafted response)\s*:|^-{3,}\s*$", re.IGNORECASE)
+
+
+def parse_reasoning_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Parse one line of the Reasoning block, e.g. "2. Tone: angry".
+
+    Returns:
+        Optional[Tuple[str, str]]: The field ('summary', 'tone' or 'urgency') and its value,
+            lowercased except for the summary, or None for any other line.
+    """
+    label, _, value = line.strip().lstrip("0123456789.- ").partition(":")
+    field = label.strip().lower()
+    if field not in REASONING_FIELDS or not value.strip():
+        return None
+    value = value.strip()
+    return field, value if field == "summary" else value.lower().strip(" .")
+
+
+def _could_start_section(text: str) -> bool:
+    """True while a partial line may still turn into a section header."""
+    text = text.strip().lower()
+    return any(header.startswith(text) for header in ("reasoning:", "note:", "notes:", "explanation:",
+                                                      "drafted response:", "---"))
+
+
+class ResponseStreamParser:
+    """
+    Incremental parser of the Reasoning / Drafted Response output format.
+
+    Feed it completion deltas as they arrive. Reasoning fields are reported as soon as
+    their line is complete, and the drafted reply is released as it streams in. A line
+    is held back only while it could still be a section header. The parser is done once
+    the reply is followed by another section or max_response_chars is reached.
+    """
+
+    def __init__(self, max_response_chars: Optional[int] = None):
+        """
+        Args:
+            max_response_chars (Optional[int]): Length cap of the drafted reply, or None for no cap.
+        """
+        if max_response_chars is not None and max_response_chars < 1:
+            raise ValueError("max_response_chars must be at least 1")
+        self.max_response_chars = max_response_chars
+        self.reasoning: Dict[str, str] = {}
+        self.in_response = False
+        self.done = False
+        self.stop_reason: Optional[str] = None
+        self._buffer = ""
+        self._parts: List[str] = []
+        self._length = 0
+        self._line_released = False
+
+    @property
+    def response(self) -> str:
+        """The drafted reply released so far."""
+        return "".join(self._parts).strip()
+
+    def feed(self, delta: str) -> Tuple[Dict[str, str], str]:
+        """
+        Consume one delta of completion text.
+
+        Returns:
+            Tuple[Dict[str, str], str]: Reasoning fields completed by this delta and the
+                newly released reply text (possibly empty).
+        """
+        if self.done or not delta:
+            return {}, ""
+        self._buffer += delta
+        fields = {} if self.in_response else self._read_reasoning()
+        return fields, self._read_response() if self.in_response else ""
+
+    def finish(self) -> Tuple[Dict[str, str], str]:
+        """Flush the text held back at the end of the stream."""
+        if self.done:
+            return {}, ""
+        fields = {}
+        if not self.in_response:
+            # A Reasoning block without a reply; its last line may lack a newline
+            fields = self._read_reasoning()
+            fields.update(self._reasoning_field(self._buffer))
+            self._buffer = ""
+            return fields, ""
+        text = self._read_response()
+        if not self.done and self._buffer:
+            if self._line_released or not _SECTION_RE.match(self._buffer.strip()):
+                text += self._release(self._buffer)
+            self._buffer = ""
+        self.done = True
+        self.stop_reason = self.stop_reason or "end"
+        return fields, text
+
+    def _reasoning_field(self, line: str) -> Dict[str, str]:
+        parsed = parse_reasoning_line(line)
+        if parsed is None or parsed[0] in self.reasoning:
+            return {}
+        self.reasoning[parsed[0]] = parsed[1]
+        return {parsed[0]: parsed[1]}
+
+    def _read_reasoning(self) -> Dict[str, str]:
+        """Parse the complete lines before the Drafted Response label."""
+        fields = {}
+        head, label, tail = self._buffer.partition(RESPONSE_LABEL)
+        lines = head.split("\n")
+        # Without the label the last line may still be incomplete
+        complete, self._buffer = (lines, "") if label else (lines[:-1], lines[-1])
+        for line in complete:
+            fields.update(self._reasoning_field(line))
+        if label:
+            self.in_response = True
+            self._buffer = tail.lstrip()
+        return fields
+
+    def _read_response(self) -> str:
+        """Release complete reply lines, and the current line once it can't be a section header."""
+        released = ""
+        while "\n" in self._buffer and not self.done:
+            line, _, self._buffer = self._buffer.partition("\n")
+            if not self._line_released and _SECTION_RE.match(line.strip()):
+                self._stop("complete")
+                break
+            released += self._release(line + "\n")
+            self._line_released = False
+        if self._buffer and not self.done:
+            if not self._line_released and _SECTION_RE.match(self._buffer.strip()):
+                self._stop("complete")
+            elif self._line_released or not _could_start_section(self._buffer):
+                released += self._release(self._buffer)
+                self._buffer = ""
+                self._line_released = True
+        return released
+
+    def _release(self, text: str) -> str:
+        """Append reply text, cutting it at the length cap."""
+        if self.done:
+            return ""
+        if not self._length:
+            text = text.lstrip()
+        if self.max_response_chars is not None and self._length + len(text) >= self.max_response_chars:
+            cut = text[:self.max_response_chars - self._length]
+            # Cut at a word boundary so no half-word is sent
+            if len(cut) < len(text) and not text[len(cut)].isspace() and " " in cut:
+                cut = cut[:cut.rfind(" ")]
+            text = cut
+            self._stop("length")
+        self._parts.append(text)
+        self._length += len(text)
+        return text
+
+    def _stop(self, reason: str):
+        self.done = True
+        self.stop_reason = reason
+        self._buffer = ""
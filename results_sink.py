@@ -0,0 +1,189 @@
+# Standard library
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Third-party libraries
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Column layout of the result dicts produced by every processing mode
+RESULT_SCHEMA = pa.schema([
+    ("email_id", pa.string()),
+    ("success", pa.bool_()),
+    ("classification", pa.string()),
+    ("confidence", pa.int8()),
+    ("response_sent", pa.large_string()),
+])
+
+FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+
+def results_format(path: str) -> Optional[str]:
+    """'parquet' or 'arrow' for a columnar results path, None for anything else."""
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+class ResultsWriter:
+    """
+    Appends result dicts to a Parquet or Arrow IPC file in row groups.
+
+    Only the current row group is buffered, so memory stays flat however many
+    results are written. Use as a context manager or call close() to finish the file.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None, row_group_size: int = 10000):
+        """
+        Args:
+            path (str): Output file.
+            fmt (Optional[str]): 'parquet' or 'arrow'; detected from the extension when omitted.
+            row_group_size (int): Results buffered per row group (Parquet) or record batch (Arrow).
+        """
+        fmt = fmt or results_format(path)
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Cannot tell the results format of '{path}'. Use a .parquet or .arrow path.")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be at least 1")
+        self.path = path
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._buffer: List[Dict] = []
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, RESULT_SCHEMA, compression="zstd")
+        else:
+            self._writer = ipc.new_file(path, RESULT_SCHEMA)
+
+    def write(self, result: Dict):
+        """Buffer one result, writing a row group once the buffer is full."""
+        self._buffer.append(result)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_many(self, results: Iterable[Dict]) -> int:
+        """Write results as they are produced and return how many were accepted in total."""
+        for result in results:
+            self.write(result)
+        return self.count + len(self._buffer)
+
+    def flush(self):
+        """Write the buffered results as one row group."""
+        if not self._buffer:
+            return
+        columns = {name: [result.get(name) for result in self._buffer] for name in RESULT_SCHEMA.names}
+        batch = pa.record_batch([pa.array(columns[field.name], type=field.type) for field in RESULT_SCHEMA],
+                                schema=RESULT_SCHEMA)
+        if self.fmt == "parquet":
+            self._writer.write_batch(batch, row_group_size=len(self._buffer))
+        else:
+            self._writer.write_batch(batch)
+        self.count += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        """Flush the last row group and finalize the file."""
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+        logger.info(f"Wrote {self.count} results to {self.path}.")
+
+    def __enter__(self) -> "ResultsWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_results(results: Iterable[Dict], path: str, fmt: Optional[str] = None, row_group_size: int = 10000) -> int:
+    """
+    Stream result dicts into a Parquet or Arrow IPC file.
+
+    Returns:
+        int: Number of results written.
+    """
+    with ResultsWriter(path, fmt, row_group_size) as writer:
+        return writer.write_many(results)
+
+
+def open_results(path: str, fmt: Optional[str] = None) -> ds.Dataset:
+    """
+    Open a results file, or a directory of them (e.g. one per shard), without loading it.
+
+    Reads through the returned dataset only touch the projected columns.
+    """
+    fmt = fmt or (results_format(path) if os.path.isfile(path) else None)
+    if fmt is None and os.path.isdir(path):
+        formats = {results_format(name) for name in os.listdir(path)} - {None}
+        fmt = formats.pop() if len(formats) == 1 else None
+    if fmt is None:
+        raise ValueError(f"Cannot tell the results format of '{path}'.")
+    return ds.dataset(path, format="parquet" if fmt == "parquet" else "ipc")
+
+
+def summarize_results(path: str, fmt: Optional[str] = None) -> Dict:
+    """
+    Aggregate a results file batch by batch, reading only the summary columns.
+
+    Response text is never loaded, so memory is bounded by one record batch.
+
+    Returns:
+        Dict: total, succeeded, success_rate, and per-value counts of classification
+            and confidence.
+    """
+    total = succeeded = 0
+    categories: Dict[str, int] = {}
+    confidences: Dict[str, int] = {}
+    dataset = open_results(path, fmt)
+    for batch in dataset.to_batches(columns=["success", "classification", "confidence"]):
+        total += batch.num_rows
+        succeeded += pc.sum(batch.column("success")).as_py() or 0
+        for counts, column in ((categories, "classification"), (confidences, "confidence")):
+            for entry in pc.value_counts(batch.column(column)).to_pylist():
+                key = str(entry["values"]) if entry["values"] is not None else "none"
+                counts[key] = counts.get(key, 0) + entry["counts"]
+    return {
+        "total": total,
+        "succeeded": succeeded,
+        "success_rate": succeeded / total if total else 0.0,
+        "categories": dict(sorted(categories.items())),
+        "confidence": dict(sorted(confidences.items())),
+    }
+
+
+def preview_responses(path: str, limit: int = 5, width: int = 200, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Yield the first limit results with their responses truncated to width characters."""
+    dataset = open_results(path, fmt)
+    table = dataset.head(limit, columns=["email_id", "classification", "response_sent"])
+    table = table.set_column(2, "response_sent", pc.utf8_slice_codeunits(table.column("response_sent"), 0, width))
+    yield from table.to_pylist()
+
+
+def print_summary(path: str, previews: int = 5, fmt: Optional[str] = None):
+    """Print aggregate statistics and a few response previews for a results file."""
+    summary = summarize_results(path, fmt)
+    print(f"\nProcessed {summary['total']} emails, {summary['succeeded']} succeeded "
+          f"({summary['success_rate']:.1%}).")
+    print("Categories: " + ", ".join(f"{name}={count}" for name, count in summary["categories"].items()))
+    print("Confidence: " + ", ".join(f"{value}={count}" for value, count in summary["confidence"].items()))
+    if previews:
+        print("\nGenerated responses (preview):\n")
+        for row in preview_responses(path, previews, fmt=fmt):
+            print(f" Email {row['email_id']} → {row['classification']}")
+            print(f" Response:\n{row['response_sent'] or ''}...\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a Parquet/Arrow results file or directory.")
+    parser.add_argument("path")
+    parser.add_argument("--previews", type=int, default=5, help="number of response previews to print")
+    args = parser.parse_args()
+    print_summary(args.path, args.previews)
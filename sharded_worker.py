@@ -0,0 +1,124 @@
+# Standard library
+import logging
+import multiprocessing
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Local modules
+from checkpoint_store import CheckpointStore
+from email_classifier_template import EmailAutomationSystem, EmailProcessor, configure, save_results
+from email_sources import iter_emails
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(email_id: str, num_shards: int) -> int:
+    """Stable shard number for an email id (the same on every process and node)."""
+    return zlib.crc32(email_id.encode("utf-8")) % num_shards
+
+
+def iter_shard(emails: Iterable[Dict], shard: int, num_shards: int) -> Iterator[Dict]:
+    """Yield only the emails that belong to one shard."""
+    for email in emails:
+        if shard_of(str(email.get("id", "")), num_shards) == shard:
+            yield email
+
+
+def process_shard(source: str, checkpoint_path: str, shard: int, num_shards: int, fmt: Optional[str] = None,
+                  processor_kwargs: Optional[Dict] = None) -> Dict:
+    """
+    Process one shard of a mailbox, committing each result to the checkpoint store.
+
+    Emails already completed by an earlier run are skipped, and handlers are claimed
+    in the store before they run, so restarting after a crash never repeats tickets
+    or replies. Failed emails are retried on the next run.
+
+    Args:
+        source (str): mbox file, Maildir directory or JSONL file.
+        checkpoint_path (str): SQLite checkpoint shared by all shards of the run.
+        shard (int): Shard to process, in [0, num_shards).
+        num_shards (int): Total number of shards.
+        fmt (Optional[str]): Source format; detected from the path when omitted.
+        processor_kwargs (Optional[Dict]): Keyword arguments for this worker's EmailProcessor.
+
+    Returns:
+        Dict: Counts of processed, succeeded and skipped emails for the shard.
+    """
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"shard must be in [0, {num_shards})")
+    checkpoint = CheckpointStore(checkpoint_path)
+    automation = EmailAutomationSystem(EmailProcessor(**(processor_kwargs or {})), checkpoint=checkpoint)
+    counts = {"shard": shard, "processed": 0, "succeeded": 0, "skipped": 0}
+    try:
+        for email in iter_shard(iter_emails(source, fmt), shard, num_shards):
+            if checkpoint.is_completed(email["id"]):
+                counts["skipped"] += 1
+                continue
+            result = automation.process_email(email)
+            checkpoint.save_result(result, shard)
+            counts["processed"] += 1
+            counts["succeeded"] += result["success"]
+    finally:
+        checkpoint.close()
+    logger.info(f"Shard {shard}/{num_shards}: {counts['succeeded']}/{counts['processed']} succeeded, "
+                f"{counts['skipped']} already done.")
+    return counts
+
+
+def _process_shard(args) -> Dict:
+    return process_shard(*args)
+
+
+def run_sharded(source: str, checkpoint_path: str, num_shards: int, processes: Optional[int] = None,
+                fmt: Optional[str] = None, processor_kwargs: Optional[Dict] = None) -> List[Dict]:
+    """
+    Process every shard on a local process pool.
+
+    Each worker streams the source and keeps only its own shard, so no email list is
+    ever materialized. To spread a run over several nodes, call process_shard (or
+    use --shard on the command line) with a different shard number on each node.
+
+    Returns:
+        List[Dict]: Per-shard counts, ordered by shard.
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+    # Create the schema once, before workers race to do it
+    CheckpointStore(checkpoint_path).close()
+    jobs = [(source, checkpoint_path, shard, num_shards, fmt, processor_kwargs) for shard in range(num_shards)]
+    with multiprocessing.Pool(processes or num_shards) as pool:
+        return pool.map(_process_shard, jobs)
+
+
+def export_results(checkpoint_path: str, output: str) -> int:
+    """Write every checkpointed result to a JSON Lines, Parquet or Arrow file (by extension)."""
+    checkpoint = CheckpointStore(checkpoint_path)
+    try:
+        return save_results(checkpoint.results(), output)
+    finally:
+        checkpoint.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Process a large mailbox in resumable shards.")
+    parser.add_argument("--source", required=True, help="mbox file, Maildir directory or JSONL file")
+    parser.add_argument("--format", choices=["mbox", "maildir", "jsonl"], help="source format (detected by default)")
+    parser.add_argument("--checkpoint", required=True, help="SQLite checkpoint file; rerun with it to resume")
+    parser.add_argument("--shards", type=int, default=multiprocessing.cpu_count(), help="total number of shards")
+    parser.add_argument("--shard", type=int, help="process only this shard (one node of a multi-node run)")
+    parser.add_argument("--processes", type=int, help="local worker processes (default: one per shard)")
+    parser.add_argument("--output", help="export all checkpointed results to this .jsonl/.parquet/.arrow file when done")
+    args = parser.parse_args()
+
+    configure()
+    if args.shard is not None:
+        summary = [process_shard(args.source, args.checkpoint, args.shard, args.shards, args.format)]
+    else:
+        summary = run_sharded(args.source, args.checkpoint, args.shards, args.processes, args.format)
+    for counts in summary:
+        print(json.dumps(counts))
+    if args.output:
+        export_results(args.checkpoint, args.output)
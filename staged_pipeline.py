@@ -0,0 +1,202 @@
+# Standard library
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Local modules
+from email_classifier_template import EmailAutomationSystem
+from hedging import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream on every stage queue
+_DONE = object()
+
+
+class _Stage:
+    """A bounded input queue drained by a pool of worker threads."""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        if workers < 1:
+            raise ValueError(f"{name} stage needs at least one worker")
+        self.name = name
+        self.workers = workers
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._remaining = workers
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.processed += 1
+            self.busy_seconds += seconds
+
+    def reset(self):
+        """Prepare the stage for a new run."""
+        self._remaining = self.workers
+
+    def worker_finished(self) -> bool:
+        """Mark one worker as done; True for the last one."""
+        with self._lock:
+            self._remaining -= 1
+            return self._remaining == 0
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 6),
+        }
+
+
+class StagedPipeline:
+    """
+    Three-stage threaded pipeline: classification -> response generation -> handler dispatch.
+
+    Each stage has its own worker pool and bounded input queue, so a slow handler
+    or generation call never blocks classification of the next emails; when a
+    downstream queue fills up, upstream stages wait (backpressure) instead of
+    buffering without limit. queue_depths() shows where work is piling up.
+    """
+
+    def __init__(self, automation: EmailAutomationSystem, classify_workers: int = 4,
+                 generate_workers: int = 4, handler_workers: int = 2, queue_size: int = 64):
+        """
+        Args:
+            automation (EmailAutomationSystem): Provides the classify/respond/handle steps.
+            classify_workers (int): Concurrent classification calls.
+            generate_workers (int): Concurrent response generation calls.
+            handler_workers (int): Concurrent handler dispatches.
+            queue_size (int): Capacity of each stage's input queue.
+        """
+        self.automation = automation
+        self.queue_size = queue_size
+        self.stages = {
+            "classify": _Stage("classify", classify_workers, queue_size),
+            "generate": _Stage("generate", generate_workers, queue_size),
+            "handle": _Stage("handle", handler_workers, queue_size),
+        }
+        self._results: "queue.Queue" = queue.Queue()
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Current number of emails waiting in front of each stage."""
+        return {name: stage.queue.qsize() for name, stage in self.stages.items()}
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-stage worker count, queue depth, processed count and busy time."""
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    # Stage work
+
+    def _deadline(self, item: Dict):
+        """Scope of the email deadline, which covers classification and generation as in process_email."""
+        if self.automation.email_deadline is None:
+            return deadline_scope(None)
+        # Stages run on different threads, so the deadline travels with the item
+        item.setdefault("deadline", time.monotonic() + self.automation.email_deadline)
+        return deadline_scope(item["deadline"] - time.monotonic())
+
+    def _classify(self, item: Dict) -> Optional[str]:
+        with self._deadline(item):
+            classification, item["match"], item["answer"] = self.automation._classify_step(item["email"],
+                                                                                          item["result"])
+        item["classification"] = classification
+        return "generate" if classification else None
+
+    def _generate(self, item: Dict) -> Optional[str]:
+        with self._deadline(item):
+            item["response"] = self.automation._respond_step(item["email"], item["classification"], item["match"],
+                                                             item["answer"])
+        return "handle" if item["response"] else None
+
+    def _handle(self, item: Dict) -> Optional[str]:
+        self.automation._handle_step(item["email"], item["classification"], item["response"],
+                                     item["result"], item["match"])
+        return None
+
+    def _worker(self, name: str, work, downstream: Optional[str]):
+        stage = self.stages[name]
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                # The last worker out closes the next stage
+                if stage.worker_finished():
+                    if downstream:
+                        for _ in range(self.stages[downstream].workers):
+                            self.stages[downstream].queue.put(_DONE)
+                    else:
+                        self._results.put(_DONE)
+                return
+
+            start = time.perf_counter()
+            try:
+                next_stage = work(item)
+            except Exception as e:
+                logger.error(f"Error in {name} stage for email {item['result']['email_id']}: {str(e)}")
+                next_stage = None
+            stage.record(time.perf_counter() - start)
+
+            if next_stage:
+                self.stages[next_stage].queue.put(item)
+            else:
+                self.automation._record_processed(item["result"], item["started"])
+                self._results.put(item)
+
+    def _feed(self, emails: Iterable[Dict], in_flight: threading.Semaphore):
+        classify = self.stages["classify"]
+        try:
+            for sequence, email in enumerate(emails):
+                in_flight.acquire()
+                classify.queue.put({"sequence": sequence, "email": self.automation.processor.preprocess(email),
+                                    "result": self.automation._new_result(email), "started": time.perf_counter()})
+        finally:
+            for _ in range(classify.workers):
+                classify.queue.put(_DONE)
+
+    def run(self, emails: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Start the pipeline and return an iterator of result dicts in input order.
+
+        Workers start immediately. The number of emails inside the pipeline (including
+        finished results waiting for an earlier email) is bounded, so memory stays flat
+        for any input size.
+        """
+        for stage in self.stages.values():
+            stage.reset()
+        in_flight = threading.Semaphore(self.queue_size * 3 + sum(s.workers for s in self.stages.values()))
+        threads: List[threading.Thread] = [
+            threading.Thread(target=self._feed, args=(emails, in_flight), daemon=True)
+        ]
+        for name, work, downstream in (("classify", self._classify, "generate"),
+                                       ("generate", self._generate, "handle"),
+                                       ("handle", self._handle, None)):
+            threads += [threading.Thread(target=self._worker, args=(name, work, downstream), daemon=True)
+                        for _ in range(self.stages[name].workers)]
+        for thread in threads:
+            thread.start()
+        return self._ordered_results(threads, in_flight)
+
+    def _ordered_results(self, threads: List[threading.Thread], in_flight: threading.Semaphore) -> Iterator[Dict]:
+        """Reorder completed emails back into input order."""
+        pending: Dict[int, Dict] = {}
+        next_sequence = 0
+        while True:
+            item = self._results.get()
+            if item is _DONE:
+                break
+            pending[item["sequence"]] = item["result"]
+            while next_sequence in pending:
+                in_flight.release()
+                yield pending.pop(next_sequence)
+                next_sequence += 1
+
+        for thread in threads:
+            thread.join()
+
+    def process_all(self, emails: Iterable[Dict]) -> List[Dict]:
+        """Run the pipeline to completion and return every result in input order."""
+        return list(self.run(emails))
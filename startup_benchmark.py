@@ -0,0 +1,108 @@
+# Standard library
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Entry points whose cold start matters for short-lived CLI and worker invocations
+MODULES = ("email_classifier_template", "sharded_worker", "batch_jobs")
+
+# Packages that must not be loaded by a bare import (they are imported on first use)
+HEAVY_MODULES = ("openai", "httpx", "pandas", "pyarrow", "numpy", "dotenv")
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse the stderr of `python -X importtime`.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Self and cumulative microseconds per imported module.
+    """
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # Header line
+            continue
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module: str, python: str = sys.executable, cwd: Optional[str] = None) -> Dict:
+    """
+    Import a module in a fresh interpreter under -X importtime.
+
+    Returns:
+        Dict: The module's cumulative import time in ms ('import_ms'), the timings of every
+            module it loaded, and which of HEAVY_MODULES were loaded.
+    """
+    code = f"import sys, {module}; print(' '.join(sorted(sys.modules)))"
+    completed = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                               cwd=cwd or os.path.dirname(os.path.abspath(__file__)), check=True)
+    timings = parse_importtime(completed.stderr)
+    loaded = set(completed.stdout.split())
+    return {
+        "import_ms": timings[module][1] / 1000,
+        "timings": timings,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in loaded],
+    }
+
+
+def heaviest_imports(timings: Dict[str, Tuple[int, int]], limit: int = 10) -> List[Tuple[str, float]]:
+    """Modules with the largest self time, in ms."""
+    ranked = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+    return [(name, self_us / 1000) for name, (self_us, _) in ranked[:limit]]
+
+
+def run_startup_benchmark(modules=MODULES, repeat: int = 5, python: str = sys.executable) -> List[Dict]:
+    """
+    Measure the cold import time of each module over repeated fresh interpreters.
+
+    The first run of each module is discarded as it may have to write bytecode caches.
+
+    Returns:
+        List[Dict]: Per module: min and median import_ms, the heaviest imports of the
+            fastest run, and the heavy packages it loaded.
+    """
+    results = []
+    for module in modules:
+        measure_import(module, python)
+        runs = [measure_import(module, python) for _ in range(repeat)]
+        fastest = min(runs, key=lambda run: run["import_ms"])
+        results.append({
+            "module": module,
+            "min_ms": round(fastest["import_ms"], 1),
+            "median_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+            "heaviest": [[name, round(ms, 1)] for name, ms in heaviest_imports(fastest["timings"], 5)],
+            "heavy_modules": fastest["heavy_modules"],
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure cold-start import time with python -X importtime.")
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--max-ms", type=float, help="fail if a module's median import time exceeds this")
+    args = parser.parse_args()
+
+    results = run_startup_benchmark(args.modules, args.repeat)
+    failed = False
+    for entry in results:
+        print(json.dumps(entry))
+        if entry["heavy_modules"]:
+            print(f"REGRESSION {entry['module']} loads {', '.join(entry['heavy_modules'])} at import")
+            failed = True
+        if args.max_ms is not None and entry["median_ms"] > args.max_ms:
+            print(f"REGRESSION {entry['module']} imports in {entry['median_ms']}ms (limit {args.max_ms}ms)")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,57 @@
+import json
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import email_classifier_template
+import batch_jobs
+from classification_cache import ClassificationCache
+from email_classifier_template import EmailProcessor, EmailAutomationSystem
+
+
+def fake_complete(body):
+    prompt = body["messages"][-1]["content"]
+    if "Drafted Response" in prompt:
+        if "fail" in prompt:
+            raise RuntimeError("upstream error")
+        return "Reasoning:\n1. Summary: s\n2. Tone: angry\n3. Urgency: high\n\nDrafted Response:\nWe are sorry."
+    return "Category: complaint\nConfidence: 5"
+
+# Full offline flow: request files → local stand-in → parsing and handler routing
+def test_offline_batch_flow(tmp_path, monkeypatch):
+    tickets = []
+    monkeypatch.setattr(email_classifier_template, "create_urgent_ticket",
+                        lambda email_id, category, context: tickets.append((email_id, context)))
+
+    processor = EmailProcessor(cache=ClassificationCache(), api_key="sk-test")
+    automation = EmailAutomationSystem(processor)
+    emails = [
+        {"id": "j1", "subject": "Broken", "body": "Damaged item\n> Your order has shipped"},
+        {"id": "j2", "subject": "Broken", "body": "fail this one"},
+        {"id": "j3", "body": "no subject"},
+    ]
+
+    classify_requests = str(tmp_path / "classify.jsonl")
+    classify_results = str(tmp_path / "classify_out.jsonl")
+    assert batch_jobs.write_classification_requests(processor, emails, classify_requests) == 2
+    with open(classify_requests) as f:
+        assert [json.loads(line)["custom_id"] for line in f] == ["classify-j1", "classify-j2"]
+
+    batch_jobs.run_local_batch(classify_requests, classify_results, fake_complete)
+    classifications = batch_jobs.apply_classification_results(processor, emails, classify_results)
+    assert classifications == {"j1": ("complaint", 5), "j2": ("complaint", 5)}
+    # Stored under the same (cleaned) key that online classification looks up
+    assert processor.classify_email_with_confidence(emails[0]) == ("complaint", 5)
+
+    respond_requests = str(tmp_path / "respond.jsonl")
+    respond_results = str(tmp_path / "respond_out.jsonl")
+    assert batch_jobs.write_response_requests(processor, emails, classifications, respond_requests) == 2
+    batch_jobs.run_local_batch(respond_requests, respond_results, fake_complete)
+    results = batch_jobs.apply_response_results(automation, emails, classifications, respond_results)
+
+    assert [r["success"] for r in results] == [True, False, False]
+    assert results[0]["response_sent"] == "We are sorry."
+    assert results[1]["classification"] == "complaint"
+    assert tickets == [("j1", "Damaged item\n> Your order has shipped")]
@@ -0,0 +1,60 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark import MOCK_API_KEY, find_regressions, run_benchmark, synthetic_emails
+from email_classifier_template import EmailProcessor
+from mock_llm_server import MockLLMServer
+from rate_limiter import RequestScheduler
+
+# Synthetic corpora are reproducible and lazily generated
+def test_synthetic_emails_deterministic():
+    first = list(synthetic_emails(5, seed=3))
+    assert first == list(synthetic_emails(5, seed=3))
+    assert [email["id"] for email in first] == [f"bench-{i:07d}" for i in range(5)]
+
+# The mock server speaks the chat completions API, with canned output and injected 429s
+def test_mock_server_with_processor():
+    with MockLLMServer(latency_ms=1, rate_limit_rate=0.5, retry_after=0.001, seed=1) as server:
+        processor = EmailProcessor(base_url=server.base_url, api_key=MOCK_API_KEY,
+                                   scheduler=RequestScheduler(base_delay=0.001, max_retries=20))
+        email = {"id": "m1", "subject": "Broken", "body": "My order arrived broken, refund please."}
+        category, confidence = processor.classify_email_with_confidence(email)
+        response = processor.generate_response(email, category)
+        batch = processor.classify_batch([email, {"id": "m2", "subject": "Hi", "body": "Thank you, great work"}])
+
+    assert (category, confidence) == ("complaint", 4)
+    assert response.startswith("Thank you for reaching out.")
+    assert batch == [("complaint", 4), ("feedback", 4)]
+    assert server.rate_limited == processor.scheduler.rate_limited > 0
+
+# Every mode processes the whole corpus and reports the standard fields
+def test_run_benchmark_all_modes():
+    results = run_benchmark(12, concurrency=4, latency_ms=1, latency_sigma=0.2)
+    assert [entry["mode"] for entry in results] == ["sync", "async", "staged"]
+    for entry in results:
+        assert entry["emails"] == 12
+        assert entry["success_rate"] == 1.0
+        assert entry["tokens_per_email"] > 0
+        assert entry["prompt_cache_hit_rate"] > 0
+        assert entry["p50_ms"] <= entry["p95_ms"] <= entry["p99_ms"]
+
+# Regressions beyond the tolerance are reported
+def test_find_regressions():
+    baseline = [{"mode": "async", "emails_per_sec": 100.0, "p95_ms": 50.0}]
+    assert find_regressions([{"mode": "async", "emails_per_sec": 90.0, "p95_ms": 55.0}], baseline) == []
+    problems = find_regressions([{"mode": "async", "emails_per_sec": 50.0, "p95_ms": 80.0}], baseline)
+    assert len(problems) == 2
+
+# Combined mode halves the LLM requests per email
+def test_run_benchmark_combined():
+    with MockLLMServer(latency_ms=0) as server:
+        separate, = run_benchmark(6, modes=["sync"], base_url=server.base_url, api_key=MOCK_API_KEY)
+        requests = server.requests
+        combined, = run_benchmark(6, modes=["sync"], base_url=server.base_url, combined=True,
+                                  api_key=MOCK_API_KEY)
+
+    assert separate["success_rate"] == combined["success_rate"] == 1.0
+    assert server.requests - requests == requests // 2
@@ -0,0 +1,39 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classification_cache import ClassificationCache
+
+# Whitespace/case differences share a key; model or prompt changes do not
+def test_key_normalization():
+    key = ClassificationCache.make_key("m", "v1", "Hello", "Broken  item\n")
+    assert key == ClassificationCache.make_key("m", "v1", "hello", "broken item")
+    assert key != ClassificationCache.make_key("m", "v2", "hello", "broken item")
+    assert key != ClassificationCache.make_key("other-model", "v1", "hello", "broken item")
+
+# Least recently used entry is evicted once the size bound is reached
+def test_lru_eviction_and_counters():
+    cache = ClassificationCache(max_size=2)
+    cache.set("a", "complaint", 5)
+    cache.set("b", "inquiry", 4)
+    assert cache.get("a") == ("complaint", 5)
+    cache.set("c", "feedback", 4)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == ("feedback", 4)
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+# SQLite tier survives a restart
+def test_persistent_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ClassificationCache(path=path)
+    cache.set("key", "support_request", 5)
+    cache.close()
+
+    reopened = ClassificationCache(path=path)
+    assert reopened.get("key") == ("support_request", 5)
+    assert reopened.stats()["hits"] == 1
@@ -163,3 +163,317 @@ def test_malformed_llm_output(monkeypatch, processor):
     }
     result = processor.classify_email(email)
     assert result == "other"
+
+# Async pipeline keeps input order and matches process_email result shape
+def test_process_emails_async_order(monkeypatch, processor):
+    import asyncio
+
+    in_flight = {"now": 0, "peak": 0}
+
+    async def mock_create(*args, **kwargs):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        prompt = kwargs["messages"][-1]["content"]
+        # Make later emails finish first to check ordering
+        await asyncio.sleep(0.01 if "late" in prompt else 0)
+        in_flight["now"] -= 1
+        if "Drafted Response" in prompt:
+            content = "Reasoning:\n1. Summary: x\n2. Tone: neutral\n3. Urgency: low\n\nDrafted Response:\nThanks for reaching out."
+        else:
+            content = "Category: inquiry\nConfidence: 4"
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.async_client.chat.completions, "create", mock_create)
+
+    automation = EmailAutomationSystem(processor)
+    emails = [
+        {"id": "a1", "subject": "Question", "body": "late reply please"},
+        {"id": "a2", "subject": "Question", "body": "quick one"},
+        {"id": "a3", "body": "No subject"},
+    ]
+    results = asyncio.run(automation.process_emails_async(emails, max_concurrency=2))
+
+    assert [r["email_id"] for r in results] == ["a1", "a2", "a3"]
+    assert results[0]["success"] is True
+    assert results[0]["confidence"] == 4
+    assert results[0]["response_sent"] == "Thanks for reaching out."
+    assert results[2]["success"] is False
+    assert set(results[0]) == set(automation.process_email({"id": "x"}))
+    assert in_flight["peak"] <= 2
+
+# Emails are pulled from the source as workers free up, not all loaded up front
+def test_process_emails_async_reads_lazily(monkeypatch):
+    import asyncio
+
+    processor = EmailProcessor(api_key="sk-test")
+    pulled, seen_at_start = [], []
+
+    async def classify(email):
+        seen_at_start.append(len(pulled))
+        await asyncio.sleep(0)
+        return "inquiry", 4
+
+    async def respond(email, category):
+        return "Thanks for reaching out."
+
+    monkeypatch.setattr(processor, "aclassify_email_with_confidence", classify)
+    monkeypatch.setattr(processor, "agenerate_response", respond)
+
+    def source():
+        for i in range(20):
+            pulled.append(i)
+            yield {"id": f"g{i}", "subject": "Question", "body": f"Question {i}"}
+
+    results = asyncio.run(EmailAutomationSystem(processor).process_emails_async(source(), max_concurrency=3))
+
+    assert [result["email_id"] for result in results] == [f"g{i}" for i in range(20)]
+    assert all(result["success"] for result in results)
+    assert max(seen - started for started, seen in enumerate(seen_at_start)) <= 3
+
+# A processor can run the async pipeline on several event loops, one asyncio.run after another
+def test_async_pipeline_on_new_event_loop():
+    import asyncio
+
+    from benchmark import MOCK_API_KEY
+    from mock_llm_server import MockLLMServer
+
+    with MockLLMServer(latency_ms=0) as server:
+        processor = EmailProcessor(base_url=server.base_url, api_key=MOCK_API_KEY)
+        automation = EmailAutomationSystem(processor)
+        emails = [{"id": f"l{i}", "subject": "Question", "body": f"Question number {i}"} for i in range(3)]
+        first = asyncio.run(automation.process_emails_async(emails))
+        second = asyncio.run(automation.process_emails_async(emails))
+
+    assert all(result["success"] for result in first)
+    assert all(result["success"] for result in second)
+
+# Repeated email content is served from the classification cache
+def test_classification_cache_skips_api(monkeypatch):
+    from classification_cache import ClassificationCache
+
+    processor = EmailProcessor(cache=ClassificationCache())
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        calls.append(kwargs)
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": "Category: complaint\nConfidence: 5"})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+
+    email = {"id": "test011", "subject": "Broken", "body": "My order arrived broken."}
+    forwarded = {"id": "test012", "subject": "broken", "body": "My order  arrived broken. "}
+    assert processor.classify_email(email) == "complaint"
+    assert processor.classify_email(forwarded) == "complaint"
+    assert processor.last_confidence == 5
+    assert len(calls) == 1
+    assert processor.cache.stats()["hits"] == 1
+
+# Batched classification maps answers back and retries only malformed entries
+def test_classify_batch_partial_retry(monkeypatch, processor):
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        calls.append(prompt)
+        if "JSON object" in prompt:
+            content = '{"1": {"category": "complaint", "confidence": 5}, "2": {"category": "??"}, "3": {"category": "feedback", "confidence": 2}}'
+        else:
+            content = "Category: inquiry\nConfidence: 4"
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+
+    emails = [
+        {"id": "b1", "subject": "Broken", "body": "Refund now."},
+        {"id": "b2", "subject": "Mac?", "body": "Does it run on Mac OS?"},
+        {"id": "b3", "subject": "Hmm", "body": "Vague note."},
+        {"id": "b4", "body": "Missing subject"},
+    ]
+    results = processor.classify_batch(emails, batch_size=3)
+
+    assert results == [("complaint", 5), ("inquiry", 4), ("other", 2), (None, None)]
+    # One batch request plus one individual retry for the malformed entry
+    assert len(calls) == 2
+    assert "Does it run on Mac OS?" in calls[1] and "Refund now." not in calls[1]
+
+# Streaming pipeline yields results lazily and writes them in chunks
+def test_process_stream_writes_chunks(tmp_path, monkeypatch, processor):
+    from email_classifier_template import write_results_jsonl
+
+    monkeypatch.setattr(processor, "classify_email_with_confidence", lambda email: ("inquiry", 4))
+    monkeypatch.setattr(processor, "generate_response", lambda email, category: "Thanks!")
+    automation = EmailAutomationSystem(processor)
+
+    produced = []
+
+    def source():
+        for i in range(5):
+            produced.append(i)
+            yield {"id": f"s{i}", "subject": "Q", "body": "?"}
+
+    results = automation.process_stream(source())
+    assert produced == []  # nothing consumed until iterated
+
+    path = tmp_path / "results.jsonl"
+    assert write_results_jsonl(results, str(path), chunk_size=2) == 5
+    lines = path.read_text().splitlines()
+    assert len(lines) == 5
+    assert '"response_sent": "Thanks!"' in lines[0]
+
+# Exhausted retries return None instead of failing on an unbound response
+def test_retries_exhausted_returns_none(monkeypatch):
+    from rate_limiter import RequestScheduler
+
+    processor = EmailProcessor(scheduler=RequestScheduler(max_retries=1, base_delay=0))
+    attempts = []
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    def rate_limited(*args, **kwargs):
+        attempts.append(1)
+        raise RateLimited("slow down")
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", rate_limited)
+
+    email = {"id": "test013", "subject": "Busy", "body": "Rate limited"}
+    assert processor.classify_email(email) is None
+    assert processor.generate_response(email, "inquiry") is None
+    assert len(attempts) == 4
+
+# Confident local predictions skip the LLM; unsure ones escalate and are logged as labels
+def test_local_classifier_fast_path(tmp_path, monkeypatch):
+    class StubModel:
+        def predict(self, email):
+            return ("feedback", 0.97) if "thank" in email["body"] else ("inquiry", 0.4)
+
+    log = tmp_path / "labels.jsonl"
+    processor = EmailProcessor(local_classifier=StubModel(), local_threshold=0.9, label_log=str(log))
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        calls.append(kwargs)
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": "Category: support_request\nConfidence: 5"})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+
+    assert processor.classify_email({"id": "l1", "subject": "Hi", "body": "thank you!"}) == "feedback"
+    assert processor.last_confidence == 5
+    assert calls == []
+    assert processor.classify_email({"id": "l2", "subject": "Hi", "body": "error 5123"}) == "support_request"
+    assert len(calls) == 1
+    assert processor.escalation_rate() == 0.5
+    assert '"category": "support_request"' in log.read_text()
+
+# Near-duplicate emails reuse the earlier classification and draft without LLM calls
+def test_near_duplicate_reuse(monkeypatch, processor):
+    from near_duplicates import NearDuplicateIndex
+
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        calls.append(prompt)
+        content = ("Reasoning:\n1. Summary: s\n2. Tone: angry\n3. Urgency: high\n\nDrafted Response:\nSorry!"
+                   if "Drafted Response" in prompt else "Category: complaint\nConfidence: 5")
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    automation = EmailAutomationSystem(processor, near_duplicates=NearDuplicateIndex(), reuse_responses=True)
+
+    first = automation.process_email({"id": "n1", "subject": "Broken", "body": "Order #123 arrived broken, refund please."})
+    second = automation.process_email({"id": "n2", "subject": "Broken", "body": "Order #456 arrived broken, refund please."})
+
+    assert len(calls) == 2
+    assert second["success"] is True
+    assert second["classification"] == "complaint"
+    assert second["confidence"] == 5
+    assert second["response_sent"] == first["response_sent"] == "Sorry!"
+
+# Per-stage latency, token usage and fallbacks are recorded on the metrics registry
+def test_metrics_instrumentation(monkeypatch):
+    from metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    processor = EmailProcessor(metrics=registry)
+
+    def mock_create(*args, **kwargs):
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": "Category: feedback\nConfidence: 2"})
+            choices = [Choice()]
+            usage = type("obj", (object,), {"prompt_tokens": 120, "completion_tokens": 8})
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    automation = EmailAutomationSystem(processor)
+    automation.process_email({"id": "m1", "subject": "Hmm", "body": "Vague"})
+
+    assert registry.counter("email_llm_prompt_tokens_total").value(call="classify") == 120
+    assert registry.counter("email_llm_completion_tokens_total").value(call="respond") == 8
+    assert registry.counter("email_classification_fallbacks_total").value() == 1
+    assert registry.histogram("email_llm_request_seconds").count(call="classify") == 1
+    assert registry.histogram("email_prompt_build_seconds").count(call="respond") == 1
+    assert registry.counter("email_processed_total").value(success="false") == 1
+    assert "email_output_parse_seconds_count" in registry.render()
+
+# Combined mode classifies and drafts the reply with one JSON-mode request
+def test_combined_mode_single_call(monkeypatch, processor):
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        calls.append(kwargs)
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": (
+                    '{"category": "Complaint", "confidence": 5, "summary": "Broken order", '
+                    '"tone": "Angry", "urgency": "high", "response": "We are sorry, a refund is on its way."}')})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    automation = EmailAutomationSystem(processor, combined=True)
+    result = automation.process_email({"id": "c1", "subject": "Broken", "body": "Refund please."})
+
+    assert len(calls) == 1
+    assert calls[0]["response_format"] == {"type": "json_object"}
+    assert result["success"] is True
+    assert result["classification"] == "complaint"
+    assert result["confidence"] == 5
+    assert result["response_sent"] == "We are sorry, a refund is on its way."
+
+# Combined answers are schema-checked: low confidence falls back to 'other', no reply fails
+def test_combined_schema_validation(processor):
+    email = {"id": "c2", "subject": "s", "body": "b"}
+    low = processor._parse_combined(email, '{"category": "feedback", "confidence": "2", "response": "Thanks!"}')
+    assert (low["category"], low["confidence"], low["tone"], low["urgency"]) == ("other", 2, "unsure", "unsure")
+    invalid = processor._parse_combined(email, '{"category": "spam", "confidence": 5, "response": "Hi"}')
+    assert invalid["category"] == "other"
+    assert processor._parse_combined(email, '{"category": "inquiry", "confidence": 4}') is None
+    assert processor._parse_combined(email, "Category: inquiry\nConfidence: 4") is None
@@ -0,0 +1,50 @@
+import json
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from email_sources import iter_emails, iter_jsonl, iter_maildir, iter_mbox
+
+MESSAGE = (
+    "From: {sender}\n"
+    "Subject: {subject}\n"
+    "Message-ID: <{mid}@example.com>\n"
+    "Date: Fri, 15 Mar 2024 10:30:00 +0000\n"
+    "\n"
+    "{body}\n"
+)
+
+# mbox messages are split on 'From ' lines and converted to email dicts
+def test_iter_mbox(tmp_path):
+    path = tmp_path / "inbox.mbox"
+    path.write_text(
+        "From a@example.com Fri Mar 15 10:30:00 2024\n"
+        + MESSAGE.format(sender="a@example.com", subject="Broken", mid="m1", body="It broke.\n>From here on")
+        + "From b@example.com Fri Mar 15 11:30:00 2024\n"
+        + MESSAGE.format(sender="b@example.com", subject="Question", mid="m2", body="Mac OS?")
+    )
+    emails = iter_mbox(str(path))
+    first = next(emails)
+    assert first["id"] == "m1@example.com"
+    assert first["from"] == "a@example.com"
+    assert first["subject"] == "Broken"
+    assert first["body"] == "It broke.\nFrom here on"
+    assert first["timestamp"].startswith("2024-03-15T10:30:00")
+    assert [e["subject"] for e in emails] == ["Question"]
+
+# Maildir messages come from new/ and cur/, with the file name as fallback id
+def test_iter_maildir(tmp_path):
+    for folder in ("new", "cur", "tmp"):
+        (tmp_path / folder).mkdir()
+    (tmp_path / "new" / "1700000000.abc:2,").write_text("Subject: Hello\n\nHi there\n")
+    emails = list(iter_maildir(str(tmp_path)))
+    assert emails == [{"id": "1700000000.abc", "from": "", "subject": "Hello", "body": "Hi there", "timestamp": None}]
+
+# JSONL sources skip malformed lines and are detected by extension
+def test_iter_jsonl(tmp_path):
+    path = tmp_path / "emails.jsonl"
+    path.write_text(json.dumps({"id": "1", "subject": "s", "body": "b"}) + "\nnot json\n\n")
+    assert [e["id"] for e in iter_emails(str(path))] == ["1"]
+    assert list(iter_jsonl(str(path)))[0]["body"] == "b"
@@ -0,0 +1,134 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from hedging import CallPolicy, DeadlineExceeded, Hedger, LatencyTracker, current_deadline, deadline_scope
+from metrics import MetricsRegistry
+from rate_limiter import RequestScheduler
+
+def warmed_policy(**kwargs) -> CallPolicy:
+    policy = CallPolicy(hedge=True, min_hedge_delay=0.01, **kwargs)
+    for _ in range(20):
+        policy.tracker.observe(0.01)
+    return policy
+
+# Quantiles are only reported once enough samples are in the window
+def test_latency_tracker():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    assert tracker.quantile(0.95) is None
+    for i in range(1, 101):
+        tracker.observe(i / 100)
+    assert tracker.quantile(0.95) == 0.96
+    assert CallPolicy(hedge=True, tracker=tracker).hedge_delay() == 0.96
+
+# A straggler is hedged and the faster duplicate's answer is used
+def test_sync_hedge_wins():
+    calls = []
+    lock = threading.Lock()
+
+    def attempt(timeout):
+        with lock:
+            calls.append(timeout)
+            first = len(calls) == 1
+        time.sleep(0.5 if first else 0.01)
+        return "slow" if first else "fast"
+
+    hedger = Hedger()
+    started = time.perf_counter()
+    assert hedger.call("classify", warmed_policy(), attempt) == "fast"
+    assert time.perf_counter() - started < 0.3
+    assert hedger.stats == {"hedges": 1, "hedge_wins": 1, "cancelled": 1, "deadline_exceeded": 0}
+
+# Calls past their timeout fail, and the timeout is handed to the attempt
+def test_sync_timeout():
+    seen = []
+
+    def attempt(timeout):
+        seen.append(timeout)
+        time.sleep(0.3)
+
+    hedger = Hedger()
+    with pytest.raises(DeadlineExceeded):
+        hedger.call("respond", CallPolicy(timeout=0.05), attempt)
+    assert seen == [0.05]
+    assert hedger.stats["deadline_exceeded"] == 1
+
+# A timed-out call stops its scheduler's retries instead of leaving them running in the pool
+def test_sync_timeout_stops_retries(monkeypatch):
+    class RequestTimeout(Exception):
+        status_code = 408
+
+    scheduler = RequestScheduler(max_retries=4, base_delay=0.1, max_delay=0.1)
+    processor = EmailProcessor(api_key="sk-test", scheduler=scheduler, metrics=MetricsRegistry(),
+                               call_policies={"classify": CallPolicy(timeout=0.1)})
+    sent = []
+
+    def create(*args, **kwargs):
+        sent.append(kwargs["timeout"])
+        time.sleep(kwargs["timeout"])
+        raise RequestTimeout()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", create)
+    assert processor.classify_email({"id": "t1", "subject": "Hi", "body": "Hello"}) is None
+    time.sleep(0.5)
+    assert len(sent) == 1 and sent[0] <= 0.1
+    assert scheduler.retries == 0
+
+# Async hedging cancels the losing request
+def test_async_hedge_cancels_loser():
+    cancelled = []
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        try:
+            await asyncio.sleep(0.5 if len(calls) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(len(calls))
+            raise
+        return len(calls)
+
+    hedger = Hedger()
+    assert asyncio.run(hedger.acall("classify", warmed_policy(), attempt)) == 2
+    assert cancelled and hedger.stats["cancelled"] == 1 and hedger.stats["hedge_wins"] == 1
+
+# Nested deadline scopes only tighten the deadline
+def test_deadline_scope():
+    assert current_deadline() is None
+    with deadline_scope(10):
+        outer = current_deadline()
+        with deadline_scope(100):
+            assert current_deadline() == outer
+        with deadline_scope(1):
+            assert current_deadline() < outer
+    assert current_deadline() is None
+    with pytest.raises(DeadlineExceeded):
+        with deadline_scope(-1):
+            CallPolicy().call_timeout(current_deadline())
+
+# An email whose LLM calls overrun its deadline fails quickly instead of stalling the loop
+def test_email_deadline(monkeypatch):
+    processor = EmailProcessor(api_key="sk-test")
+    timeouts = []
+
+    def slow_create(*args, **kwargs):
+        timeouts.append(kwargs.get("timeout"))
+        time.sleep(0.5)
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", slow_create)
+    automation = EmailAutomationSystem(processor, email_deadline=0.1)
+    started = time.perf_counter()
+    result = automation.process_email({"id": "d1", "subject": "Slow", "body": "Anyone there?"})
+
+    assert not result["success"]
+    assert time.perf_counter() - started < 0.4
+    assert 0 < timeouts[0] <= 0.1
+    assert 'email_llm_deadline_exceeded_total{call="classify"} 1' in processor.metrics.render()
@@ -0,0 +1,36 @@
+import urllib.request
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from metrics import MetricsRegistry
+
+# Counters and histograms render in the Prometheus text format
+def test_render_exposition():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.").inc(call="classify")
+    registry.counter("requests_total").inc(2, call="classify")
+    registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)).observe(0.5, call="respond")
+
+    text = registry.render()
+    assert "# HELP requests_total Requests.\n# TYPE requests_total counter" in text
+    assert 'requests_total{call="classify"} 3' in text
+    assert 'latency_seconds_bucket{call="respond",le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{call="respond",le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{call="respond",le="+Inf"} 1' in text
+    assert 'latency_seconds_count{call="respond"} 1' in text
+
+# The exposition is scrapeable over HTTP
+def test_serve_metrics():
+    registry = MetricsRegistry()
+    with registry.time("work_seconds"):
+        pass
+    server = registry.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+        assert "work_seconds_count 1" in body
+    finally:
+        server.shutdown()
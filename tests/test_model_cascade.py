@@ -0,0 +1,115 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import openai
+import pytest  # type: ignore
+
+from email_classifier_template import EmailProcessor
+from model_cascade import CascadeTier, ModelCascade
+from rate_limiter import RequestScheduler
+
+# Canned answer per model: the cheap model is only sure about refunds
+ANSWERS = {
+    "cheap": lambda body: "Category: complaint\nConfidence: 5" if "refund" in body else "Category: inquiry\nConfidence: 2",
+    "strong": lambda body: "Category: support_request\nConfidence: 4",
+}
+
+def make_processor(monkeypatch, tiers, fail=()):
+    # No retries, so a timed-out tier escalates at once
+    processor = EmailProcessor(cascade=ModelCascade(tiers), scheduler=RequestScheduler(max_retries=0),
+                               api_key="sk-test")
+    calls = []
+
+    def mock_create(*args, **kwargs):
+        calls.append((kwargs["model"], kwargs["timeout"]))
+        if kwargs["model"] in fail:
+            raise openai.APITimeoutError(request=None)
+        content = ANSWERS[kwargs["model"]](kwargs["messages"][-1]["content"])
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+            usage = type("usage", (object,), {"prompt_tokens": 100, "completion_tokens": 10})
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    return processor, calls
+
+# Confident cheap answers stay on the cheap tier; weak ones escalate
+def test_escalates_low_confidence(monkeypatch):
+    processor, calls = make_processor(monkeypatch, [CascadeTier("cheap", timeout=5), CascadeTier("strong", timeout=20)])
+    easy = processor.classify_email_with_confidence({"id": "1", "subject": "Broken", "body": "I want a refund."})
+    hard = processor.classify_email_with_confidence({"id": "2", "subject": "Hmm", "body": "It does the thing."})
+
+    assert easy == ("complaint", 5)
+    assert hard == ("support_request", 4)
+    assert calls == [("cheap", 5), ("cheap", 5), ("strong", 20)]
+    stats = processor.cascade.stats()
+    assert stats["cheap"]["escalated"] == 1 and stats["cheap"]["escalation_rate"] == 0.5
+    assert stats["strong"]["accepted"] == 1 and stats["cheap"]["share"] == 0.5
+    assert stats["cheap"]["prompt_tokens"] == 200
+    assert 'email_cascade_calls_total{model="cheap",outcome="escalated"} 1' in processor.metrics.render()
+
+# The last tier's answer is final, with the usual fallback to 'other'
+def test_last_tier_falls_back():
+    processor = EmailProcessor(cascade=ModelCascade([CascadeTier("cheap")]), api_key="sk-test")
+    cascade_answer = processor._finish_cascade({"id": "3"}, ("inquiry", 2))
+    assert cascade_answer == ("other", 2)
+
+# A failing tier moves the email on; if every tier fails, classification fails
+def test_tier_errors(monkeypatch):
+    processor, calls = make_processor(monkeypatch, [CascadeTier("cheap"), CascadeTier("strong")], fail=("cheap",))
+    assert processor.classify_email_with_confidence({"id": "4", "subject": "s", "body": "refund"}) == \
+        ("support_request", 4)
+    assert processor.cascade.stats()["cheap"]["error"] == 1
+
+    processor, calls = make_processor(monkeypatch, [CascadeTier("cheap")], fail=("cheap",))
+    assert processor.classify_email_with_confidence({"id": "5", "subject": "s", "body": "refund"}) == (None, None)
+
+# The async path escalates the same way
+def test_async_cascade(monkeypatch):
+    processor = EmailProcessor(cascade=ModelCascade([CascadeTier("cheap"), CascadeTier("strong")]), api_key="sk-test")
+
+    async def mock_create(*args, **kwargs):
+        content = ANSWERS[kwargs["model"]](kwargs["messages"][-1]["content"])
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.async_client.chat.completions, "create", mock_create)
+    result = asyncio.run(processor.aclassify_email_with_confidence({"id": "6", "subject": "s", "body": "unclear"}))
+    assert result == ("support_request", 4)
+
+# Each tier limits its own concurrency
+def test_tier_concurrency_limit():
+    tier = CascadeTier("cheap", max_concurrency=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with tier.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    with pytest.raises(ValueError):
+        ModelCascade([])
@@ -0,0 +1,39 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from near_duplicates import NearDuplicateIndex
+
+TEMPLATE = ("I received my order #{order} yesterday but it arrived completely damaged. "
+            "This is unacceptable and I demand a refund immediately. {extra}")
+
+# Templated emails differing only in order number or a word are matched
+def test_query_finds_near_duplicates():
+    index = NearDuplicateIndex(threshold=0.7)
+    index.add({"id": "1", "subject": "Broken product", "body": TEMPLATE.format(order=12345, extra="")},
+              "complaint", 5, "Sorry to hear that.")
+
+    match = index.query({"id": "2", "subject": "Broken product", "body": TEMPLATE.format(order=99881, extra="")})
+    assert match["email_id"] == "1"
+    assert match["category"] == "complaint"
+    assert match["response"] == "Sorry to hear that."
+    assert match["similarity"] == 1.0
+
+    assert index.query({"id": "3", "subject": "Partnership", "body": "Could we schedule a call next week?"}) is None
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 1
+
+# Persisted index is rebuilt on reopen
+def test_persistence(tmp_path):
+    path = str(tmp_path / "dupes.sqlite")
+    index = NearDuplicateIndex(path=path)
+    index.add({"id": "1", "subject": "Install error", "body": "error code 5123 when installing the app on windows"},
+              "support_request", 4)
+    index.close()
+
+    reopened = NearDuplicateIndex(path=path)
+    assert len(reopened) == 1
+    match = reopened.query({"id": "2", "subject": "Install error", "body": "error code 77 when installing the app on windows"})
+    assert match["category"] == "support_request"
+    assert match["confidence"] == 4
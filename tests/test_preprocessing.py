@@ -0,0 +1,101 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+import email_classifier_template
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from metrics import MetricsRegistry
+from preprocessing import (TRUNCATION_MARKER, Preprocessor, estimate_text_tokens, html_to_text, strip_base64,
+                           strip_quoted, strip_signature)
+
+# HTML bodies are reduced to their visible text
+def test_html_to_text():
+    html = "<html><head><style>p {color: red}</style></head><body><p>Hello&nbsp;there</p><p>Second</p></body></html>"
+    text = html_to_text(html)
+    assert "color" not in text
+    assert "Hello\xa0there" in text and "Second" in text
+
+# Base64 blobs and data: URIs are removed
+def test_strip_base64():
+    blob = "QUJD" * 50
+    text = strip_base64(f"See attached. data:image/png;base64,{blob} Thanks")
+    assert blob not in text and "data:" not in text
+    assert text.startswith("See attached.") and text.endswith("Thanks")
+
+# Quoted reply history and signatures are cut off
+def test_strip_quoted_and_signature():
+    body = ("My order is late.\n> old quoted line\n\nOn Mon, Jan 1, 2024 at 9:00 Support <s@x.com> wrote:\n"
+            "Earlier message text")
+    assert strip_quoted(body).strip() == "My order is late."
+    assert strip_signature("Please help.\n-- \nJane Doe\nACME Corp") == "Please help.\n"
+    assert strip_signature("Please help.\nSent from my iPhone") == "Please help.\n"
+
+# Long bodies keep their beginning and end around a marker
+def test_truncate_head_tail():
+    body = "start " + "filler " * 2000 + "order 12345 end"
+    cleaned = Preprocessor(max_body_tokens=100).clean_body(body)
+    assert cleaned.startswith("start")
+    assert cleaned.endswith("order 12345 end")
+    assert TRUNCATION_MARKER in cleaned
+    assert estimate_text_tokens(cleaned) <= 100
+
+# Tokens saved are reported on the email and the metrics registry, exactly once
+def test_tokens_saved_and_idempotent():
+    registry = MetricsRegistry()
+    preprocessor = Preprocessor(max_body_tokens=50, metrics=registry)
+    email = {"id": "1", "subject": "Late", "body": "Where is it? " + "x " * 500}
+    cleaned = preprocessor.process(email)
+
+    assert "preprocessed" not in email
+    stats = cleaned["preprocessed"]
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"] > 0
+    assert preprocessor.process(cleaned) is cleaned
+    assert preprocessor.tokens_saved == stats["tokens_saved"]
+    assert "email_preprocess_tokens_saved_total" in registry.render()
+
+# Invalid budgets are rejected
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        Preprocessor(max_body_tokens=0)
+
+# Quoted history doesn't change the cache key of an email
+def test_cache_key_ignores_quoted_history():
+    processor = EmailProcessor()
+    plain = {"id": "a", "subject": "Refund", "body": "I want a refund."}
+    reply = {"id": "b", "subject": "Refund",
+             "body": "I want a refund.\n\nOn Tue, Support wrote:\n> We are looking into it."}
+    assert processor._cache_key(processor.preprocess(plain)) == processor._cache_key(processor.preprocess(reply))
+
+# A body that is all quoted history keeps its text instead of becoming empty
+def test_all_quoted_body_kept():
+    email = Preprocessor().process({"id": "q", "subject": "Fwd", "body": "> Can you resend my invoice?"})
+    assert email["body"] == "> Can you resend my invoice?"
+
+# Handlers receive the email as received; only the LLM sees the cleaned text
+def test_handlers_get_original_email(monkeypatch):
+    processor = EmailProcessor(api_key="sk-test")
+    prompts, tickets = [], []
+
+    def mock_create(*args, **kwargs):
+        prompts.append(kwargs["messages"][-1]["content"])
+        content = "Category: support_request\nConfidence: 5" if len(prompts) == 1 else "Drafted Response:\nOn it."
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    monkeypatch.setattr(email_classifier_template, "create_support_ticket",
+                        lambda email_id, context: tickets.append(context))
+    body = "<p>Error 5123 on install.</p>\n-- \nJane Doe"
+    result = EmailAutomationSystem(processor).process_email({"id": "h1", "subject": "Help", "body": body})
+
+    assert result["success"]
+    assert "Jane Doe" not in prompts[0] and "<p>" not in prompts[0]
+    assert tickets == [body]
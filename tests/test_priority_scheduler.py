@@ -0,0 +1,104 @@
+import sys
+import os
+from datetime import datetime, timezone
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from hedging import current_deadline
+from metrics import MetricsRegistry
+from priority_scheduler import PriorityScheduler, PriorityScorer
+
+
+def mock_processor(monkeypatch):
+    processor = EmailProcessor(metrics=MetricsRegistry(), api_key="sk-test")
+
+    def mock_create(*args, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        complaint = "refund" in prompt.lower()
+        if "Drafted Response" in prompt:
+            urgency = "high" if complaint else "low"
+            content = f"Reasoning:\n1. Summary: s\n2. Tone: neutral\n3. Urgency: {urgency}\n\nDrafted Response:\nThanks!"
+        else:
+            content = f"Category: {'complaint' if complaint else 'other'}\nConfidence: 5"
+
+        class MockResponse:
+            class Choice:
+                message = type("obj", (object,), {"content": content})
+            choices = [Choice()]
+        return MockResponse()
+
+    monkeypatch.setattr(processor.client.chat.completions, "create", mock_create)
+    return processor
+
+
+def backlog():
+    emails = []
+    for i in range(12):
+        body = "I want a refund for my broken order." if i % 4 == 3 else "Let's schedule a partnership call."
+        emails.append({"id": f"p{i:02d}", "from": f"user{i}@example.com", "subject": "Hello", "body": body})
+    return emails
+
+# Keywords, sender complaint history and email age raise the local score
+def test_local_score_signals():
+    scorer = PriorityScorer()
+    now = datetime(2024, 3, 17, 10, 30, tzinfo=timezone.utc)
+    plain = {"from": "a@example.com", "subject": "Hi", "body": "Partnership?", "timestamp": "2024-03-17T10:30:00Z"}
+    assert scorer.local_score(plain, now) == 0
+    assert scorer.local_score(dict(plain, body="URGENT: refund now"), now) == 5
+    assert scorer.local_score(dict(plain, timestamp="2024-03-15T10:30:00Z"), now) == 2
+
+    scorer.observe(plain, "complaint")
+    assert scorer.local_score(plain, now) == 1
+
+# Under a backlog, complaints are answered before lower-priority mail
+def test_complaints_served_first(monkeypatch):
+    scheduler = PriorityScheduler(EmailAutomationSystem(mock_processor(monkeypatch)), workers=1)
+    for email in backlog():
+        scheduler.submit(email)
+    results = scheduler.process_all([])
+
+    assert all(result["success"] for result in results)
+    assert [result["email_id"] for result in results[:3]] == ["p03", "p07", "p11"]
+    stats = scheduler.stats()
+    assert stats["complaint"]["count"] == 3
+    assert stats["complaint"]["p95_seconds"] <= stats["other"]["p95_seconds"]
+    metrics = scheduler.automation.processor.metrics
+    assert metrics.counter("email_processed_total").value(success="true") == 12
+    assert metrics.histogram("email_processing_seconds").count() == 12
+    assert not scheduler.automation.escalated
+
+# Aging bounds how far a high score can jump ahead of mail that has waited longer
+def test_aging_prevents_starvation(monkeypatch):
+    scheduler = PriorityScheduler(EmailAutomationSystem(mock_processor(monkeypatch)), workers=1, aging_seconds=0)
+    for email in backlog():
+        scheduler.submit(email)
+    results = scheduler.process_all([])
+    assert [result["email_id"] for result in results] == [email["id"] for email in backlog()]
+
+# The email deadline, set on admission, applies to the classify and respond steps
+def test_email_deadline_applies_to_steps(monkeypatch):
+    processor = mock_processor(monkeypatch)
+    deadlines = []
+    classify = processor.classify_email_with_confidence
+    draft = processor.generate_response_with_reasoning
+    monkeypatch.setattr(processor, "classify_email_with_confidence",
+                        lambda email: deadlines.append(current_deadline()) or classify(email))
+    monkeypatch.setattr(processor, "generate_response_with_reasoning",
+                        lambda email, category: deadlines.append(current_deadline()) or draft(email, category))
+    scheduler = PriorityScheduler(EmailAutomationSystem(processor, email_deadline=30), workers=2)
+    results = scheduler.process_all(backlog()[:1])
+
+    assert results[0]["success"]
+    assert len(deadlines) == 2 and None not in deadlines
+    assert abs(deadlines[0] - deadlines[1]) < 0.01
+    assert current_deadline() is None
+
+# The reply's reasoning block is parsed into summary, tone and urgency
+def test_generate_response_with_reasoning(monkeypatch):
+    processor = mock_processor(monkeypatch)
+    email = {"id": "r1", "subject": "Broken", "body": "refund please"}
+    response, reasoning = processor.generate_response_with_reasoning(email, "complaint")
+    assert response == "Thanks!"
+    assert reasoning == {"summary": "s", "tone": "neutral", "urgency": "high"}
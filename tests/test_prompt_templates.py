@@ -0,0 +1,60 @@
+import sys
+import os
+import logging
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+from email_classifier_template import EmailProcessor
+from prompt_templates import PROMPT_VERSION, compile_prompts
+
+# Static instructions come first as one shared system message; the email comes last
+def test_static_prefix_first():
+    prompts = compile_prompts()
+    first = prompts["respond"].render(category="complaint", subject="Broken", body="It arrived broken.")
+    second = prompts["respond"].render(category="inquiry", subject="Mac?", body="Does it run on Mac?")
+
+    assert first[0] is second[0]
+    assert first[0]["role"] == "system" and "Drafted Response:" in first[0]["content"]
+    assert "Broken" not in first[0]["content"]
+    assert first[1]["role"] == "user"
+    assert first[1]["content"].index("It arrived broken.") > first[1]["content"].index("Category: complaint")
+
+# Every template of the default version compiles with its expected fields
+def test_template_fields():
+    prompts = compile_prompts(PROMPT_VERSION)
+    assert prompts["classify"].fields == ("subject", "body")
+    assert prompts["classify_batch"].fields == ("emails",)
+    with pytest.raises(ValueError):
+        prompts["classify"].render(subject="only subject")
+    with pytest.raises(ValueError):
+        compile_prompts("v0")
+
+# Braces in email content are not treated as template fields
+def test_render_literal_braces():
+    messages = compile_prompts()["classify"].render(subject="{oops}", body="{\"json\": 1}")
+    assert "Subject: {oops}" in messages[1]["content"]
+
+# Prompts over their token budget are logged
+def test_token_budget_warning(caplog):
+    prompts = compile_prompts(token_budgets={"classify": 300})
+    with caplog.at_level(logging.WARNING, logger="prompt_templates"):
+        prompts["classify"].render(subject="short", body="tiny")
+        assert not caplog.records
+        prompts["classify"].render(subject="long", body="word " * 400)
+    assert "over its budget of 300" in caplog.text
+
+# The template version is part of the classification cache key
+def test_prompt_version_in_cache_key():
+    processor = EmailProcessor()
+    assert processor.classification_prompt_version == PROMPT_VERSION
+    email = {"id": "1", "subject": "s", "body": "b"}
+    messages = processor._classification_messages(email)
+    assert [message["role"] for message in messages] == ["system", "user"]
+
+    key = processor._cache_key(email)
+    assert processor._cache_key(dict(email, id="2")) == key
+    processor.classification_prompt_version = PROMPT_VERSION + "-next"
+    assert processor._cache_key(email) != key
@@ -0,0 +1,123 @@
+import asyncio
+import sys
+import os
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+import rate_limiter
+from rate_limiter import RequestScheduler, TokenBucket, retry_after_seconds
+
+
+class FakeStatusError(Exception):
+    """Stand-in for an OpenAI status error carrying a response with headers."""
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("obj", (object,), {"headers": headers or {}})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: recorded.append(seconds))
+    return recorded
+
+# Retry-After and rate-limit reset headers are honored
+def test_retry_after_headers():
+    assert retry_after_seconds(FakeStatusError(429, {"retry-after": "3"})) == 3
+    assert retry_after_seconds(FakeStatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(FakeStatusError(429, {"x-ratelimit-reset-requests": "1m2s",
+                                                     "x-ratelimit-reset-tokens": "20ms"})) == 62
+    assert retry_after_seconds(FakeStatusError(429)) is None
+
+# 429s are retried after the suggested delay and halve the concurrency limit
+def test_call_retries_rate_limits(sleeps):
+    scheduler = RequestScheduler(max_concurrency=8)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeStatusError(429, {"retry-after": "0.5"})
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    assert [s for s in sleeps if s] == [0.5, 0.5]
+    assert scheduler.stats()["rate_limited"] == 2
+    assert scheduler.concurrency_limit == 2
+
+# Non-retryable errors surface immediately; retryable ones after max_retries
+def test_call_gives_up(sleeps):
+    scheduler = RequestScheduler(max_retries=2, base_delay=0)
+    with pytest.raises(ValueError):
+        scheduler.call(lambda: (_ for _ in ()).throw(ValueError("bad request")))
+    assert scheduler.retries == 0
+
+    with pytest.raises(FakeStatusError):
+        scheduler.call(lambda: (_ for _ in ()).throw(FakeStatusError(503)))
+    assert scheduler.retries == 2
+
+# With a deadline, request timeouts are capped at the time left and no retry starts past it
+def test_call_stops_retrying_at_deadline():
+    scheduler = RequestScheduler(max_retries=4, base_delay=0.05, max_delay=0.05)
+    timeouts = []
+
+    def timing_out(timeout=None):
+        timeouts.append(timeout)
+        time.sleep(timeout)
+        raise FakeStatusError(408)
+
+    started = time.perf_counter()
+    with pytest.raises(FakeStatusError):
+        scheduler.call(timing_out, timeout=10, deadline=time.monotonic() + 0.2)
+    assert time.perf_counter() - started < 0.3
+    assert 1 <= len(timeouts) < 5
+    assert all(timeout <= 0.2 for timeout in timeouts)
+
+# Request budget makes callers wait once the bucket is empty
+def test_token_bucket_wait():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+# The same scheduler works from asyncio and records actual token usage
+def test_acall_adjusts_token_budget():
+    scheduler = RequestScheduler(tokens_per_minute=1000)
+
+    async def create():
+        return type("obj", (object,), {"usage": type("obj", (object,), {"total_tokens": 300})})
+
+    asyncio.run(scheduler.acall(create, estimated_tokens=100))
+    assert scheduler.token_bucket.tokens == pytest.approx(700, abs=5)
+    assert scheduler.in_flight == 0
+
+# Async callers wait on the concurrency gate without polling and are woken by releases from threads
+def test_acall_waits_for_free_slot():
+    scheduler = RequestScheduler(max_concurrency=2)
+    active, peak = [0], [0]
+
+    async def create():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+
+    async def main():
+        scheduler._acquire()
+        scheduler._acquire()
+        tasks = [asyncio.ensure_future(scheduler.acall(create)) for _ in range(6)]
+        await asyncio.sleep(0.05)
+        waiting = len(scheduler._async_waiters)
+        scheduler._release()
+        scheduler._release()
+        await asyncio.gather(*tasks)
+        return waiting
+
+    assert asyncio.run(main()) == 6
+    assert peak[0] == 2
+    assert scheduler.in_flight == 0 and not scheduler._async_waiters
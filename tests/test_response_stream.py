@@ -0,0 +1,143 @@
+import sys
+import os
+import asyncio
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+import email_classifier_template
+from checkpoint_store import CheckpointStore
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from mock_llm_server import MockLLMServer
+from response_stream import ResponseStreamParser
+
+OUTPUT = (
+    "Reasoning:\n"
+    "1. Summary: Order arrived broken.\n"
+    "2. Tone: Angry\n"
+    "3. Urgency: high\n\n"
+    "Drafted Response:\n"
+    "We are sorry.\n"
+    "- A replacement ships today.\n\n"
+    "Note: offer a discount if they reply again."
+)
+
+def feed_all(parser, deltas):
+    fields, text = {}, ""
+    for delta in deltas:
+        new_fields, new_text = parser.feed(delta)
+        fields.update(new_fields)
+        text += new_text
+    new_fields, new_text = parser.finish()
+    fields.update(new_fields)
+    return fields, text + new_text
+
+# However the output is split into deltas, the parsed result is the same
+@pytest.mark.parametrize("size", [1, 3, 7, len(OUTPUT)])
+def test_parser_delta_sizes(size):
+    parser = ResponseStreamParser()
+    fields, text = feed_all(parser, [OUTPUT[i:i + size] for i in range(0, len(OUTPUT), size)])
+    assert fields == {"summary": "Order arrived broken.", "tone": "angry", "urgency": "high"}
+    assert text.strip() == parser.response == "We are sorry.\n- A replacement ships today."
+    assert parser.stop_reason == "complete"
+
+# Reasoning fields are reported before any reply text arrives
+def test_parser_reports_urgency_early():
+    parser = ResponseStreamParser()
+    fields, text = parser.feed(OUTPUT[:OUTPUT.index("Drafted")])
+    assert fields["urgency"] == "high"
+    assert text == ""
+
+# The reply is cut at a word boundary once the length cap is reached
+def test_parser_length_cap():
+    parser = ResponseStreamParser(max_response_chars=20)
+    feed_all(parser, [OUTPUT])
+    assert parser.stop_reason == "length"
+    assert parser.response == "We are sorry.\n- A"
+
+# Output without a drafted response yields no reply
+def test_parser_missing_response():
+    parser = ResponseStreamParser()
+    fields, text = feed_all(parser, ["Summary: hi\nUrgency: low"])
+    assert fields == {"summary": "hi", "urgency": "low"}
+    assert text == "" and not parser.in_response
+
+# Streaming against the mock server gives the same reply as the blocking call
+def test_stream_response_matches_blocking():
+    with MockLLMServer(latency_ms=1) as server:
+        processor = EmailProcessor(base_url=server.base_url, api_key="sk-test")
+        email = {"id": "s1", "subject": "Broken", "body": "My order arrived broken, refund please."}
+        pieces = list(processor.stream_response(email, "complaint"))
+        blocking = processor.generate_response_with_reasoning(email, "complaint")
+        streamed = asyncio.run(processor.agenerate_response_streaming(email, "complaint"))
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == blocking[0]
+    assert streamed == blocking
+    assert 'email_llm_completion_tokens_total{call="respond"}' in processor.metrics.render()
+
+# High urgency creates the ticket before the reply is finished, and only once
+def test_urgent_ticket_created_early(monkeypatch):
+    events = []
+    monkeypatch.setattr(email_classifier_template, "create_urgent_ticket",
+                        lambda email_id, category, context: events.append("ticket"))
+    with MockLLMServer(latency_ms=1) as server:
+        processor = EmailProcessor(base_url=server.base_url, api_key="sk-test")
+        automation = EmailAutomationSystem(processor, stream_responses=True, max_response_tokens=5)
+        original = processor._consume_chunk
+
+        def consume(parser, chunk, on_reasoning):
+            text = original(parser, chunk, on_reasoning)
+            if text:
+                events.append("text")
+            return text
+
+        monkeypatch.setattr(processor, "_consume_chunk", consume)
+        result = automation.process_email({"id": "s2", "subject": "Broken", "body": "Arrived broken, refund now."})
+
+    assert result["success"] and result["classification"] == "complaint"
+    assert result["response_sent"] == "Thank you for"
+    assert events.index("ticket") < events.index("text")
+    assert events.count("ticket") == 1
+    assert not automation.escalated
+
+# Streaming creates the same tickets as the blocking path: high urgency escalates only complaints
+def test_high_urgency_non_complaint_not_escalated(monkeypatch):
+    urgent, support = [], []
+    monkeypatch.setattr(email_classifier_template, "create_urgent_ticket",
+                        lambda email_id, category, context: urgent.append(email_id))
+    monkeypatch.setattr(email_classifier_template, "create_support_ticket",
+                        lambda email_id, context: support.append(email_id))
+    with MockLLMServer(latency_ms=1) as server:
+        processor = EmailProcessor(base_url=server.base_url, api_key="sk-test")
+        monkeypatch.setattr(processor, "classify_email_with_confidence", lambda email: ("support_request", 5))
+        reasoning = []
+        original = processor._consume_chunk
+        monkeypatch.setattr(processor, "_consume_chunk", lambda parser, chunk, on_reasoning: original(
+            parser, chunk, lambda field, value: reasoning.append((field, value)) or on_reasoning(field, value)))
+        automation = EmailAutomationSystem(processor, stream_responses=True)
+        result = automation.process_email({"id": "s3", "subject": "Broken", "body": "Arrived broken, refund now."})
+
+    assert result["success"] and result["classification"] == "support_request"
+    assert ("urgency", "high") in reasoning
+    assert urgent == [] and support == ["s3"]
+
+# With a checkpoint the early ticket is claimed on its own and never repeated by a resumed run
+def test_early_ticket_claimed_in_checkpoint(tmp_path, monkeypatch):
+    tickets = []
+    monkeypatch.setattr(email_classifier_template, "create_urgent_ticket",
+                        lambda email_id, category, context: tickets.append(email_id))
+    checkpoint = CheckpointStore(str(tmp_path / "cp.sqlite"))
+    email = {"id": "u1", "subject": "Broken", "body": "Refund now."}
+
+    first = EmailAutomationSystem(EmailProcessor(api_key="sk-test"), checkpoint=checkpoint)
+    first._escalate_early(email, "complaint", "urgency", "high")
+    # The reply failed and the process restarted: neither the stream nor the handler repeats the ticket
+    resumed = EmailAutomationSystem(EmailProcessor(api_key="sk-test"), checkpoint=checkpoint)
+    resumed._escalate_early(email, "complaint", "urgency", "high")
+    resumed._handle_complaint(email, "Sorry.")
+
+    assert tickets == ["u1"]
+    assert checkpoint.effect_status("u1:urgent") == "done"
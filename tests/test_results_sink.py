@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pyarrow.parquet as pq
+import pytest  # type: ignore
+
+from results_sink import ResultsWriter, preview_responses, results_format, summarize_results, write_results
+
+
+def make_results(count):
+    categories = ["complaint", "inquiry", "feedback", None]
+    for i in range(count):
+        category = categories[i % 4]
+        yield {
+            "email_id": f"{i:05d}",
+            "success": category is not None,
+            "classification": category,
+            "confidence": 4 if category else None,
+            "response_sent": f"Reply {i} " + "x" * 300 if category else None,
+        }
+
+# Results are appended in row groups of the configured size
+def test_parquet_row_groups(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    assert write_results(make_results(25), path, row_group_size=10) == 25
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_rows == 25
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [10, 10, 5]
+
+# Summaries aggregate batch by batch over Parquet and Arrow IPC files alike
+@pytest.mark.parametrize("name", ["results.parquet", "results.arrow"])
+def test_summarize_results(tmp_path, name):
+    path = str(tmp_path / name)
+    with ResultsWriter(path, row_group_size=7) as writer:
+        writer.write_many(make_results(40))
+
+    summary = summarize_results(path)
+    assert summary["total"] == 40
+    assert summary["succeeded"] == 30
+    assert summary["success_rate"] == 0.75
+    assert summary["categories"] == {"complaint": 10, "feedback": 10, "inquiry": 10, "none": 10}
+    assert summary["confidence"] == {"4": 30, "none": 10}
+
+# Previews read only the needed rows and truncate responses
+def test_preview_responses(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    write_results(make_results(10), path)
+    previews = list(preview_responses(path, limit=2, width=20))
+    assert [row["email_id"] for row in previews] == ["00000", "00001"]
+    assert all(len(row["response_sent"]) == 20 for row in previews)
+
+# Output format is chosen by extension
+def test_results_format():
+    assert results_format("out.parquet") == "parquet"
+    assert results_format("out.arrow") == "arrow"
+    assert results_format("out.jsonl") is None
+    with pytest.raises(ValueError):
+        ResultsWriter("out.jsonl")
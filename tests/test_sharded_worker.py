@@ -0,0 +1,79 @@
+import sys
+import os
+import json
+import sqlite3
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import email_classifier_template
+from benchmark import MOCK_API_KEY, synthetic_emails
+from checkpoint_store import CheckpointStore
+from mock_llm_server import MockLLMServer
+from sharded_worker import export_results, iter_shard, process_shard, run_sharded, shard_of
+
+
+def write_source(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for email in synthetic_emails(count, seed=2):
+            f.write(json.dumps(email) + "\n")
+    return str(path)
+
+# Shards are stable and partition the input
+def test_shards_partition_input():
+    emails = list(synthetic_emails(50))
+    assert shard_of("email-1", 4) == shard_of("email-1", 4)
+    shards = [list(iter_shard(emails, shard, 4)) for shard in range(4)]
+    assert sorted(e["id"] for part in shards for e in part) == sorted(e["id"] for e in emails)
+    assert all(shards)
+
+# A handler can be claimed once; failed handlers are released, crashed ones reported
+def test_checkpoint_effect_claims(tmp_path):
+    store = CheckpointStore(str(tmp_path / "cp.sqlite"))
+    assert store.claim_effect("a", "complaint")
+    assert not CheckpointStore(store.path).claim_effect("a", "complaint")
+    store.confirm_effect("a")
+    assert store.effect_status("a") == "done"
+
+    assert store.claim_effect("b", "inquiry")
+    store.release_effect("b")
+    assert store.claim_effect("b", "inquiry")
+    assert store.unconfirmed_effects() == {"b": "inquiry"}
+
+# A resumed shard skips completed emails and never repeats a handler's side effects
+def test_resume_never_repeats_side_effects(tmp_path, monkeypatch):
+    source = write_source(tmp_path / "inbox.jsonl", 20)
+    checkpoint = str(tmp_path / "cp.sqlite")
+    tickets = []
+    monkeypatch.setattr(email_classifier_template, "create_urgent_ticket",
+                        lambda email_id, category, context: tickets.append(email_id))
+
+    with MockLLMServer(latency_ms=0) as server:
+        kwargs = {"base_url": server.base_url, "api_key": MOCK_API_KEY}
+        first = [process_shard(source, checkpoint, shard, 2, processor_kwargs=kwargs) for shard in range(2)]
+        ticketed = list(tickets)
+
+        # Simulate a crash after the handlers ran but before results were committed
+        with sqlite3.connect(checkpoint) as db:
+            db.execute("DELETE FROM results WHERE shard = 0")
+        second = [process_shard(source, checkpoint, shard, 2, processor_kwargs=kwargs) for shard in range(2)]
+
+    assert sum(c["succeeded"] for c in first) == 20
+    assert ticketed and len(set(ticketed)) == len(ticketed)
+    assert tickets == ticketed
+    assert second[0]["processed"] == first[0]["processed"] and second[0]["succeeded"] == first[0]["succeeded"]
+    assert second[1] == {"shard": 1, "processed": 0, "succeeded": 0, "skipped": first[1]["processed"]}
+
+# Shards run on a process pool and results can be exported from the checkpoint
+def test_run_sharded_process_pool(tmp_path):
+    source = write_source(tmp_path / "inbox.jsonl", 30)
+    checkpoint = str(tmp_path / "cp.sqlite")
+    with MockLLMServer(latency_ms=0) as server:
+        kwargs = {"base_url": server.base_url, "api_key": MOCK_API_KEY}
+        summary = run_sharded(source, checkpoint, num_shards=3, processor_kwargs=kwargs)
+
+    assert [c["shard"] for c in summary] == [0, 1, 2]
+    assert sum(c["succeeded"] for c in summary) == 30
+    store = CheckpointStore(checkpoint)
+    assert store.stats() == {"completed": 30, "failed": 0, "effects_done": 30, "effects_unconfirmed": 0}
+    assert export_results(checkpoint, str(tmp_path / "results.jsonl")) == 30
@@ -0,0 +1,71 @@
+import threading
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from email_classifier_template import EmailProcessor, EmailAutomationSystem
+from hedging import current_deadline
+from metrics import MetricsRegistry
+from staged_pipeline import StagedPipeline
+
+
+def make_automation(monkeypatch, **kwargs):
+    processor = EmailProcessor(metrics=MetricsRegistry())
+    classified = []
+
+    def classify(email):
+        classified.append(email["id"])
+        return ("inquiry", 4) if "fail" not in email["body"] else (None, None)
+
+    monkeypatch.setattr(processor, "classify_email_with_confidence", classify)
+    monkeypatch.setattr(processor, "generate_response", lambda email, category: f"Re: {email['id']}")
+    return EmailAutomationSystem(processor, **kwargs), classified
+
+# A blocked handler doesn't stop classification of later emails; results stay in order
+def test_slow_handler_does_not_block_classification(monkeypatch):
+    automation, classified = make_automation(monkeypatch)
+    release = threading.Event()
+    handled = []
+
+    def slow_handler(email, response):
+        release.wait(timeout=5)
+        handled.append(email["id"])
+
+    automation.response_handlers["inquiry"] = slow_handler
+    pipeline = StagedPipeline(automation, classify_workers=2, generate_workers=2, handler_workers=1, queue_size=4)
+    emails = [{"id": str(i), "subject": "Q", "body": "fail" if i == 3 else "?"} for i in range(6)]
+
+    results = pipeline.run(emails)
+    # Wait until every email has been classified while the handler is still blocked
+    for _ in range(500):
+        if len(classified) == len(emails):
+            break
+        threading.Event().wait(0.01)
+    assert sorted(classified, key=int) == [str(i) for i in range(6)]
+    assert handled == []
+    assert pipeline.queue_depths()["handle"] >= 1
+
+    release.set()
+    output = list(results)
+    assert [r["email_id"] for r in output] == [str(i) for i in range(6)]
+    assert [r["success"] for r in output] == [True, True, True, False, True, True]
+    assert output[0]["response_sent"] == "Re: 0"
+    assert pipeline.stats()["classify"]["processed"] == 6
+    assert pipeline.stats()["handle"]["processed"] == 5
+    metrics = automation.processor.metrics
+    assert metrics.counter("email_processed_total").value(success="true") == 5
+    assert metrics.counter("email_processed_total").value(success="false") == 1
+    assert metrics.histogram("email_processing_seconds").count() == 6
+
+# The email deadline applies to the classify and generate stages
+def test_email_deadline_applies_to_stages(monkeypatch):
+    automation, _ = make_automation(monkeypatch, email_deadline=30)
+    deadlines = []
+    monkeypatch.setattr(automation.processor, "generate_response",
+                        lambda email, category: deadlines.append(current_deadline()) or "Re")
+    results = StagedPipeline(automation).process_all([{"id": "1", "subject": "Q", "body": "?"}])
+
+    assert results[0]["success"]
+    assert deadlines and deadlines[0] is not None
@@ -0,0 +1,64 @@
+import sys
+import os
+import subprocess
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from email_classifier_template import EmailProcessor
+from rate_limiter import is_rate_limited, is_retryable
+from startup_benchmark import HEAVY_MODULES, heaviest_imports, measure_import, parse_importtime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run_python(code: str) -> str:
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT,
+                               env=dict(os.environ, OPENAI_API_KEY="sk-dummy"), check=True)
+    return completed.stdout.strip()
+
+# Importing the pipeline loads none of the heavy third-party packages
+def test_import_loads_no_heavy_modules():
+    for module in ("email_classifier_template", "sharded_worker", "batch_jobs"):
+        assert measure_import(module, cwd=ROOT)["heavy_modules"] == []
+
+# Importing has no side effects: no logging handlers are installed
+def test_import_configures_no_logging():
+    assert run_python("import logging, email_classifier_template; print(len(logging.getLogger().handlers))") == "0"
+
+# Building a processor doesn't create a client; the first call does
+def test_client_created_on_first_use():
+    code = ("import sys; from email_classifier_template import EmailProcessor; p = EmailProcessor(); "
+            "print('openai' in sys.modules); p.client; print('openai' in sys.modules)")
+    assert run_python(code).split() == ["False", "True"]
+
+# Processors on the same endpoint share one sync client; async clients stay per processor
+def test_sync_client_shared(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    first, second = EmailProcessor(), EmailProcessor()
+    other = EmailProcessor(base_url="http://127.0.0.1:1/v1")
+
+    assert first.client is second.client
+    assert other.client is not first.client
+    assert first.async_client is not second.async_client
+
+# Retry classification works before openai is imported
+def test_retry_checks_without_openai():
+    code = ("import sys; from rate_limiter import is_retryable; "
+            "error = type('E', (Exception,), {'status_code': 503})(); "
+            "print(is_retryable(error), 'openai' in sys.modules)")
+    assert run_python(code).split() == ["True", "False"]
+    assert is_rate_limited(type("E", (Exception,), {"status_code": 429})())
+    assert not is_retryable(ValueError("bad"))
+
+# -X importtime output is parsed into self/cumulative times per module
+def test_parse_importtime():
+    output = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |     posix\n"
+              "import time:       300 |        420 |   os\n"
+              "import time:      1000 |       1420 | mymodule\n")
+    timings = parse_importtime(output)
+
+    assert timings == {"posix": (120, 120), "os": (300, 420), "mymodule": (1000, 1420)}
+    assert heaviest_imports(timings, 2) == [("mymodule", 1.0), ("os", 0.3)]
+    assert "openai" in HEAVY_MODULES
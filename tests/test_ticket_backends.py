@@ -0,0 +1,225 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest  # type: ignore
+
+from checkpoint_store import CheckpointStore
+from email_classifier_template import EmailAutomationSystem, EmailProcessor
+from metrics import MetricsRegistry
+from ticket_backends import BackendError, BufferedDispatcher, HandlerBackend, HttpBackend, InMemoryBackend
+
+# Full batches are sent as soon as they fill up
+def test_size_trigger():
+    backend = InMemoryBackend()
+    with BufferedDispatcher(backend, max_batch_size=10, flush_interval=60) as dispatcher:
+        for i in range(25):
+            dispatcher.submit("support_ticket", {"email_id": str(i)})
+        deadline = time.monotonic() + 2
+        while len(backend.batches) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend.batches == [10, 10]
+    assert sorted(backend.batches) == [5, 10, 10]
+    assert sorted(int(record["email_id"]) for record in backend.records["support_ticket"]) == list(range(25))
+
+# Partial batches are sent once their oldest record has waited flush_interval
+def test_time_trigger():
+    backend = InMemoryBackend()
+    with BufferedDispatcher(backend, max_batch_size=100, flush_interval=0.05) as dispatcher:
+        dispatcher.submit("feedback", {"email_id": "1"})
+        dispatcher.submit("urgent_ticket", {"email_id": "2"})
+        time.sleep(0.3)
+        assert sorted(backend.batches) == [1, 1]
+        assert dispatcher.pending() == 0
+
+# A slow backend makes submit block instead of queueing without bound
+def test_backpressure():
+    backend = InMemoryBackend(delay=0.1)
+    dispatcher = BufferedDispatcher(backend, max_batch_size=1, flush_interval=60, max_pending=2, senders=1,
+                                    metrics=MetricsRegistry())
+    started = time.perf_counter()
+    for i in range(6):
+        dispatcher.submit("support_ticket", {"email_id": str(i)})
+    assert time.perf_counter() - started >= 0.15
+    dispatcher.flush()
+    assert len(backend.records["support_ticket"]) == 6
+    dispatcher.close()
+    assert "email_backend_backpressure_seconds" in dispatcher.metrics.render()
+
+# Failed batches are retried, then counted as failed
+def test_retries_then_failure():
+    class FlakyBackend(InMemoryBackend):
+        calls = 0
+
+        def send_batch(self, kind, records):
+            self.calls += 1
+            if self.calls < 3 or records[0]["email_id"] == "bad":
+                raise BackendError("unavailable")
+            super().send_batch(kind, records)
+
+    backend = FlakyBackend()
+    with BufferedDispatcher(backend, max_batch_size=1, max_retries=2, retry_delay=0.001) as dispatcher:
+        dispatcher.submit("feedback", {"email_id": "good"})
+        dispatcher.submit("feedback", {"email_id": "bad"})
+        dispatcher.flush()
+        assert dispatcher.stats == {"sent": 1, "failed": 1, "batches": 2}
+
+# Backends must implement send_batch; asend_batch runs it off the event loop by default
+def test_backend_interface():
+    with pytest.raises(TypeError):
+        HandlerBackend()
+    backend = InMemoryBackend(max_batch_size=2)
+    asyncio.run(backend.asend_batch("feedback", [{"email_id": "1"}, {"email_id": "2"}]))
+    assert backend.batches == [2]
+    with pytest.raises(BackendError):
+        asyncio.run(backend.asend_batch("feedback", [{"email_id": "3"}] * 3))
+
+# The HTTP backend posts bulk JSON over a bounded pool of reused connections
+def test_http_backend_pooled():
+    received, peers = [], set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            received.append((self.path, body["kind"], len(body["items"])))
+            peers.add(self.client_address)
+            status = 500 if body["kind"] == "feedback" else 200
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = HttpBackend(f"http://127.0.0.1:{server.server_address[1]}/api", max_connections=2)
+        threads = [threading.Thread(target=backend.send_batch, args=("support_ticket", [{"email_id": str(i)}] * 3))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with pytest.raises(BackendError):
+            backend.send_batch("feedback", [{"email_id": "x"}])
+        backend.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert received[0] == ("/api/tickets/bulk", "support_ticket", 3)
+    assert len(received) == 9
+    assert backend.connections_opened <= 2 and len(peers) <= 2
+
+# With a dispatcher, handlers queue their side effects instead of calling the mocks inline
+def test_automation_uses_dispatcher(monkeypatch):
+    processor = EmailProcessor()
+    monkeypatch.setattr(processor, "classify_email_with_confidence", lambda email: ("support_request", 5))
+    monkeypatch.setattr(processor, "generate_response", lambda email, category: "We are on it.")
+    backend = InMemoryBackend()
+    with BufferedDispatcher(backend, flush_interval=60) as dispatcher:
+        automation = EmailAutomationSystem(processor, dispatcher=dispatcher)
+        result = automation.process_email({"id": "d1", "subject": "Help", "body": "App crashes on start."})
+        assert result["success"]
+        assert backend.records["support_ticket"] == []
+    assert backend.records["support_ticket"] == [{"email_id": "d1", "context": "App crashes on start."}]
+
+# Batches are sent by a pool of senders, so one slow batch doesn't hold up the others
+def test_batches_sent_in_parallel():
+    backend = InMemoryBackend(delay=0.2)
+    with BufferedDispatcher(backend, max_batch_size=1, flush_interval=60, senders=4) as dispatcher:
+        started = time.perf_counter()
+        for i in range(4):
+            dispatcher.submit("support_ticket", {"email_id": str(i)})
+        dispatcher.flush()
+        assert time.perf_counter() - started < 0.6
+    assert len(backend.records["support_ticket"]) == 4
+
+# Delivery callbacks report whether a record reached the backend
+def test_delivery_callbacks():
+    class FailingFeedback(InMemoryBackend):
+        def send_batch(self, kind, records):
+            if kind == "feedback":
+                raise BackendError("unavailable")
+            super().send_batch(kind, records)
+
+    outcomes = []
+    with BufferedDispatcher(FailingFeedback(), max_retries=0) as dispatcher:
+        dispatcher.submit("support_ticket", {"email_id": "1"}, lambda delivered: outcomes.append(("1", delivered)))
+        dispatcher.submit("feedback", {"email_id": "2"}, lambda delivered: outcomes.append(("2", delivered)))
+        dispatcher.flush()
+    assert sorted(outcomes) == [("1", True), ("2", False)]
+
+# With a checkpoint, a handler is confirmed only once its records are delivered
+def test_effect_confirmed_on_delivery(tmp_path, monkeypatch):
+    processor = EmailProcessor(api_key="sk-test")
+    monkeypatch.setattr(processor, "classify_email_with_confidence", lambda email: ("support_request", 5))
+    monkeypatch.setattr(processor, "generate_response", lambda email, category: "We are on it.")
+    checkpoint = CheckpointStore(str(tmp_path / "cp.sqlite"))
+    release = threading.Event()
+
+    class GatedBackend(InMemoryBackend):
+        def send_batch(self, kind, records):
+            release.wait(2)
+            super().send_batch(kind, records)
+
+    with BufferedDispatcher(GatedBackend(), max_batch_size=1) as dispatcher:
+        automation = EmailAutomationSystem(processor, checkpoint=checkpoint, dispatcher=dispatcher)
+        assert automation.process_email({"id": "c1", "subject": "Help", "body": "App crashes."})["success"]
+        assert checkpoint.effect_status("c1") == "claimed"
+        release.set()
+        dispatcher.flush()
+        assert checkpoint.effect_status("c1") == "done"
+
+    # A record that is given up leaves the handler unconfirmed
+    with BufferedDispatcher(GatedBackend(max_batch_size=0), max_retries=0) as dispatcher:
+        automation = EmailAutomationSystem(processor, checkpoint=checkpoint, dispatcher=dispatcher)
+        automation.process_email({"id": "c2", "subject": "Help", "body": "App crashes."})
+        dispatcher.flush()
+    assert checkpoint.unconfirmed_effects() == {"c2": "support_request"}
+    checkpoint.close()
+
+# The async path doesn't block the event loop on a full dispatcher queue
+def test_async_full_queue_does_not_block_loop(monkeypatch):
+    processor = EmailProcessor(api_key="sk-test")
+
+    async def classify(email):
+        return "support_request", 5
+
+    async def respond(email, category):
+        return "We are on it."
+
+    monkeypatch.setattr(processor, "aclassify_email_with_confidence", classify)
+    monkeypatch.setattr(processor, "agenerate_response", respond)
+    backend = InMemoryBackend(delay=0.1)
+    ticks = []
+
+    async def main():
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        emails = [{"id": str(i), "subject": "Help", "body": "App crashes."} for i in range(6)]
+        results = await automation.process_emails_async(emails)
+        task.cancel()
+        return results
+
+    with BufferedDispatcher(backend, max_batch_size=1, flush_interval=60, max_pending=1, senders=1) as dispatcher:
+        automation = EmailAutomationSystem(processor, dispatcher=dispatcher)
+        results = asyncio.run(main())
+    assert all(result["success"] for result in results)
+    assert len(backend.records["support_ticket"]) == 6
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.08
@@ -0,0 +1,346 @@
+# Standard library
+import abc
+import asyncio
+import http.client
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Side effects produced by the category handlers
+KINDS = ("urgent_ticket", "support_ticket", "feedback", "complaint_response", "standard_response")
+
+# Bulk endpoint of each kind on an HTTP backend
+DEFAULT_PATHS = {
+    "urgent_ticket": "/tickets/bulk",
+    "support_ticket": "/tickets/bulk",
+    "feedback": "/feedback/bulk",
+    "complaint_response": "/messages/bulk",
+    "standard_response": "/messages/bulk",
+}
+
+
+class BackendError(Exception):
+    """A bulk request was rejected by the backend."""
+
+
+class HandlerBackend(abc.ABC):
+    """
+    Destination of handler side effects: tickets, feedback records and outgoing replies.
+
+    Subclasses implement send_batch, which delivers up to max_batch_size records of one
+    kind in a single call. It may be called from several threads at once. asend_batch
+    is its async counterpart; by default it runs send_batch in a worker thread.
+    """
+
+    max_batch_size = 100
+
+    @abc.abstractmethod
+    def send_batch(self, kind: str, records: List[Dict]):
+        """
+        Deliver records of one kind in one call.
+
+        Raises:
+            BackendError: If the backend rejects the batch.
+        """
+
+    async def asend_batch(self, kind: str, records: List[Dict]):
+        """Async counterpart of send_batch; override it with a native async client where one exists."""
+        await asyncio.to_thread(self.send_batch, kind, records)
+
+    def close(self):
+        """Release connections held by the backend."""
+
+
+class InMemoryBackend(HandlerBackend):
+    """Backend that keeps every record in memory, for tests and offline runs."""
+
+    def __init__(self, delay: float = 0.0, max_batch_size: int = 100):
+        """
+        Args:
+            delay (float): Simulated round-trip time of each batch call, in seconds.
+            max_batch_size (int): Largest batch accepted per call.
+        """
+        self.delay = delay
+        self.max_batch_size = max_batch_size
+        self.records: Dict[str, List[Dict]] = {kind: [] for kind in KINDS}
+        self.batches: List[int] = []
+        self._lock = threading.Lock()
+
+    def send_batch(self, kind: str, records: List[Dict]):
+        if len(records) > self.max_batch_size:
+            raise BackendError(f"Batch of {len(records)} exceeds the limit of {self.max_batch_size}")
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.records.setdefault(kind, []).extend(records)
+            self.batches.append(len(records))
+
+
+class HttpBackend(HandlerBackend):
+    """
+    Posts batches as JSON to bulk endpoints over a pool of keep-alive connections.
+
+    Each batch is sent as {"kind": ..., "items": [...]} to the kind's path. At most
+    max_connections connections are open at once; callers wait for a free one.
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 8, timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None, paths: Optional[Dict[str, str]] = None,
+                 max_batch_size: int = 100):
+        """
+        Args:
+            base_url (str): http:// or https:// root of the ticketing/mail API.
+            max_connections (int): Size of the connection pool.
+            timeout (float): Socket timeout per request, in seconds.
+            headers (Optional[Dict[str, str]]): Extra headers, e.g. Authorization.
+            paths (Optional[Dict[str, str]]): Per-kind bulk paths overriding DEFAULT_PATHS.
+            max_batch_size (int): Largest batch sent per request.
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported backend URL '{base_url}'")
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._netloc = parts.netloc
+        self._prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.paths = dict(DEFAULT_PATHS, **(paths or {}))
+        self.max_batch_size = max_batch_size
+        self.connections_opened = 0
+        # Idle connections; None marks a slot that has no connection yet
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(max_connections):
+            self._pool.put(None)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        return self._connection_class(self._netloc, timeout=self.timeout)
+
+    def send_batch(self, kind: str, records: List[Dict]):
+        body = json.dumps({"kind": kind, "items": records}).encode("utf-8")
+        connection = self._pool.get() or self._connect()
+        try:
+            connection.request("POST", self._prefix + self.paths[kind], body, self.headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except Exception:
+            # A broken connection is dropped; its slot gets a fresh one on next use
+            connection.close()
+            connection = None
+            raise
+        finally:
+            self._pool.put(connection)
+        if response.status >= 400:
+            raise BackendError(f"{kind} batch rejected with HTTP {response.status}: {payload[:200]!r}")
+
+    def close(self):
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            if connection is not None:
+                connection.close()
+
+
+# Control messages of the dispatcher queue
+_FLUSH = object()
+_STOP = object()
+
+# Called with True once a record is delivered, or False once its batch is given up
+DeliveryCallback = Callable[[bool], None]
+
+
+class BufferedDispatcher:
+    """
+    Collects handler side effects and delivers them to a backend in batches.
+
+    A background thread groups records by kind and hands a batch to a small pool of
+    sender threads once it holds max_batch_size records or its oldest record has
+    waited flush_interval seconds, so a slow or failing batch doesn't hold up the
+    others (batches may therefore arrive out of order). The queue is bounded: when
+    every sender is busy and the queue fills up, submit blocks until there is room,
+    so producers slow down instead of buffering without limit. Failed batches are
+    retried with backoff and then logged and counted as failed.
+
+    Submitted records are queued, not yet delivered; pass on_delivered to learn when
+    they are, and call flush() or close() before exiting to drain them.
+    """
+
+    def __init__(self, backend: HandlerBackend, max_batch_size: Optional[int] = None, flush_interval: float = 0.5,
+                 max_pending: int = 10000, max_retries: int = 3, retry_delay: float = 0.5, senders: int = 4,
+                 metrics=None):
+        """
+        Args:
+            backend (HandlerBackend): Where batches are delivered.
+            max_batch_size (Optional[int]): Records per batch; defaults to the backend's limit.
+            flush_interval (float): Longest time a record waits for its batch to fill, in seconds.
+            max_pending (int): Queue bound; submit blocks once this many records are waiting.
+            max_retries (int): Retries of a failed batch before it is given up.
+            retry_delay (float): Initial retry delay in seconds, doubled on every retry.
+            senders (int): Batches sent at once (at most the HTTP backend's max_connections is useful).
+            metrics (Optional[MetricsRegistry]): Registry for batch, failure and backpressure metrics.
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if senders < 1:
+            raise ValueError("senders must be at least 1")
+        self.backend = backend
+        self.max_batch_size = max_batch_size or backend.max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = metrics
+        self.stats = {"sent": 0, "failed": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        # Batches being filled by the background thread: (record, on_delivered) pairs per kind
+        self._batches: Dict[str, List[Tuple[Dict, Optional[DeliveryCallback]]]] = {}
+        self._oldest: Dict[str, float] = {}
+        self._closed = False
+        self._senders = ThreadPoolExecutor(senders, thread_name_prefix="handler-sender")
+        # Held while a batch is being sent; the background thread waits for one when all senders are busy
+        self._sender_slots = threading.BoundedSemaphore(senders)
+        self._thread = threading.Thread(target=self._run, name="handler-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, record: Dict, on_delivered: Optional[DeliveryCallback] = None):
+        """Queue one record, blocking while the queue is full."""
+        if self._closed:
+            raise RuntimeError("Dispatcher is closed")
+        started = time.perf_counter()
+        self._queue.put((kind, record, on_delivered))
+        waited = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.histogram("email_backend_backpressure_seconds",
+                                   "Time handlers waited for room in the dispatcher queue.").observe(waited)
+
+    def try_submit(self, kind: str, record: Dict, on_delivered: Optional[DeliveryCallback] = None) -> bool:
+        """Queue one record if there is room right now; False if the queue is full."""
+        if self._closed:
+            raise RuntimeError("Dispatcher is closed")
+        try:
+            self._queue.put_nowait((kind, record, on_delivered))
+        except queue.Full:
+            return False
+        return True
+
+    async def asubmit(self, kind: str, record: Dict, on_delivered: Optional[DeliveryCallback] = None):
+        """Async counterpart of submit; waits for room without blocking the event loop."""
+        if not self.try_submit(kind, record, on_delivered):
+            await asyncio.to_thread(self.submit, kind, record, on_delivered)
+
+    def pending(self) -> int:
+        """Records queued, batched or being sent but not yet delivered."""
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """Send every batch now and wait until all submitted records are delivered (or failed)."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Drain the queue, stop the background and sender threads and close the backend."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._senders.shutdown(wait=True)
+        self.backend.close()
+
+    def __enter__(self) -> "BufferedDispatcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._oldest:
+                timeout = max(0.0, min(self._oldest.values()) + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _FLUSH or item is _STOP:
+                for kind in list(self._batches):
+                    self._send(kind)
+                self._queue.task_done()
+                if item is _STOP:
+                    return
+                continue
+            if item is not None:
+                kind, record, on_delivered = item
+                self._batches.setdefault(kind, []).append((record, on_delivered))
+                self._oldest.setdefault(kind, time.monotonic())
+                if len(self._batches[kind]) >= self.max_batch_size:
+                    self._send(kind)
+            # Time trigger
+            now = time.monotonic()
+            for kind, oldest in list(self._oldest.items()):
+                if now - oldest >= self.flush_interval:
+                    self._send(kind)
+
+    def _send(self, kind: str):
+        """Hand a kind's batch to a sender, waiting for a free one."""
+        batch = self._batches.pop(kind, [])
+        self._oldest.pop(kind, None)
+        if not batch:
+            return
+        self._sender_slots.acquire()
+        self._senders.submit(self._deliver, kind, batch)
+
+    def _deliver(self, kind: str, batch: List[Tuple[Dict, Optional[DeliveryCallback]]]):
+        records = [record for record, _ in batch]
+        delay = self.retry_delay
+        delivered = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    self.backend.send_batch(kind, records)
+                    self._record(kind, records, "sent", time.perf_counter() - started)
+                    delivered = True
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Giving up on a batch of {len(records)} {kind} records after "
+                                     f"{attempt + 1} attempts: {e}")
+                        self._record(kind, records, "failed", time.perf_counter() - started)
+                        break
+                    logger.warning(f"Sending {len(records)} {kind} records failed ({e}). "
+                                   f"Retrying in {delay:.2f}s...")
+                    time.sleep(delay)
+                    delay *= 2
+        finally:
+            self._sender_slots.release()
+            for _, on_delivered in batch:
+                if on_delivered is not None:
+                    try:
+                        on_delivered(delivered)
+                    except Exception as e:
+                        logger.error(f"Delivery callback for a {kind} record failed: {e}")
+                self._queue.task_done()
+
+    def _record(self, kind: str, records: List[Dict], outcome: str, seconds: float):
+        with self._stats_lock:
+            self.stats[outcome] += len(records)
+            self.stats["batches"] += 1
+        if self.metrics is not None:
+            self.metrics.counter("email_backend_records_total",
+                                 "Handler records delivered to the backend, by kind and outcome."
+                                 ).inc(len(records), kind=kind, outcome=outcome)
+            self.metrics.histogram("email_backend_batch_seconds",
+                                   "Latency of one backend batch call.").observe(seconds, kind=kind)